@@ -1,3 +1,57 @@
-from ._impl import save_screenshot, closeBmpDaemon, BMPDaemon, BrowserDataDir, BMPProxy, \
-    closeSeleniumWebDriver, SeleniumWebDriver, Screenshot, enable_chrome_download, set_new_har, wait_page_loaded, \
-    click_sync, wait_chrome_file_finished_downloades, wait_for_display
\ No newline at end of file
+from importlib import import_module
+
+# public name -> module that defines it
+# modules are imported on the first attribute access, so `import alexber.seleniumsupport` doesn't import
+# selenium.webdriver, browsermobproxy, requests, psutil, etc.
+_exports = {}
+for _module_name, _names in {
+    '_impl': ('save_screenshot', 'closeBmpDaemon', 'BMPDaemon', 'BrowserDataDir', 'BMPProxy',
+              'closeSeleniumWebDriver', 'SeleniumWebDriver', 'Screenshot', 'enable_chrome_download', 'set_new_har',
+              'wait_page_loaded', 'click_sync', 'wait_chrome_file_finished_downloades', 'wait_for_display'),
+    '_driverspec': ('DriverSpec',),
+    '_locators': ('LocatorCache', 'element_condition'),
+    '_adaptivewait': ('AdaptiveWait', 'Deadline', 'all_of', 'any_of'),
+    '_bmpgroup': ('BMPDaemonGroup', 'BMPDaemons'),
+    '_remote': ('RemoteConnectionPool', 'PooledRemoteConnection'),
+    '_pool': ('WebDriverPool', 'reset_web_driver', 'BMPProxyPool', 'reset_bmp_proxy'),
+    '_downloads': ('wait_chrome_files_finished_downloads',),
+    '_downloadmanager': ('DownloadManager', 'Download'),
+    '_devtools': ('DevToolsConnection',),
+    '_async': ('set_async_executor', 'async_run', 'AsyncBMPDaemon', 'AsyncBrowserDataDir', 'AsyncBMPProxy',
+               'AsyncSeleniumWebDriver', 'AsyncScreenshot', 'async_save_screenshot', 'async_closeBmpDaemon',
+               'async_closeSeleniumWebDriver', 'async_enable_chrome_download', 'async_set_new_har',
+               'async_click_sync', 'async_wait_until', 'async_wait_page_loaded', 'async_wait_page_ready',
+               'async_wait_chrome_file_finished_downloades', 'async_wait_chrome_files_finished_downloads'),
+    '_httpcache': ('HttpCache', 'HttpCacheLease'),
+    '_har': ('save_har', 'rotate_har', 'iter_har_entries'),
+    '_harindex': ('HarIndex', 'HarRecord'),
+    '_screenshot': ('ScreenshotWriter', 'recompress_png'),
+    '_batch': ('execute_batch',),
+    '_waits': ('wait_for_style_change', 'wait_for_display_change', 'wait_for_element_appearance',
+               'wait_for_element_removal', 'wait_for_text_change', 'page_ready', 'wait_page_ready'),
+    '_teardown': ('TeardownReport', 'terminate_processes', 'teardown_all'),
+    '_monitor': ('ProcessTreeMonitor',),
+    '_blocking': ('BlockingProfile', 'BLOCKING_PROFILES', 'get_blocking_profile', 'apply_blocking_profile',
+                  'exclude_blocked_entries', 'blocking_report'),
+    '_crawl': ('CrawlScheduler', 'CrawlSession', 'CrawlResult', 'crawl'),
+    '_metrics': ('add_metrics_listener', 'remove_metrics_listener', 'MetricsRecorder'),
+}.items():
+    for _name in _names:
+        _exports[_name] = _module_name
+del _module_name, _names, _name
+
+__all__ = list(_exports)
+
+
+def __getattr__(name):
+    module_name = _exports.get(name, None)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(f'.{module_name}', __name__), name)
+    # next access doesn't go through __getattr__()
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted({*globals(), *_exports})
@@ -0,0 +1,272 @@
+import collections
+import time
+
+from selenium.common.exceptions import NoSuchElementException, StaleElementReferenceException, TimeoutException
+
+from ._metrics import _span, _incr
+
+_HISTORY_SIZE = 100
+
+
+class Deadline(object):
+    """
+    One deadline that is shared by a sequence of waits, so the whole sequence (and not every wait) is limited
+    by timeout.
+
+    Usage example:
+
+        deadline = Deadline(30)
+        wait = deadline.wait(web_driver)
+        wait_page_loaded(wait, title='Home')
+        wait.until(wait_for_display((By.ID, 'spinner')))
+
+    :param timeout: how many seconds the sequence of waits can take.
+    """
+    def __init__(self, timeout):
+        if timeout < 0:
+            raise ValueError(f"Expected non-negative timeout, but got {timeout}")
+        self.timeout = timeout
+        self.end = time.monotonic() + timeout
+
+    def remaining(self):
+        """
+        :return: how many seconds are left, 0 if the deadline has passed.
+        """
+        return max(0.0, self.end - time.monotonic())
+
+    def expired(self):
+        return time.monotonic() >= self.end
+
+    def wait(self, driver, **kwargs):
+        """
+        :param driver:
+        :param kwargs: Optional. The same parameters as AdaptiveWait() has, except timeout and deadline.
+        :return: AdaptiveWait that is limited by this deadline.
+        """
+        return AdaptiveWait(driver, deadline=self, **kwargs)
+
+    def __repr__(self):
+        return f'{type(self).__name__}(timeout={self.timeout}, remaining={self.remaining():.3f})'
+
+
+class _Run(object):
+    """
+    One until() / until_not() of AdaptiveWait: it's deadline, backoff and what is recorded in history.
+    It is shared by AdaptiveWait and async_wait_until(), they differ only in how they sleep.
+    """
+    def __init__(self, wait):
+        self.wait = wait
+        self.end = wait._end()
+        self.start = time.monotonic()
+        self.interval = wait.initial
+        # sleep after poll that took cost seconds, so polls are no more than max_load of the time
+        self.stretch = 1 / wait.max_load - 1
+        self.polls = 0
+        self.ok = False
+        self.screen = None
+        self.stacktrace = None
+        self._poll_start = None
+
+    def begin_poll(self):
+        self.polls += 1
+        self._poll_start = time.monotonic()
+
+    def satisfied(self, value, negate):
+        self.ok = not value if negate else bool(value)
+        return self.ok
+
+    def failed(self, exc):
+        self.screen = getattr(exc, 'screen', None)
+        self.stacktrace = getattr(exc, 'stacktrace', None)
+
+    def next_delay(self):
+        """
+        :return: how many seconds to sleep before the next poll, None if the deadline has passed.
+        """
+        now = time.monotonic()
+        remaining = self.end - now
+        if remaining <= 0:
+            return None
+        delay = min(max(self.interval, (now - self._poll_start) * self.stretch), remaining)
+        self.interval = min(self.interval * self.wait.factor, self.wait.max_interval)
+        return delay
+
+    def timeout(self, message):
+        return TimeoutException(message, self.screen, self.stacktrace)
+
+    def record(self):
+        _incr('adaptive_wait.polls', self.polls)
+        self.wait.history.append({'name': self.wait.name, 'polls': self.polls,
+                                  'elapsed': time.monotonic() - self.start, 'ok': self.ok})
+
+
+class AdaptiveWait(object):
+    """
+    Drop-in replacement of WebDriverWait that polls with exponential backoff instead of fixed poll frequency.
+    The first poll is immediate, then the interval starts from initial and is multiplied by factor up to max_interval,
+    so fast pages pay little latency, while long waits don't flood the driver. If polls themselves are slow
+    (slow driver or heavy condition), the interval is stretched, so no more than max_load of the wait is spent
+    in the driver. The condition is checked once more at the deadline.
+
+    Every until() / until_not() is recorded (polls, elapsed seconds, whether it succeeded), see history and last.
+    Use all_of() / any_of() to check several conditions in one poll and Deadline to share one deadline
+    across a sequence of waits. async_wait_until() (and async_wait_page_loaded(), async_wait_page_ready())
+    polls AdaptiveWait with the same backoff and deadline.
+
+    Usage example:
+
+        wait = AdaptiveWait(web_driver, timeout=70)
+        wait_page_loaded(wait, title='Home')
+        wait.until(all_of(wait_for_display((By.ID, 'spinner')), EC.title_contains('Home')))
+        print(wait.last)
+
+    :param driver: Web Driver (or WebElement) that is passed to the conditions.
+    :param timeout: how many seconds every wait can take. Exactly one of timeout and deadline should be supplied.
+    :param initial: Optional. The first interval in seconds. The default value is 0.01.
+    :param max_interval: Optional. The largest interval of the backoff in seconds. The default value is 0.5.
+    :param factor: Optional. How much the interval grows after every poll. The default value is 2.
+    :param max_load: Optional. Which part of the wait can be spent in the polls, from 0 (exclusive) to 1.
+                     1 means that slow polls don't stretch the interval. The default value is 0.5.
+    :param ignored_exceptions: Optional. Exceptions that are treated as not satisfied condition
+                               (NoSuchElementException is always ignored, as in WebDriverWait).
+    :param deadline: Optional. Deadline that is shared with other waits.
+    :param name: Optional. Name of the wait in history.
+    """
+    def __init__(self, driver, timeout=None, initial=0.01, max_interval=0.5, factor=2, max_load=0.5,
+                 ignored_exceptions=None, deadline=None, name=None):
+        if (timeout is None) == (deadline is None):
+            raise ValueError("Expected exactly one of timeout and deadline")
+        if timeout is not None and timeout < 0:
+            raise ValueError(f"Expected non-negative timeout, but got {timeout}")
+        if initial <= 0 or max_interval < initial:
+            raise ValueError(f"Expected 0 < initial <= max_interval, but got {initial} and {max_interval}")
+        if factor < 1:
+            raise ValueError(f"Expected factor >= 1, but got {factor}")
+        if not 0 < max_load <= 1:
+            raise ValueError(f"Expected 0 < max_load <= 1, but got {max_load}")
+        self._driver = driver
+        self._timeout = timeout
+        self.deadline = deadline
+        self.initial = initial
+        self.max_interval = max_interval
+        self.factor = factor
+        self.max_load = max_load
+        self.name = name
+        exceptions = [NoSuchElementException]
+        if ignored_exceptions is not None:
+            try:
+                exceptions.extend(iter(ignored_exceptions))
+            except TypeError:
+                # ignored_exceptions is not iterable
+                exceptions.append(ignored_exceptions)
+        self._ignored_exceptions = tuple(exceptions)
+        self.history = collections.deque(maxlen=_HISTORY_SIZE)
+
+    @property
+    def last(self):
+        """
+        :return: dict with name, polls, elapsed and ok of the last wait, None if there was no wait.
+        """
+        return self.history[-1] if self.history else None
+
+    def _end(self):
+        if self.deadline is not None:
+            return self.deadline.end
+        return time.monotonic() + self._timeout
+
+    def _run_poll(self, method, negate, message):
+        run = _Run(self)
+        try:
+            with _span('adaptive_wait'):
+                while True:
+                    run.begin_poll()
+                    try:
+                        value = method(self._driver)
+                        if run.satisfied(value, negate):
+                            return value
+                    except self._ignored_exceptions as exc:
+                        if negate:
+                            run.ok = True
+                            return True
+                        run.failed(exc)
+                    delay = run.next_delay()
+                    if delay is None:
+                        break
+                    time.sleep(delay)
+                raise run.timeout(message)
+        finally:
+            run.record()
+
+    def until(self, method, message=''):
+        """
+        Calls method with the driver as an argument until the return value is truthy.
+
+        :return: what method has returned.
+        :raises TimeoutException: if the deadline has passed.
+        """
+        return self._run_poll(method, False, message)
+
+    def until_not(self, method, message=''):
+        """
+        Calls method with the driver as an argument until the return value is falsy
+        (or one of ignored exceptions is raised).
+
+        :return: what method has returned (True, if exception was raised).
+        :raises TimeoutException: if the deadline has passed.
+        """
+        return self._run_poll(method, True, message)
+
+    def __repr__(self):
+        return f'{type(self).__name__}(timeout={self._timeout}, deadline={self.deadline}, ' \
+               f'initial={self.initial}, max_interval={self.max_interval})'
+
+
+class all_of(object):
+    """
+    Condition that is satisfied when all conditions are satisfied in the same poll. Conditions are checked
+    in order and checking stops at the first one that is not satisfied, so put the cheapest first.
+    Exceptions are propagated to the wait.
+
+    :param conditions: callables condition(driver), for example, expected_conditions.
+    :return: list of what conditions have returned, False if some condition is not satisfied.
+    """
+    def __init__(self, *conditions):
+        if not conditions:
+            raise ValueError("Expected at least one condition")
+        self.conditions = conditions
+
+    def __call__(self, driver):
+        results = []
+        for condition in self.conditions:
+            value = condition(driver)
+            if not value:
+                return False
+            results.append(value)
+        return results
+
+
+class any_of(object):
+    """
+    Condition that is satisfied when some of conditions is satisfied. Conditions are checked in order
+    and checking stops at the first one that is satisfied. Condition that raises one of ignored_exceptions
+    is treated as not satisfied, so the rest are still checked.
+
+    :param conditions: callables condition(driver), for example, expected_conditions.
+    :param ignored_exceptions: Optional. The default value is (NoSuchElementException, StaleElementReferenceException).
+    :return: what the first satisfied condition has returned, False if no condition is satisfied.
+    """
+    def __init__(self, *conditions, ignored_exceptions=(NoSuchElementException, StaleElementReferenceException)):
+        if not conditions:
+            raise ValueError("Expected at least one condition")
+        self.conditions = conditions
+        self.ignored_exceptions = tuple(ignored_exceptions)
+
+    def __call__(self, driver):
+        for condition in self.conditions:
+            try:
+                value = condition(driver)
+            except self.ignored_exceptions:
+                continue
+            if value:
+                return value
+        return False
@@ -0,0 +1,340 @@
+import asyncio
+import functools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.wait import WebDriverWait
+
+from ._impl import save_screenshot, closeBmpDaemon, BMPDaemon, BrowserDataDir, BMPProxy, \
+    closeSeleniumWebDriver, SeleniumWebDriver, Screenshot, enable_chrome_download, set_new_har, \
+    click_sync, wait_chrome_file_finished_downloades
+from ._downloads import _create_inotify, _pending_downloads
+from ._waits import page_ready
+from ._adaptivewait import AdaptiveWait, _Run
+from ._metrics import _span
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def set_async_executor(executor):
+    """
+    Replaces default executor that is used to run blocking calls by all async API of this package.
+    The default one is ThreadPoolExecutor with default (bounded) number of threads.
+
+    :param executor: concurrent.futures.Executor
+    :return:
+    """
+    global _executor
+    with _executor_lock:
+        _executor = executor
+
+
+def _get_executor(executor=None):
+    global _executor
+    if executor is not None:
+        return executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(thread_name_prefix='seleniumsupport')
+        return _executor
+
+
+async def _run(executor, func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(executor), functools.partial(func, *args, **kwargs))
+
+
+class _AsyncContextManager(object):
+    """
+    Adapts blocking context-manager to async one. __enter__() and __exit__() are run in the executor.
+
+    If the task is cancelled while __enter__() is running, the resource is closed in the background,
+    as soon as it is created.
+    """
+    def __init__(self, cm_factory, *args, executor=None, **kwargs):
+        self._cm_factory = cm_factory
+        self._args = args
+        self._kwargs = kwargs
+        self._executor = executor
+        self._cm = None
+
+    async def __aenter__(self):
+        executor = _get_executor(self._executor)
+        cm = self._cm_factory(*self._args, **self._kwargs)
+        loop = asyncio.get_running_loop()
+        fut = loop.run_in_executor(executor, cm.__enter__)
+        try:
+            ret = await asyncio.shield(fut)
+        except asyncio.CancelledError:
+            def _close(f):
+                if not f.cancelled() and f.exception() is None:
+                    executor.submit(cm.__exit__, None, None, None)
+            fut.add_done_callback(_close)
+            raise
+        self._cm = cm
+        return ret
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        cm, self._cm = self._cm, None
+        # exit should run till the end, even if we're cancelled
+        return await asyncio.shield(_run(self._executor, cm.__exit__, exc_type, exc_val, exc_tb))
+
+
+def AsyncBMPDaemon(executor=None, **kwargs):
+    """
+    Async context-manager version of BMPDaemon().
+
+    :param executor: Optional. Executor to run blocking calls, see set_async_executor().
+    :param kwargs: see BMPDaemon()
+    """
+    return _AsyncContextManager(BMPDaemon, executor=executor, **kwargs)
+
+
+def AsyncBrowserDataDir(executor=None, **kwargs):
+    """
+    Async context-manager version of BrowserDataDir().
+
+    :param executor: Optional. Executor to run blocking calls, see set_async_executor().
+    :param kwargs: see BrowserDataDir()
+    """
+    return _AsyncContextManager(BrowserDataDir, executor=executor, **kwargs)
+
+
+def AsyncBMPProxy(executor=None, **kwargs):
+    """
+    Async context-manager version of BMPProxy().
+
+    :param executor: Optional. Executor to run blocking calls, see set_async_executor().
+    :param kwargs: see BMPProxy()
+    """
+    return _AsyncContextManager(BMPProxy, executor=executor, **kwargs)
+
+
+def AsyncSeleniumWebDriver(executor=None, **kwargs):
+    """
+    Async context-manager version of SeleniumWebDriver().
+
+    Note: web_driver that is returned is regular (blocking) Selenium's Web Driver.
+    Use async_run() to call it's methods without blocking the event loop.
+
+    :param executor: Optional. Executor to run blocking calls, see set_async_executor().
+    :param kwargs: see SeleniumWebDriver()
+    """
+    return _AsyncContextManager(SeleniumWebDriver, executor=executor, **kwargs)
+
+
+def AsyncScreenshot(web_driver, action=None, base_dir=None, logger=None, writer=None, executor=None):
+    """
+    Async context-manager version of Screenshot().
+
+    :param executor: Optional. Executor to run blocking calls, see set_async_executor().
+    """
+    return _AsyncContextManager(Screenshot, web_driver, action=action, base_dir=base_dir, logger=logger,
+                                writer=writer, executor=executor)
+
+
+async def async_run(func, *args, executor=None, **kwargs):
+    """
+    Runs blocking func(*args, **kwargs) in the executor.
+    For example, await async_run(web_driver.get, url)
+
+    :param func: blocking callable
+    :param executor: Optional. Executor to run blocking calls, see set_async_executor().
+    :return: result of func
+    """
+    return await _run(executor, func, *args, **kwargs)
+
+
+async def async_save_screenshot(web_driver, screenshot_file_name, screen=None, writer=None, executor=None):
+    """
+    Coroutine version of save_screenshot().
+    """
+    return await _run(executor, save_screenshot, web_driver, screenshot_file_name, screen, writer=writer)
+
+
+async def async_closeBmpDaemon(bmp_daemon, executor=None):
+    """
+    Coroutine version of closeBmpDaemon().
+    """
+    return await _run(executor, closeBmpDaemon, bmp_daemon)
+
+
+async def async_closeSeleniumWebDriver(web_driver, executor=None):
+    """
+    Coroutine version of closeSeleniumWebDriver().
+    """
+    return await _run(executor, closeSeleniumWebDriver, web_driver)
+
+
+async def async_enable_chrome_download(web_driver, downloadsPath, executor=None):
+    """
+    Coroutine version of enable_chrome_download().
+    """
+    return await _run(executor, enable_chrome_download, web_driver, downloadsPath)
+
+
+async def async_set_new_har(bmp_proxy, har_name, title=None, executor=None, **kwargs):
+    """
+    Coroutine version of set_new_har().
+    """
+    return await _run(executor, set_new_har, bmp_proxy, har_name, title, **kwargs)
+
+
+async def async_click_sync(web_driver, web_element, executor=None):
+    """
+    Coroutine version of click_sync().
+    """
+    return await _run(executor, click_sync, web_driver, web_element)
+
+
+async def async_wait_until(wait, method, message='', executor=None):
+    """
+    Coroutine version of WebDriverWait.until() and AdaptiveWait.until().
+    Every poll (call to method) is run in the executor, between polls asyncio.sleep() is used,
+    so no thread is held while we're waiting.
+
+    :param wait: WebDriverWait or AdaptiveWait. AdaptiveWait's backoff and deadline are used, the wait is recorded
+                 in it's history.
+    :param method: callable that receives web_driver, for example expected condition.
+    :param message: Optional. Message for TimeoutException.
+    :param executor: Optional. Executor to run blocking calls, see set_async_executor().
+    :return: the first truthy value of method
+    """
+    if isinstance(wait, AdaptiveWait):
+        return await _async_adaptive_until(wait, method, message, executor)
+    if not isinstance(wait, WebDriverWait):
+        raise ValueError(f"Expected WebDriverWait or AdaptiveWait, but got {type(wait).__name__}")
+
+    screen = None
+    stacktrace = None
+
+    end_time = time.monotonic() + wait._timeout
+    while True:
+        try:
+            value = await _run(executor, method, wait._driver)
+            if value:
+                return value
+        except wait._ignored_exceptions as exc:
+            screen = getattr(exc, 'screen', None)
+            stacktrace = getattr(exc, 'stacktrace', None)
+        if time.monotonic() > end_time:
+            break
+        await asyncio.sleep(wait._poll)
+    raise TimeoutException(message, screen, stacktrace)
+
+
+async def _async_adaptive_until(wait, method, message, executor):
+    """
+    See AdaptiveWait.until().
+    """
+    run = _Run(wait)
+    try:
+        with _span('adaptive_wait'):
+            while True:
+                run.begin_poll()
+                try:
+                    value = await _run(executor, method, wait._driver)
+                    if run.satisfied(value, False):
+                        return value
+                except wait._ignored_exceptions as exc:
+                    run.failed(exc)
+                delay = run.next_delay()
+                if delay is None:
+                    break
+                await asyncio.sleep(delay)
+            raise run.timeout(message)
+    finally:
+        run.record()
+
+
+async def async_wait_page_loaded(wait, title=None, executor=None):
+    """
+    Coroutine version of wait_page_loaded().
+    """
+    if title is not None:
+        await async_wait_until(wait, EC.title_contains(title), executor=executor)
+    await async_wait_until(wait, EC.visibility_of_all_elements_located((By.XPATH, '/html/body')), executor=executor)
+
+
+async def async_wait_page_ready(wait, title=None, network_idle=False, idle_time=0.5, resources=False,
+                                executor=None):
+    """
+    Coroutine version of wait_page_ready().
+    """
+    return await async_wait_until(wait, page_ready(title=title, network_idle=network_idle, idle_time=idle_time,
+                                                   resources=resources), executor=executor)
+
+
+async def async_wait_chrome_file_finished_downloades(file_name, downloadsPath, default_sleep_time=10, retries=40,
+                                                     logger=None, executor=None):
+    """
+    Coroutine version of wait_chrome_file_finished_downloades().
+    Consider to use async_wait_chrome_files_finished_downloads() instead.
+    """
+    return await _run(executor, wait_chrome_file_finished_downloades, file_name, downloadsPath,
+                      default_sleep_time=default_sleep_time, retries=retries, logger=logger)
+
+
+async def async_wait_chrome_files_finished_downloads(file_names, downloadsPath, timeout=400, poll_interval=0.05,
+                                                     max_poll_interval=1, logger=None, executor=None):
+    """
+    Coroutine version of wait_chrome_files_finished_downloads().
+    On Linux, inotify file descriptor is registered in the event loop, so no thread is held while we're waiting.
+    """
+    if logger is None:
+        logger = logging.getLogger(__name__)
+    logger.info("async_wait_chrome_files_finished_downloads()")
+
+    if isinstance(file_names, str):
+        file_names = [file_names]
+
+    loop = asyncio.get_running_loop()
+    p = Path(downloadsPath)
+    deadline = time.monotonic() + timeout
+    interval = poll_interval
+    changed = asyncio.Event()
+
+    inotify = _create_inotify(p, logger)
+    if inotify is not None:
+        def _on_readable():
+            inotify.drain()
+            changed.set()
+        try:
+            loop.add_reader(inotify.fd, _on_readable)
+        except NotImplementedError:
+            # for example, ProactorEventLoop on Windows
+            inotify.close()
+            inotify = None
+
+    try:
+        pending = await _run(executor, _pending_downloads, p, file_names)
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise ValueError(f"It takes too much time to download the files {pending}, aborting...")
+            logger.debug(f'{pending} are still downloaded')
+
+            if inotify is not None:
+                try:
+                    await asyncio.wait_for(changed.wait(), min(remaining, max_poll_interval))
+                except asyncio.TimeoutError:
+                    pass
+                changed.clear()
+            else:
+                await asyncio.sleep(min(remaining, interval))
+                interval = min(interval * 2, max_poll_interval)
+
+            pending = await _run(executor, _pending_downloads, p, pending)
+    finally:
+        if inotify is not None:
+            loop.remove_reader(inotify.fd)
+            inotify.close()
+
+    return [Path(p, file_name) for file_name in file_names]
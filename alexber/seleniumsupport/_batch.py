@@ -0,0 +1,144 @@
+_OPERATIONS_WITH_NAME = ('attribute', 'property', 'style')
+_OPERATIONS = ('click', 'text', 'rect', 'element', *_OPERATIONS_WITH_NAME)
+
+# resolves locator inside the page to all elements that it matches
+_FIND_FUNCTION = """
+function toArray(list) {
+    return Array.prototype.slice.call(list);
+}
+
+function find(by, value) {
+    switch (by) {
+        case 'xpath':
+            var snapshot = document.evaluate(value, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+            var found = [];
+            for (var i = 0; i < snapshot.snapshotLength; i++) {
+                found.push(snapshot.snapshotItem(i));
+            }
+            return found;
+        case 'css selector':
+            return toArray(document.querySelectorAll(value));
+        case 'id':
+            return toArray(document.querySelectorAll('#' + CSS.escape(value)));
+        case 'name':
+            return toArray(document.getElementsByName(value));
+        case 'tag name':
+            return toArray(document.getElementsByTagName(value));
+        case 'class name':
+            return toArray(document.getElementsByClassName(value));
+        case 'link text':
+        case 'partial link text':
+            return toArray(document.getElementsByTagName('a')).filter(function (a) {
+                var text = a.innerText.trim();
+                return by === 'link text' ? text === value : text.indexOf(value) !== -1;
+            });
+    }
+    throw new Error('Unsupported locator strategy ' + by);
+}
+"""
+
+_BATCH_SCRIPT = _FIND_FUNCTION + """
+var targets = arguments[0], ops = arguments[1];
+
+function apply(el) {
+    var result = {}, style = null;
+    try {
+        for (var i = 0; i < ops.length; i++) {
+            var name = ops[i][0], arg = ops[i][1];
+            switch (name) {
+                case 'click':
+                    el.click();
+                    result.clicked = true;
+                    break;
+                case 'text':
+                    result.text = el.innerText !== undefined ? el.innerText : el.textContent;
+                    break;
+                case 'attribute':
+                    (result.attributes = result.attributes || {})[arg] = el.getAttribute(arg);
+                    break;
+                case 'property':
+                    (result.properties = result.properties || {})[arg] = el[arg];
+                    break;
+                case 'style':
+                    style = style || window.getComputedStyle(el);
+                    (result.styles = result.styles || {})[arg] = style.getPropertyValue(arg);
+                    break;
+                case 'rect':
+                    var r = el.getBoundingClientRect();
+                    result.rect = {x: r.left + window.pageXOffset, y: r.top + window.pageYOffset,
+                                   width: r.width, height: r.height};
+                    break;
+                case 'element':
+                    result.element = el;
+                    break;
+            }
+        }
+    } catch (e) {
+        result.error = String(e);
+    }
+    return result;
+}
+
+return targets.map(function (target) {
+    if (target.element !== undefined) {
+        return apply(target.element);
+    }
+    try {
+        return find(target.by, target.value).map(apply);
+    } catch (e) {
+        return [{error: String(e)}];
+    }
+});
+"""
+
+
+def _normalize_operation(operation):
+    if isinstance(operation, str):
+        name, arg = operation, None
+    else:
+        name, arg = operation
+    if name not in _OPERATIONS:
+        raise ValueError(f"Unknown operation {name}, expected one of {_OPERATIONS}")
+    if name in _OPERATIONS_WITH_NAME and arg is None:
+        raise ValueError(f"Operation {name} requires name, for example ('{name}', 'value')")
+    return [name, arg]
+
+
+def execute_batch(web_driver, targets, operations):
+    """
+    Runs operations on all targets in one execute_script() round trip.
+    For example, it is much cheaper to read text of thousands of table's cells in one call than calling
+    web_element.text on each of them.
+
+    Target is WebElement or locator, for example (By.XPATH, '//table//td'). Locator is resolved inside the page
+    to all elements that it matches.
+
+    Supported operations (they are applied in the given order):
+        'click' - synchronous click, see click_sync(). Result key is 'clicked'.
+        'text' - rendered text (innerText) of the element. Result key is 'text'.
+        'rect' - dict with x, y, width, height as web_element.rect. Result key is 'rect'.
+        'element' - WebElement itself, it is useful for locators. Result key is 'element'.
+        ('attribute', name) - as web_element.get_attribute(). Result key is 'attributes', dict by name.
+                              Note: unlike get_attribute(), only HTML attribute is consulted.
+        ('property', name) - as web_element.get_property(). Result key is 'properties', dict by name.
+        ('style', name) - computed style as web_element.value_of_css_property(). Result key is 'styles',
+                          dict by name.
+    If operation fails in the page on some element, result has 'error' key with the message
+    (the operations before it are still reported). If locator itself fails (for example, invalid XPath),
+    result of the target is list with one dict that has only 'error' key.
+
+    Usage example:
+
+        cells = execute_batch(web_driver, [(By.XPATH, '//table//td')], ['text', ('attribute', 'class')])[0]
+        texts = [cell['text'] for cell in cells]
+
+    :param web_driver:
+    :param targets: list of WebElement or locator.
+    :param operations: list of operations.
+    :return: list with result per target. For WebElement result is dict, for locator result is list of dicts
+             (one per matched element).
+    """
+    ops = [_normalize_operation(operation) for operation in operations]
+    specs = [{'by': target[0], 'value': target[1]} if isinstance(target, (tuple, list)) else {'element': target}
+             for target in targets]
+    return web_driver.execute_script(_BATCH_SCRIPT, specs, ops)
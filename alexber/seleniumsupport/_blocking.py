@@ -0,0 +1,192 @@
+import re
+from collections import OrderedDict
+
+# BMP matches the whole URL (Java's Matcher.matches()), so do we
+_IMAGES = r'https?://.*\.(?:png|jpe?g|gif|webp|avif|svg|ico|bmp)(?:[?#].*)?'
+_MEDIA = r'https?://.*\.(?:mp4|webm|ogv|ogg|mp3|wav|m4a|aac|flac|mov|avi|m3u8|mpd)(?:[?#].*)?'
+_FONTS = r'https?://.*\.(?:woff2?|ttf|otf|eot)(?:[?#].*)?'
+_STYLESHEETS = r'https?://.*\.css(?:[?#].*)?'
+
+_TRACKER_DOMAINS = ('google-analytics.com', 'googletagmanager.com', 'googlesyndication.com', 'doubleclick.net',
+                    'connect.facebook.net', 'hotjar.com', 'segment.io', 'mixpanel.com', 'scorecardresearch.com',
+                    'quantserve.com', 'adnxs.com', 'criteo.com', 'taboola.com', 'outbrain.com')
+
+
+def _domains_pattern(domains):
+    # no {m,n} quantifiers, BMP splits whitelist on commas
+    alternatives = '|'.join(re.escape(domain) for domain in domains)
+    return rf'https?://(?:[^/]*\.)?(?:{alternatives})(?::[0-9]+)?(?:[/?#].*)?'
+
+
+class BlockingProfile(object):
+    """
+    Set of requests that are not needed for crawling, for example, images or trackers.
+    Blocked requests are answered by BMP Proxy with status_code without reaching the network,
+    see apply_blocking_profile(). The browser itself can skip some of them, see chrome_arguments().
+
+    :param name: name of the profile.
+    :param patterns: Optional. Regular expressions of URLs to block (whole URL should match).
+    :param domains: Optional. Domains (with their subdomains) to block.
+    :param first_party_only: Optional. If True, everything that is not on the first-party domains is blocked,
+                             first-party domains are supplied to apply_blocking_profile().
+    :param block_images: Optional. Whether the browser should not load images at all.
+    :param status_code: Optional. HTTP status of the blocked requests. The default value is 204.
+    """
+    def __init__(self, name, patterns=(), domains=(), first_party_only=False, block_images=False,
+                 status_code=204):
+        self.name = name
+        self.patterns = tuple(patterns)
+        self.domains = tuple(domains)
+        self.first_party_only = first_party_only
+        self.block_images = block_images
+        self.status_code = status_code
+
+        blacklist = list(self.patterns)
+        if self.domains:
+            blacklist.append(_domains_pattern(self.domains))
+        # one PUT to BMP instead of one per pattern, file extensions and domains are case-insensitive
+        self.blacklist = '(?i)' + '|'.join(f'(?:{pattern})' for pattern in blacklist) if blacklist else None
+        self._blacklist_re = re.compile(self.blacklist) if blacklist else None
+
+    def whitelist(self, first_party):
+        """
+        :param first_party: domain or sequence of domains.
+        :return: regular expression of the first-party URLs or None, if profile is not first_party_only.
+        """
+        if not self.first_party_only:
+            return None
+        if not first_party:
+            raise ValueError(f"Blocking profile {self.name} expects first_party domain")
+        domains = (first_party,) if isinstance(first_party, str) else tuple(first_party)
+        return '(?i)' + _domains_pattern(domains)
+
+    def is_blocked(self, url, first_party=None):
+        """
+        :param url:
+        :param first_party: Optional. domain or sequence of domains, required for first_party_only profile.
+        :return: True, if the profile blocks url.
+        """
+        if self._blacklist_re is not None and self._blacklist_re.fullmatch(url):
+            return True
+        whitelist = self.whitelist(first_party)
+        return whitelist is not None and re.fullmatch(whitelist, url) is None
+
+    def chrome_arguments(self):
+        """
+        :return: list of Chrome's command-line arguments that block the same resources in the browser itself.
+        """
+        arguments = []
+        if self.block_images:
+            arguments.append('--blink-settings=imagesEnabled=false')
+        if self.domains:
+            rules = ', '.join(f'MAP {prefix}{domain} ~NOTFOUND' for domain in self.domains for prefix in ('', '*.'))
+            arguments.append(f'--host-resolver-rules={rules}')
+        return arguments
+
+    def chrome_prefs(self):
+        """
+        :return: dict of Chrome's prefs (experimental option 'prefs') that block the same resources in the browser.
+        """
+        return {'profile.managed_default_content_settings.images': 2} if self.block_images else {}
+
+    def __repr__(self):
+        return f'{type(self).__name__}(name={self.name!r})'
+
+
+BLOCKING_PROFILES = OrderedDict((profile.name, profile) for profile in (
+    BlockingProfile('no-images', patterns=(_IMAGES,), block_images=True),
+    BlockingProfile('no-media', patterns=(_IMAGES, _MEDIA, _FONTS), block_images=True),
+    BlockingProfile('text-only', patterns=(_IMAGES, _MEDIA, _FONTS, _STYLESHEETS), domains=_TRACKER_DOMAINS,
+                    block_images=True),
+    BlockingProfile('no-trackers', domains=_TRACKER_DOMAINS),
+    BlockingProfile('first-party-only', first_party_only=True),
+))
+
+
+def get_blocking_profile(profile):
+    """
+    :param profile: name of one of BLOCKING_PROFILES or BlockingProfile.
+    :return: BlockingProfile
+    """
+    if isinstance(profile, BlockingProfile):
+        return profile
+    try:
+        return BLOCKING_PROFILES[profile]
+    except KeyError:
+        raise ValueError(f"Unknown blocking profile {profile}, expected one of {list(BLOCKING_PROFILES)}") from None
+
+
+def apply_blocking_profile(bmp_proxy, profile, first_party=None):
+    """
+    Blocks requests of the profile on bmp_proxy through BMP's blacklist and whitelist.
+    Whitelist replaces the previous one, so for first-party-only profile you can call it before every page
+    with the page's domain. Use reset_bmp_proxy() to remove blocking.
+
+    Usage example:
+
+        apply_blocking_profile(bmp_proxy, 'first-party-only', first_party=urlsplit(url).hostname)
+        web_driver.get(url)
+
+    :param bmp_proxy:
+    :param profile: name of one of BLOCKING_PROFILES or BlockingProfile.
+    :param first_party: Optional. domain or sequence of domains, required for first_party_only profile.
+    :return: BlockingProfile
+    """
+    profile = get_blocking_profile(profile)
+    if profile.blacklist is not None:
+        bmp_proxy.blacklist(profile.blacklist, profile.status_code)
+    whitelist = profile.whitelist(first_party)
+    if whitelist is not None:
+        bmp_proxy.whitelist(whitelist, profile.status_code)
+    return profile
+
+
+def _entry_size(entry):
+    response = entry.get('response', {})
+    return max(response.get('headersSize', 0) or 0, 0) + max(response.get('bodySize', 0) or 0, 0)
+
+
+def exclude_blocked_entries(har, profile, first_party=None):
+    """
+    Removes requests that the profile blocks from har (as bmp_proxy.har returns it).
+    Use it for the HAR that was started with set_new_har() on the proxy with blocking profile,
+    so the blocked requests don't show up in the capture.
+
+    :param har: HAR dict.
+    :param profile: name of one of BLOCKING_PROFILES or BlockingProfile.
+    :param first_party: Optional. domain or sequence of domains, required for first_party_only profile.
+    :return: new HAR dict. har itself is not changed.
+    """
+    profile = get_blocking_profile(profile)
+    log = har.get('log', {})
+    entries = [entry for entry in log.get('entries', [])
+               if not profile.is_blocked(entry['request']['url'], first_party)]
+    return {**har, 'log': {**log, 'entries': entries}}
+
+
+def blocking_report(har, profile, first_party=None):
+    """
+    Counts per page how many requests and bytes the profile blocks.
+
+    If har was captured without blocking, blocked_bytes is how many bytes the profile would save.
+    If har was captured with the profile applied, blocked_requests is how many requests were saved
+    (blocked_bytes is then close to zero, BMP Proxy answers them with empty body).
+
+    :param har: HAR dict (as bmp_proxy.har returns it) or iterable of HAR entries (see iter_har_entries()).
+    :param profile: name of one of BLOCKING_PROFILES or BlockingProfile.
+    :param first_party: Optional. domain or sequence of domains, required for first_party_only profile.
+    :return: dict pageref -> dict with keys requests, bytes, blocked_requests, blocked_bytes.
+    """
+    profile = get_blocking_profile(profile)
+    entries = har.get('log', {}).get('entries', []) if isinstance(har, dict) else har
+    report = OrderedDict()
+    for entry in entries:
+        page = report.setdefault(entry.get('pageref', None),
+                                 {'requests': 0, 'bytes': 0, 'blocked_requests': 0, 'blocked_bytes': 0})
+        size = _entry_size(entry)
+        page['requests'] += 1
+        page['bytes'] += size
+        if profile.is_blocked(entry['request']['url'], first_party):
+            page['blocked_requests'] += 1
+            page['blocked_bytes'] += size
+    return report
@@ -0,0 +1,105 @@
+import json
+import os
+import random
+import socket
+import subprocess
+import time
+from urllib.error import URLError
+from urllib.request import urlopen
+
+# BMP Daemon allocates ports of BMP Proxies from this range, by default
+_DEFAULT_PROXY_PORT_RANGE = (8081, 8581)
+_PORT_RANGE = (10000, 60000)
+
+
+def _is_port_free(host, port):
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        try:
+            s.bind((host, port))
+        except OSError:
+            return False
+    return True
+
+
+def _free_port(host, proxy_ports, attempts=100, reserved=()):
+    """
+    Finds port for BMP Daemon, such that proxy_ports ports that follow it are also free.
+
+    :param reserved: Optional. Ranges (first, last) of ports that are free, but are already promised to
+                     another BMP Daemon, that is not started yet. The port range doesn't overlap them.
+    :return: port
+    """
+    low, high = _PORT_RANGE
+    for _ in range(attempts):
+        port = random.randint(low, high - proxy_ports - 1)
+        if any(port <= last and first <= port + proxy_ports for first, last in reserved):
+            continue
+        if all(_is_port_free(host, p) for p in range(port, port + proxy_ports + 1)):
+            return port
+    raise ValueError(f"Failed to find {proxy_ports + 1} free consecutive ports on {host}")
+
+
+def _probe(host, port, timeout):
+    """
+    :return: True, if BMP Daemon answers on REST API.
+    """
+    try:
+        with socket.create_connection((host, port), timeout=timeout):
+            pass
+    except OSError:
+        return False
+    try:
+        with urlopen(f'http://{host}:{port}/proxy', timeout=timeout) as resp:
+            return resp.status == 200 and 'proxyList' in json.load(resp)
+    except (URLError, OSError, ValueError):
+        return False
+
+
+def _wait_ready(host, port, process, timeout, log_file_name=None):
+    """
+    Waits till BMP Daemon answers on REST API with exponential backoff (starting from 10 ms).
+    """
+    deadline = time.monotonic() + timeout
+    delay = 0.01
+    while True:
+        if _probe(host, port, min(1, timeout)):
+            return
+        if process is not None and process.poll() is not None:
+            raise ValueError(f"BMP Daemon has exited with code {process.returncode}, see {log_file_name}")
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise ValueError(f"It takes too much time to start BMP Daemon on port {port}, aborting...")
+        time.sleep(min(delay, remaining))
+        delay = min(delay * 2, 0.5)
+
+
+def _start(bmp_daemon, options=None, proxy_ports=None):
+    """
+    Replacement of browsermobproxy.Server.start() with faster readiness detection.
+
+    :param bmp_daemon: browsermobproxy.Server
+    :param options: the same as of Server.start(), retry_sleep * retry_count is used as the timeout,
+                    timeout overrides it.
+    :param proxy_ports: Optional. How many ports after bmp_daemon.port BMP Proxies can use.
+    """
+    options = {} if options is None else options
+    log_path = options.get('log_path', os.getcwd())
+    log_file = options.get('log_file', 'server.log')
+    timeout = options.get('timeout', options.get('retry_sleep', 0.5) * options.get('retry_count', 60))
+
+    command = list(bmp_daemon.command)
+    if proxy_ports is not None:
+        command.append(f'--proxyPortRange={bmp_daemon.port + 1}-{bmp_daemon.port + proxy_ports}')
+
+    log_file_name = os.path.join(log_path, log_file)
+    bmp_daemon.log_file = open(log_file_name, 'w')
+    bmp_daemon.process = subprocess.Popen(command, stdout=bmp_daemon.log_file, stderr=subprocess.STDOUT)
+    try:
+        _wait_ready(bmp_daemon.host, bmp_daemon.port, bmp_daemon.process, timeout, log_file_name)
+    except BaseException:
+        try:
+            bmp_daemon.stop()
+        finally:
+            # Server.stop() returns without closing the log file, if the process has already exited
+            bmp_daemon.log_file.close()
+        raise
@@ -0,0 +1,240 @@
+import contextlib
+import logging
+import os
+import threading
+import time
+
+from ._impl import BMPDaemon, BMPProxy, _validate_param
+from ._bmpdaemon import _free_port, _probe
+from ._metrics import _incr
+
+# weight of the last measurement in the moving average of latency
+_EWMA_ALPHA = 0.3
+
+
+class _Member(object):
+    """
+    One BMP Daemon of BMPDaemonGroup and it's load.
+    """
+    def __init__(self, browsermob):
+        options = browsermob.get('daemon', {}).get('init', {}).get('options', {})
+        self.browsermob = browsermob
+        self.host = options.get('host', 'localhost')
+        self.port = options.get('port', 8080)
+        self.proxies = 0
+        self.latency = None
+        self.healthy = True
+        self.failed_at = None
+
+    def observe(self, elapsed):
+        self.latency = elapsed if self.latency is None else _EWMA_ALPHA * elapsed + (1 - _EWMA_ALPHA) * self.latency
+
+    def snapshot(self):
+        return {'host': self.host, 'port': self.port, 'proxies': self.proxies, 'latency': self.latency,
+                'healthy': self.healthy}
+
+
+def _browsermob(daemon, proxy_d):
+    if isinstance(daemon, dict):
+        return daemon
+    # BMP Daemon object, for example, from BMPDaemon()
+    return {'daemon': {'init': {'options': {'host': daemon.host, 'port': daemon.port}}}, 'proxy': proxy_d}
+
+
+class BMPDaemonGroup(object):
+    """
+    Set of BMP Daemons (for example, one per few cores) that BMP Proxies are spread over, so heavy HAR capture
+    doesn't saturate one JVM.
+
+    New BMP Proxy is created on the least loaded healthy BMP Daemon: with the least live BMP Proxies of this group
+    (strategy 'proxies') or with the least recent latency of creating BMP Proxy multiplied by live BMP Proxies
+    (strategy 'latency'). BMP Daemon that fails to create BMP Proxy is taken out of rotation. After retry_after
+    seconds it is probed (REST API) and returned to rotation, if it answers. See also check_health().
+
+    Usage example:
+
+        with BMPDaemons(count=4, **dd) as bmp_daemons:
+            bmp_daemon_group = BMPDaemonGroup(bmp_daemons)
+            with bmp_daemon_group.proxy() as bmp_proxy:
+                set_new_har(bmp_proxy, 'har_name')
+
+    :param daemons: BMP Daemons (objects with host and port, for example, from BMPDaemon() or BMPDaemons())
+                    and/or browsermob dicts (as BMPProxy() receives) of already running BMP Daemons.
+    :param strategy: Optional. 'proxies' (default) or 'latency'.
+    :param retry_after: Optional. How many seconds failed BMP Daemon is out of rotation. The default value is 30.
+    :param proxy: Optional. dict that is used as browsermob's proxy dict for BMP Daemon objects.
+    :param logger: Optional.
+    """
+    def __init__(self, daemons, strategy='proxies', retry_after=30, proxy=None, logger=None):
+        if strategy not in ('proxies', 'latency'):
+            raise ValueError(f"Unknown strategy {strategy}, expected 'proxies' or 'latency'")
+        self.members = [_Member(_browsermob(daemon, proxy or {})) for daemon in daemons]
+        if not self.members:
+            raise ValueError("Expected at least one BMP Daemon")
+        self.strategy = strategy
+        self.retry_after = retry_after
+        self.logger = logging.getLogger(__name__) if logger is None else logger
+        self._lock = threading.Lock()
+
+    def _score(self, member):
+        if self.strategy == 'latency':
+            # unknown latency is optimistic, so every BMP Daemon gets measured
+            return (member.latency or 0) * (member.proxies + 1), member.proxies
+        return member.proxies, member.latency or 0
+
+    def _candidates(self):
+        """
+        :return: members in the order they should be tried, the least loaded first.
+        """
+        now = time.monotonic()
+        with self._lock:
+            healthy = [m for m in self.members if m.healthy]
+            due = [m for m in self.members if not m.healthy and now - m.failed_at >= self.retry_after]
+        for member in due:
+            if _probe(member.host, member.port, 1):
+                self.logger.info(f"BMP Daemon {member.host}:{member.port} is back in rotation")
+                with self._lock:
+                    member.healthy = True
+                healthy.append(member)
+            else:
+                with self._lock:
+                    member.failed_at = now
+        with self._lock:
+            return sorted(healthy, key=self._score)
+
+    def _fail(self, member):
+        with self._lock:
+            member.healthy = False
+            member.failed_at = time.monotonic()
+        _incr('bmp_daemon_group.unhealthy')
+        self.logger.warning(f"BMP Daemon {member.host}:{member.port} is taken out of rotation", exc_info=True)
+
+    @contextlib.contextmanager
+    def proxy(self, **kwargs):
+        """
+        Context-manager that creates BMP Proxy on the least loaded BMP Daemon, see BMPProxy().
+
+        :param kwargs: Optional. The same parameters as BMPProxy() has, except browsermob.
+        :return: BMP Proxy
+        """
+        blocking_profile = kwargs.get('blocking_profile', None)
+        if blocking_profile is not None:
+            # invalid blocking profile is the caller's error, it shouldn't take BMP Daemons out of rotation
+            from ._blocking import get_blocking_profile
+            get_blocking_profile(blocking_profile).whitelist(kwargs.get('first_party', None))
+
+        for member in self._candidates():
+            with self._lock:
+                member.proxies += 1
+            try:
+                with contextlib.ExitStack() as stack:
+                    start = time.perf_counter()
+                    try:
+                        bmp_proxy = stack.enter_context(BMPProxy(browsermob=member.browsermob, **kwargs))
+                    except Exception:
+                        self._fail(member)
+                        continue
+                    with self._lock:
+                        member.observe(time.perf_counter() - start)
+                    yield bmp_proxy
+                    return
+            finally:
+                with self._lock:
+                    member.proxies -= 1
+        raise ValueError("There is no healthy BMP Daemon in the group")
+
+    def check_health(self):
+        """
+        Probes all BMP Daemons (REST API). BMP Daemon that doesn't answer is taken out of rotation,
+        BMP Daemon that answers is returned to rotation.
+
+        :return: list of dicts with host, port, proxies, latency, healthy of every BMP Daemon.
+        """
+        for member in self.members:
+            start = time.perf_counter()
+            ok = _probe(member.host, member.port, 1)
+            with self._lock:
+                if ok:
+                    member.healthy = True
+                    member.observe(time.perf_counter() - start)
+                elif member.healthy:
+                    member.healthy = False
+                    member.failed_at = time.monotonic()
+        return self.stats()
+
+    def stats(self):
+        """
+        :return: list of dicts with host, port, proxies, latency, healthy of every BMP Daemon.
+        """
+        with self._lock:
+            return [member.snapshot() for member in self.members]
+
+
+@contextlib.contextmanager
+def BMPDaemons(count=None, **kwargs):
+    """
+    Context-manager that starts count BMP Daemons in parallel, every one on it's own free port
+    (with it's own range of BMP Proxies' ports) and it's own log file (server-0.log, server-1.log, etc.).
+    In the exit from the code block inside context-manager, all of them are stopped.
+
+    The ports are chosen one after another before the BMP Daemons are started, so their ranges don't overlap.
+
+    :param count: Optional. How many BMP Daemons to start. The default value is number of the cores.
+    :param kwargs: the same parameters as BMPDaemon() has. port and adopt options are ignored,
+                   free port is chosen for every BMP Daemon as 'auto' port does.
+    :return: list of BMP Daemons.
+    """
+    daemon_d = kwargs.get('daemon', None)
+    _validate_param(daemon_d, 'daemon')
+    count = (os.cpu_count() or 1) if count is None else count
+    if count < 1:
+        raise ValueError(f"Expected positive count, but got {count}")
+
+    init_d = daemon_d.get('init', {})
+    init_options = init_d.get('options', None) or {}
+    start_d = daemon_d.get('start', {})
+    start_options = start_d.get('options', None) or {}
+    log_file = start_options.get('log_file', 'server.log')
+    stem, ext = os.path.splitext(log_file)
+
+    # JVMs bind their ports only when they're started, so free ports are chosen serially upfront
+    host = init_options.get('host', 'localhost')
+    proxy_ports = init_options.get('proxy_ports', None)
+    if proxy_ports is None:
+        proxy_ports = 100
+    reserved = []
+    for _ in range(count):
+        port = _free_port(host, proxy_ports, reserved=reserved)
+        reserved.append((port, port + proxy_ports))
+
+    def daemon_kwargs(i):
+        options = {**init_options, 'port': reserved[i][0], 'proxy_ports': proxy_ports, 'adopt': False}
+        return {**kwargs, 'daemon': {
+            **daemon_d,
+            'init': {**init_d, 'options': options},
+            'start': {**start_d, 'options': {**start_options, 'log_file': f'{stem}-{i}{ext}'}},
+        }}
+
+    with contextlib.ExitStack() as stack:
+        # JVMs start in parallel
+        contexts = [BMPDaemon(**daemon_kwargs(i)) for i in range(count)]
+        results = [None] * count
+        errors = []
+
+        def enter(i):
+            try:
+                results[i] = contexts[i].__enter__()
+            except BaseException as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=enter, args=(i,), name=f'bmp-daemon-{i}') for i in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for i, context in enumerate(contexts):
+            if results[i] is not None:
+                stack.push(context.__exit__)
+        if errors:
+            raise errors[0]
+        yield results
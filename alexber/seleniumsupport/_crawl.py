@@ -0,0 +1,421 @@
+import contextlib
+import logging
+import queue
+import threading
+import time
+
+from ._impl import BMPProxy, SeleniumWebDriver
+from ._driverspec import DriverSpec
+from ._pool import reset_web_driver, reset_bmp_proxy
+from ._teardown import teardown_all
+from ._blocking import get_blocking_profile, apply_blocking_profile
+from ._metrics import _span, _incr
+
+_STOP = object()
+
+
+class _MapCall(object):
+    """
+    One map() call: it's own results queue, so results of map() that was abandoned don't leak into the next one.
+    """
+    __slots__ = ('results', 'cancelled')
+
+    def __init__(self):
+        self.results = queue.Queue()
+        self.cancelled = False
+
+
+class _Failure(object):
+    """
+    Is put into results of map() call instead of CrawlResult, when the rest of the results can't arrive
+    (worker has died or the scheduler was closed), so map() raises error instead of waiting forever.
+    """
+    __slots__ = ('error',)
+
+    def __init__(self, error):
+        self.error = error
+
+
+class CrawlSession(object):
+    """
+    Browser session of one worker of CrawlScheduler. It is passed to the job.
+
+    web_driver - Selenium's Web Driver.
+    bmp_proxy - BMP Proxy that web_driver uses or None, if browsermob was not supplied.
+    tasks - how many tasks were finished successfully on this session.
+    """
+    def __init__(self, web_driver, bmp_proxy, stack):
+        self.web_driver = web_driver
+        self.bmp_proxy = bmp_proxy
+        self.tasks = 0
+        self.expired = False
+        self._stack = stack
+
+    def close(self):
+        self._stack.close()
+
+
+class CrawlResult(object):
+    """
+    Outcome of one task.
+
+    task - the task as it was supplied.
+    value - what the job has returned, None if it has failed.
+    error - exception of the last attempt, None on success.
+    attempts - how many times the job was called.
+    elapsed - seconds from the first attempt till the end of the last one.
+    """
+    __slots__ = ('task', 'value', 'error', 'attempts', 'elapsed')
+
+    def __init__(self, task, value, error, attempts, elapsed):
+        self.task = task
+        self.value = value
+        self.error = error
+        self.attempts = attempts
+        self.elapsed = elapsed
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        return f'{type(self).__name__}(task={self.task!r}, ok={self.ok}, attempts={self.attempts}, ' \
+               f'elapsed={self.elapsed:.3f})'
+
+
+class CrawlScheduler(object):
+    """
+    Runs job(session, task) for many tasks over workers concurrent browser sessions.
+    Every worker is a thread that owns one CrawlSession (Web Driver and, optionally, BMP Proxy on the shared
+    BMP Daemon). Browsers are separate processes, so the threads are mostly waiting and scale with the number of
+    the cores.
+
+    Task that fails is retried up to retries times. If task doesn't finish in timeout seconds, the browser is torn
+    down (see teardown_all()), so the job fails with WebDriverException, and the task is failed (or retried).
+    Note: timeout can't interrupt job that hangs without calling the browser.
+    Between tasks the session is reset (see reset_web_driver(), reset_bmp_proxy()), if reset is True.
+    Session is replaced, when it was torn down, when it's reset has failed (for example, the browser has crashed),
+    after max_uses tasks or, if max_rss or max_age is supplied, when the process tree of the browser has grown past
+    max_rss bytes or the session is older than max_age seconds (see ProcessTreeMonitor). Session is replaced only
+    between tasks, the new one is built from the same DriverSpec.
+
+    map() streams CrawlResult as tasks finish. At most max_pending tasks are taken from the iterable ahead
+    (backpressure), so tasks can be lazy generator over huge list of URLs.
+
+    It is designed to be used as context-manager. On exit, all sessions are closed.
+
+    Usage example:
+
+        def job(session, url):
+            set_new_har(session.bmp_proxy, url)
+            session.web_driver.get(url)
+            wait_page_loaded(WebDriverWait(session.web_driver, timeout=70))
+            return session.bmp_proxy.har
+
+        with CrawlScheduler(job, workers=8, timeout=120, retries=2, **dd) as scheduler:
+            for result in scheduler.map(urls):
+                if result.ok:
+                    ...
+
+    :param job: callable job(session, task). It's return value is reported in CrawlResult.value.
+    :param workers: number of concurrent browser sessions. The default value is 4.
+    :param timeout: Optional. How many seconds one attempt of the task can take.
+    :param retries: Optional. How many times failed task is retried. The default value is 0.
+    :param max_pending: Optional. How many tasks can be taken ahead. The default value is 2 * workers.
+    :param max_uses: Optional. After how many tasks session is replaced.
+    :param reset: Optional. Whether to reset session between tasks. The default value is True.
+    :param kill_timeout: Optional. How many seconds tearing down of expired session can take.
+    :param logger: Optional.
+    :param max_rss: Optional. How many bytes process tree of the browser can take before session is replaced.
+    :param max_age: Optional. After how many seconds session is replaced.
+    :param monitor: Optional. ProcessTreeMonitor to use with max_rss/max_age. If not supplied, the scheduler has
+                    it's own one that samples every 5 seconds, it is closed with the scheduler.
+    :param kwargs: the same parameters as SeleniumWebDriver() has (web_driver, browser, driver_spec) and, optionally,
+                   browsermob as BMPProxy() has. If browsermob is supplied, every session has it's own BMP Proxy
+                   and BMP Daemon should be up. Instead of browsermob, bmp_daemon_group (BMPDaemonGroup) may be
+                   supplied, then BMP Proxies are spread over it's BMP Daemons. blocking_profile is applied
+                   to the browser and to BMP Proxy of every session (also after reset), first-party-only profile
+                   should be applied by the job, see apply_blocking_profile().
+    """
+    def __init__(self, job, workers=4, timeout=None, retries=0, max_pending=None, max_uses=None, reset=True,
+                 kill_timeout=10, logger=None, max_rss=None, max_age=None, monitor=None, **kwargs):
+        if workers < 1:
+            raise ValueError(f"Expected positive workers, but got {workers}")
+
+        self.job = job
+        self.workers = workers
+        self.timeout = timeout
+        self.retries = retries
+        self.max_pending = 2 * workers if max_pending is None else max_pending
+        self.max_uses = max_uses
+        self.max_rss = max_rss
+        self.max_age = max_age
+        self.monitor = monitor
+        self._own_monitor = False
+        if (max_rss is not None or max_age is not None) and monitor is None:
+            from ._monitor import ProcessTreeMonitor
+            self.monitor = ProcessTreeMonitor(logger=logger)
+            self._own_monitor = True
+        self.reset = reset
+        self.kill_timeout = kill_timeout
+        self.logger = logging.getLogger(__name__) if logger is None else logger
+
+        driver_spec = kwargs.get('driver_spec', None)
+        self.driver_spec = DriverSpec(**kwargs) if driver_spec is None else driver_spec
+        self.browsermob = kwargs.get('browsermob', None)
+        self.bmp_daemon_group = kwargs.get('bmp_daemon_group', None)
+        blocking_profile = kwargs.get('blocking_profile', None)
+        self.blocking_profile = None if blocking_profile is None else get_blocking_profile(blocking_profile)
+        if self.blocking_profile is not None and self.blocking_profile.first_party_only:
+            raise ValueError(f"Blocking profile {self.blocking_profile.name} depends on the task, "
+                             f"apply it in the job with apply_blocking_profile()")
+
+        self._tasks = queue.Queue()
+        self._threads = []
+        self._lock = threading.Lock()
+        self._calls = set()
+        self._closed = False
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def start(self):
+        """
+        Starts worker threads. Sessions are opened lazily, by the first task of the worker.
+        Workers that have died (see map()) are replaced.
+        """
+        if self._closed:
+            raise ValueError(f"{type(self).__name__} is closed")
+        with self._lock:
+            for i in range(len(self._threads), self.workers):
+                thread = threading.Thread(target=self._work, name=f'crawl-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def map(self, tasks):
+        """
+        Runs job on every task. It should not be called concurrently.
+
+        If the generator is closed before it is exhausted (for example, break out of the for loop), it's tasks that
+        were not started yet are skipped and results of running ones are dropped.
+
+        If the job raises BaseException that is not Exception (for example, SystemExit), the worker dies and
+        the generator raises ValueError, the rest of it's tasks are skipped. The next map() replaces the worker.
+        If the scheduler is closed (for example, from another thread), the generator raises ValueError, after the
+        results of running tasks.
+
+        :param tasks: iterable of tasks. It is consumed lazily.
+        :return: generator of CrawlResult in the order tasks finish.
+        """
+        self.start()
+        call = _MapCall()
+        self._calls.add(call)
+        it = iter(tasks)
+        in_flight = 0
+        exhausted = False
+        try:
+            while True:
+                while not exhausted and in_flight < self.max_pending:
+                    try:
+                        task = next(it)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    self._tasks.put((call, task))
+                    in_flight += 1
+                if in_flight == 0:
+                    return
+                result = call.results.get()
+                if isinstance(result, _Failure):
+                    raise result.error
+                in_flight -= 1
+                yield result
+        finally:
+            call.cancelled = True
+            self._calls.discard(call)
+
+    def close(self):
+        """
+        Drops tasks that were not started yet, waits for running tasks and closes all sessions.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        with contextlib.suppress(queue.Empty):
+            while True:
+                self._tasks.get_nowait()
+        with self._lock:
+            threads = list(self._threads)
+        for _ in threads:
+            self._tasks.put(_STOP)
+        for thread in threads:
+            thread.join()
+        # tasks of running map() were dropped, it shouldn't wait for them
+        for call in list(self._calls):
+            call.results.put(_Failure(ValueError(f"{type(self).__name__} was closed while map() is running")))
+        if self._own_monitor:
+            self.monitor.close()
+
+    def _work(self):
+        session = None
+        try:
+            while True:
+                item = self._tasks.get()
+                if item is _STOP:
+                    return
+                call, task = item
+                if call.cancelled:
+                    continue
+                try:
+                    result, session = self._run_task(task, session)
+                except BaseException as e:
+                    # the session is closed by _run_task()
+                    session = None
+                    with self._lock:
+                        # the next start() replaces this worker
+                        self._threads.remove(threading.current_thread())
+                    error = ValueError(f"Worker {threading.current_thread().name} has died on task {task!r}")
+                    error.__cause__ = e
+                    call.results.put(_Failure(error))
+                    raise
+                call.results.put(result)
+        finally:
+            if session is not None:
+                self._close_session(session)
+
+    def _run_task(self, task, session):
+        start = time.monotonic()
+        error = None
+        attempt = 0
+        try:
+            while attempt <= self.retries:
+                attempt += 1
+                if attempt > 1:
+                    _incr('crawl.retries')
+                try:
+                    if session is None:
+                        session = self._open_session()
+                    with _span('crawl.task'):
+                        value = self._guarded(session, self.job, session, task)
+                    if session.expired:
+                        # the job has finished, but the browser was torn down meanwhile
+                        raise ValueError(f"It takes too much time to run task {task!r}, aborting...")
+                except Exception as e:
+                    error = self._error(session, task, e)
+                    self.logger.debug(f"Task {task!r} failed on attempt {attempt}: {error}")
+                    session = self._recycle(session, failed=True)
+                else:
+                    session.tasks += 1
+                    session = self._recycle(session)
+                    return CrawlResult(task, value, None, attempt, time.monotonic() - start), session
+        except BaseException:
+            # the worker dies, it's session shouldn't outlive it
+            if session is not None:
+                self._close_session(session)
+            raise
+        return CrawlResult(task, None, error, attempt, time.monotonic() - start), session
+
+    def _error(self, session, task, e):
+        if session is not None and session.expired and not isinstance(e, ValueError):
+            error = ValueError(f"It takes too much time to run task {task!r}, aborting...")
+            error.__cause__ = e
+            return error
+        return e
+
+    def _guarded(self, session, f, *args):
+        if self.timeout is None:
+            return f(*args)
+        timer = threading.Timer(self.timeout, self._expire, (session,))
+        timer.daemon = True
+        timer.start()
+        try:
+            return f(*args)
+        finally:
+            timer.cancel()
+
+    def _expire(self, session):
+        session.expired = True
+        _incr('crawl.timeouts')
+        self.logger.warning(f"Task didn't finish in {self.timeout} seconds, tearing down the browser")
+        teardown_all(web_drivers=[session.web_driver], timeout=self.kill_timeout, logger=self.logger)
+
+    def _reset_session(self, session):
+        reset_web_driver(session.web_driver)
+        if session.bmp_proxy is not None:
+            reset_bmp_proxy(session.bmp_proxy)
+            # reset has cleared the blacklist
+            if self.blocking_profile is not None:
+                apply_blocking_profile(session.bmp_proxy, self.blocking_profile)
+
+    def _recycle(self, session, failed=False):
+        """
+        :return: session, if it can be used for the next task, otherwise None (session is closed).
+        """
+        if session is None:
+            return None
+        if not session.expired and (self.max_uses is None or session.tasks < self.max_uses) \
+                and not self._over_limit(session):
+            if not self.reset and not failed:
+                return session
+            try:
+                # after failure the session is reset anyway, this is also it's health check
+                self._guarded(session, self._reset_session, session)
+                if not session.expired:
+                    return session
+            except Exception:
+                self.logger.warning("Failed to reset the session, replacing it", exc_info=True)
+        _incr('crawl.sessions_replaced')
+        self._close_session(session)
+        return None
+
+    def _over_limit(self, session):
+        if self.monitor is None:
+            return False
+        return self.monitor.over_limit(session.web_driver) is not None
+
+    def _open_session(self):
+        with contextlib.ExitStack() as stack:
+            bmp_proxy = None
+            if self.bmp_daemon_group is not None:
+                bmp_proxy = stack.enter_context(self.bmp_daemon_group.proxy(blocking_profile=self.blocking_profile))
+            elif self.browsermob is not None:
+                bmp_proxy = stack.enter_context(BMPProxy(browsermob=self.browsermob,
+                                                         blocking_profile=self.blocking_profile))
+            web_driver = stack.enter_context(SeleniumWebDriver(driver_spec=self.driver_spec,
+                                                               browsermobproxy=bmp_proxy))
+            if self.monitor is not None:
+                self.monitor.watch(web_driver, max_rss=self.max_rss, max_age=self.max_age)
+                stack.callback(self.monitor.unwatch, web_driver)
+            return CrawlSession(web_driver, bmp_proxy, stack.pop_all())
+
+    def _close_session(self, session):
+        try:
+            session.close()
+        except Exception:
+            # torn down session fails to quit, it's expected
+            if not session.expired:
+                self.logger.warning("Failed to close the session", exc_info=True)
+
+
+def crawl(tasks, job, workers=4, **kwargs):
+    """
+    Convenient wrapper of CrawlScheduler. Runs job(session, task) on every task over workers concurrent
+    browser sessions and closes them at the end.
+
+    Usage example:
+
+        for result in crawl(urls, job, workers=8, timeout=120, retries=2, **dd):
+            ...
+
+    :param tasks: iterable of tasks.
+    :param job: callable job(session, task).
+    :param workers: number of concurrent browser sessions.
+    :param kwargs: see CrawlScheduler.
+    :return: generator of CrawlResult in the order tasks finish.
+    """
+    with CrawlScheduler(job, workers=workers, **kwargs) as scheduler:
+        yield from scheduler.map(tasks)
@@ -0,0 +1,159 @@
+import errno
+import hashlib
+import logging
+import os
+import shutil
+import threading
+import uuid
+from contextlib import suppress
+from zipfile import ZipFile
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+
+# see linux/fs.h, _IOW(0x94, 9, int)
+_FICLONE = 0x40049409
+
+_REFLINK_UNSUPPORTED = (errno.EOPNOTSUPP, errno.ENOTTY, errno.EXDEV, errno.EINVAL, errno.EPERM, errno.ENOSYS)
+
+_template_keys = {}
+_template_keys_lock = threading.Lock()
+
+
+def _template_key(template):
+    """
+    Content-addressed key of the template, based on it's sha256 hash and mtime.
+    The hash is calculated only once per (path, size, mtime) in the process.
+    """
+    st = os.stat(template)
+    stat_key = (os.path.realpath(template), st.st_size, st.st_mtime_ns)
+    with _template_keys_lock:
+        key = _template_keys.get(stat_key, None)
+    if key is None:
+        h = hashlib.sha256()
+        with open(template, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                h.update(chunk)
+        key = f'{h.hexdigest()[:32]}-{st.st_mtime_ns}'
+        with _template_keys_lock:
+            _template_keys[stat_key] = key
+    return key
+
+
+def _tree_size(path):
+    size = 0
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            with suppress(OSError):
+                size += os.lstat(os.path.join(dirpath, filename)).st_size
+    return size
+
+
+def _evict(cache_dir, max_size, keep, logger):
+    """
+    Removes least recently used extracted templates from cache_dir till it's size is less than max_size.
+    Entry keep is never removed.
+    """
+    entries = []
+    with os.scandir(cache_dir) as it:
+        for entry in it:
+            # skip in-progress extractions
+            if entry.is_dir(follow_symlinks=False) and '.tmp-' not in entry.name:
+                entries.append((entry.stat(follow_symlinks=False).st_mtime, entry.path))
+
+    sized = [(mtime, path, _tree_size(path)) for mtime, path in entries]
+    total = sum(size for _, _, size in sized)
+    for _, path, size in sorted(sized):
+        if total <= max_size:
+            break
+        if os.path.basename(path) == keep:
+            continue
+        logger.debug(f"Evicting {path} from template cache")
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
+
+
+def _extract_template_cached(template, cache_dir, max_size=None, logger=None):
+    """
+    Extracts template into cache_dir only once.
+
+    Extraction is made into temporary directory that is atomically renamed, so concurrent sessions
+    (also from different processes) never see partially extracted template.
+
+    :return: directory with extracted content from template.
+    """
+    if logger is None:
+        logger = logging.getLogger(__name__)
+
+    key = _template_key(template)
+    cached = os.path.join(cache_dir, key)
+
+    if os.path.isdir(cached):
+        # used for LRU eviction
+        with suppress(OSError):
+            os.utime(cached)
+        return cached
+
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = os.path.join(cache_dir, f'{key}.tmp-{uuid.uuid4().hex}')
+    try:
+        with ZipFile(template, 'r') as zipObj:
+            zipObj.extractall(tmp)
+        try:
+            os.rename(tmp, cached)
+        except OSError:
+            # another session has extracted the same template meanwhile
+            if not os.path.isdir(cached):
+                raise
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    if max_size is not None:
+        _evict(cache_dir, max_size, key, logger)
+    return cached
+
+
+def _copy_tree(src, dst, copy_mode='auto'):
+    """
+    Copies content of src directory into existing dst directory.
+
+    :param copy_mode: 'auto' - try reflink (copy-on-write clone, Linux only), fallback to regular copy.
+                      'hardlink' - hardlink files, fallback to regular copy. Note, that if browser modifies
+                                   file in place, the cached template will be changed also.
+                      'copy' - regular copy.
+    """
+    if copy_mode not in ('auto', 'hardlink', 'copy'):
+        raise ValueError(f"Unknown copy_mode {copy_mode}")
+
+    # once the file system has refused, we're not trying again
+    state = {'mode': copy_mode}
+    if copy_mode == 'auto' and fcntl is None:
+        state['mode'] = 'copy'
+
+    def reflink(s, d):
+        with open(s, 'rb') as fsrc, open(d, 'wb') as fdst:
+            fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+        shutil.copystat(s, d)
+
+    def copy_function(s, d):
+        mode = state['mode']
+        if mode == 'auto':
+            try:
+                reflink(s, d)
+                return d
+            except OSError as e:
+                if e.errno not in _REFLINK_UNSUPPORTED:
+                    raise
+                state['mode'] = 'copy'
+        elif mode == 'hardlink':
+            try:
+                os.link(s, d)
+                return d
+            except OSError:
+                state['mode'] = 'copy'
+        return shutil.copy2(s, d)
+
+    shutil.copytree(src, dst, symlinks=True, copy_function=copy_function, dirs_exist_ok=True)
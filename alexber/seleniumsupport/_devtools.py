@@ -0,0 +1,240 @@
+import base64
+import itertools
+import json
+import logging
+import os
+import socket
+import struct
+import threading
+from concurrent.futures import Future
+from urllib.parse import urlsplit
+from urllib.request import urlopen
+
+# see https://tools.ietf.org/html/rfc6455#section-5.2
+_OP_CONTINUATION = 0x0
+_OP_TEXT = 0x1
+_OP_CLOSE = 0x8
+_OP_PING = 0x9
+_OP_PONG = 0xA
+
+
+class _WebSocket(object):
+    """
+    Minimal client side of WebSocket, enough to talk to Chrome DevTools. No extensions, no TLS.
+    """
+    def __init__(self, url, timeout=10):
+        parts = urlsplit(url)
+        self.sock = socket.create_connection((parts.hostname, parts.port or 80), timeout=timeout)
+        try:
+            self._handshake(parts, timeout)
+        except BaseException:
+            self.sock.close()
+            raise
+        self._send_lock = threading.Lock()
+
+    def _handshake(self, parts, timeout):
+        key = base64.b64encode(os.urandom(16)).decode('ascii')
+        path = parts.path + (f'?{parts.query}' if parts.query else '')
+        # no Origin header, Chrome rejects WebSocket connection from unknown origin
+        request = f'GET {path} HTTP/1.1\r\nHost: {parts.netloc}\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n' \
+                  f'Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n'
+        self.sock.sendall(request.encode('ascii'))
+        response = b''
+        while b'\r\n\r\n' not in response:
+            chunk = self.sock.recv(4096)
+            if not chunk:
+                raise ConnectionError("WebSocket handshake failed, connection was closed")
+            response += chunk
+        status_line = response.split(b'\r\n', 1)[0]
+        if status_line.split()[1:2] != [b'101']:
+            raise ConnectionError(f"WebSocket handshake failed, {status_line.decode('latin-1')}")
+        # after the handshake reader blocks till the next message
+        self.sock.settimeout(None)
+
+    def _recv_exactly(self, n):
+        buf = bytearray()
+        while len(buf) < n:
+            chunk = self.sock.recv(n - len(buf))
+            if not chunk:
+                raise ConnectionError("WebSocket connection was closed")
+            buf += chunk
+        return bytes(buf)
+
+    def _send_frame(self, opcode, payload):
+        header = bytearray([0x80 | opcode])
+        length = len(payload)
+        # client frames are always masked
+        if length < 126:
+            header.append(0x80 | length)
+        elif length < 1 << 16:
+            header.append(0x80 | 126)
+            header += struct.pack('>H', length)
+        else:
+            header.append(0x80 | 127)
+            header += struct.pack('>Q', length)
+        mask = os.urandom(4)
+        repeated = (mask * (length // 4 + 1))[:length]
+        masked = (int.from_bytes(payload, 'big') ^ int.from_bytes(repeated, 'big')).to_bytes(length, 'big')
+        with self._send_lock:
+            self.sock.sendall(bytes(header) + mask + masked)
+
+    def send(self, text):
+        self._send_frame(_OP_TEXT, text.encode('utf-8'))
+
+    def recv(self):
+        """
+        :return: next text message. ConnectionError is raised, when connection is closed.
+        """
+        message = bytearray()
+        while True:
+            first, second = self._recv_exactly(2)
+            opcode = first & 0x0F
+            length = second & 0x7F
+            if length == 126:
+                length = struct.unpack('>H', self._recv_exactly(2))[0]
+            elif length == 127:
+                length = struct.unpack('>Q', self._recv_exactly(8))[0]
+            if second & 0x80:
+                mask = self._recv_exactly(4)
+                data = bytes(b ^ mask[i % 4] for i, b in enumerate(self._recv_exactly(length)))
+            else:
+                data = self._recv_exactly(length)
+
+            if opcode == _OP_PING:
+                self._send_frame(_OP_PONG, data)
+                continue
+            if opcode == _OP_CLOSE:
+                raise ConnectionError("WebSocket connection was closed by the peer")
+            if opcode in (_OP_TEXT, _OP_CONTINUATION):
+                message += data
+                if first & 0x80:
+                    return message.decode('utf-8')
+
+    def close(self):
+        try:
+            self._send_frame(_OP_CLOSE, b'')
+        except OSError:
+            pass
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+
+def _debugger_address(web_driver):
+    """
+    Chromium based Web Drivers report address of DevTools in the capabilities, for example, 'localhost:40453'.
+    """
+    capabilities = getattr(web_driver, 'capabilities', None) or {}
+    for key in ('goog:chromeOptions', 'ms:edgeOptions'):
+        address = (capabilities.get(key, None) or {}).get('debuggerAddress', None)
+        if address:
+            return address
+    return None
+
+
+class DevToolsConnection(object):
+    """
+    Connection to the browser's target of Chrome DevTools Protocol.
+    Commands are sent with call(), events are delivered to on_event(method, params) in the reader thread,
+    so on_event should be quick.
+
+    :param ws_url: webSocketDebuggerUrl of the target.
+    :param on_event: Optional. callable on_event(method, params).
+    :param timeout: Optional. How many seconds to wait for connection and for result of call().
+    :param logger: Optional.
+    """
+    def __init__(self, ws_url, on_event=None, timeout=10, logger=None):
+        self.timeout = timeout
+        self.logger = logging.getLogger(__name__) if logger is None else logger
+        self._on_event = on_event
+        self._ids = itertools.count(1)
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._closed = False
+        self._ws = _WebSocket(ws_url, timeout)
+        self._reader = threading.Thread(target=self._read, name='devtools-reader', daemon=True)
+        self._reader.start()
+
+    @classmethod
+    def for_web_driver(cls, web_driver, on_event=None, timeout=10, logger=None):
+        """
+        Connects to DevTools of the browser of (Chromium based) web_driver.
+        The browser should be reachable from this machine, for Remote Web Driver it is usually not the case.
+
+        :return: DevToolsConnection
+        :raises ValueError: if web_driver doesn't report DevTools address.
+        :raises OSError: if DevTools is not reachable.
+        """
+        address = _debugger_address(web_driver)
+        if address is None:
+            raise ValueError(f"{type(web_driver).__name__} doesn't report DevTools address")
+        with urlopen(f'http://{address}/json/version', timeout=timeout) as resp:
+            ws_url = json.load(resp)['webSocketDebuggerUrl']
+        return cls(ws_url, on_event=on_event, timeout=timeout, logger=logger)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def call(self, method, params=None, timeout=None):
+        """
+        Sends command and waits for it's result.
+
+        :param method: for example, 'Browser.setDownloadBehavior'.
+        :param params: Optional. dict.
+        :param timeout: Optional. The default value is timeout of the connection.
+        :return: result dict.
+        :raises ValueError: if DevTools returns an error.
+        """
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise ValueError(f"{type(self).__name__} is closed")
+            message_id = next(self._ids)
+            self._pending[message_id] = future
+        try:
+            self._ws.send(json.dumps({'id': message_id, 'method': method, 'params': params or {}}))
+            return future.result(self.timeout if timeout is None else timeout)
+        finally:
+            with self._lock:
+                self._pending.pop(message_id, None)
+
+    def _read(self):
+        try:
+            while True:
+                message = json.loads(self._ws.recv())
+                if 'id' in message:
+                    with self._lock:
+                        future = self._pending.get(message['id'], None)
+                    if future is None:
+                        continue
+                    if 'error' in message:
+                        future.set_exception(ValueError(f"DevTools error {message['error']}"))
+                    else:
+                        future.set_result(message.get('result', {}))
+                elif self._on_event is not None:
+                    try:
+                        self._on_event(message.get('method'), message.get('params', {}))
+                    except Exception:
+                        self.logger.warning(f"Failed to handle DevTools event {message.get('method')}",
+                                            exc_info=True)
+        except (OSError, ValueError) as e:
+            if not self._closed:
+                self.logger.debug(f"DevTools connection is closed ({e})")
+        finally:
+            with self._lock:
+                self._closed = True
+                pending = list(self._pending.values())
+            for future in pending:
+                if not future.done():
+                    future.set_exception(ConnectionError("DevTools connection is closed"))
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+        self._ws.close()
+        self._reader.join(self.timeout)
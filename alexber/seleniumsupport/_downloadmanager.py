@@ -0,0 +1,332 @@
+import contextlib
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait as wait_futures
+from pathlib import Path
+
+from ._impl import enable_chrome_download
+from ._devtools import DevToolsConnection
+from ._downloads import _create_inotify, _CRDOWNLOAD
+
+# Chrome's temporary names of the downloads in progress
+_TEMPORARY_PREFIXES = ('.com.google.Chrome.', '.org.chromium.Chromium.', 'Unconfirmed ')
+
+
+def _is_temporary(name):
+    return name.endswith(_CRDOWNLOAD) or name.startswith(_TEMPORARY_PREFIXES)
+
+
+def _claim_path(directory, file_name):
+    """
+    Finds free name as browser does ("report.pdf" -> "report (1).pdf") and claims it by creating empty file
+    exclusively, so parallel finishers never pick the same name. Caller replaces the empty file.
+    """
+    file_name = os.path.basename(file_name) or 'download'
+    path = Path(directory, file_name)
+    stem, suffix = path.stem, path.suffix
+    i = 1
+    while True:
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return path
+        except FileExistsError:
+            path = Path(directory, f'{stem} ({i}){suffix}')
+            i += 1
+
+
+class Download(Future):
+    """
+    Future of one download. result() returns Path of the downloaded file.
+    If the download was canceled by the browser, result() raises ValueError.
+
+    guid, url, suggested_filename - as browser reports them (None, if DevTools events are not available).
+    received_bytes, total_bytes - progress (total_bytes is None, if unknown).
+    started_at, finished_at - time.monotonic() when the download began (or was expected) and finished.
+    checksum - hex digest of the file, if DownloadManager was created with checksum.
+    """
+    def __init__(self):
+        super().__init__()
+        self.guid = None
+        self.url = None
+        self.suggested_filename = None
+        self.path = None
+        self.received_bytes = 0
+        self.total_bytes = None
+        self.started_at = time.monotonic()
+        self.finished_at = None
+        self.checksum = None
+
+    @property
+    def size(self):
+        """
+        Final size in bytes, None, if download is not finished.
+        """
+        return self.received_bytes if self.finished_at is not None else None
+
+    @property
+    def bytes_per_sec(self):
+        """
+        Average speed of the download (till now, if it is not finished).
+        """
+        elapsed = (time.monotonic() if self.finished_at is None else self.finished_at) - self.started_at
+        return self.received_bytes / elapsed if elapsed > 0 else None
+
+    def __repr__(self):
+        return f'{type(self).__name__}(guid={self.guid!r}, suggested_filename={self.suggested_filename!r}, ' \
+               f'received_bytes={self.received_bytes}, total_bytes={self.total_bytes}, path={self.path!r}, ' \
+               f'done={self.done()})'
+
+
+class DownloadManager(object):
+    """
+    Gives Web Driver (Chromium based) it's own isolated download directory and tracks downloads as futures.
+
+    If DevTools of the browser is reachable (local Web Driver), Browser.setDownloadBehavior with events is used.
+    Browser.downloadWillBegin / Browser.downloadProgress events report progress, and the future is resolved as soon as
+    browser reports that the download is completed. Every download is saved under unique name (browser's guid) and then
+    renamed to suggested file name, so parallel downloads of the files with the same name don't clash.
+
+    Otherwise (for example, Remote Web Driver), enable_chrome_download() is used and the download directory is watched
+    (inotify on Linux, polling elsewhere). In this mode only completion is reported: every new file in the directory
+    resolves the oldest expected download.
+
+    It is designed to be used as context-manager. On exit, the download directory is removed, unless it was
+    supplied as downloads_dir.
+
+    Usage example:
+
+        with DownloadManager(web_driver, checksum='sha256') as downloads:
+            download = downloads.expect()
+            web_driver.find_element(By.ID, 'export').click()
+            path = download.result(timeout=400)
+            shutil.move(path, target)
+
+    :param web_driver:
+    :param downloads_dir: Optional. Directory to download to. If not supplied, temporary directory is created
+                          (in base_dir) and it is removed on close().
+    :param base_dir: Optional. Where to create temporary download directory. The default is tempfile.gettempdir().
+    :param events: Optional. Whether to try DevTools events. The default value is True.
+    :param checksum: Optional. Name of hashlib's algorithm, for example 'sha256'. If supplied, Download.checksum
+                     is calculated before the future is resolved.
+    :param poll_interval: Optional. How often the directory is checked, when events are not available.
+    :param timeout: Optional. How many seconds to wait for DevTools.
+    :param logger: Optional.
+    """
+    def __init__(self, web_driver, downloads_dir=None, base_dir=None, events=True, checksum=None,
+                 poll_interval=0.5, timeout=10, logger=None):
+        if checksum is not None:
+            # fails fast on unknown algorithm
+            hashlib.new(checksum)
+        self.web_driver = web_driver
+        self.checksum = checksum
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.logger = logging.getLogger(__name__) if logger is None else logger
+
+        self._use_events = events
+        self._owns_dir = downloads_dir is None
+        self._base_dir = base_dir
+        self.downloads_dir = None if downloads_dir is None else Path(downloads_dir)
+
+        self._lock = threading.Lock()
+        self._expected = deque()
+        self._by_guid = {}
+        self._downloads = []
+        self._devtools = None
+        self._watcher = None
+        self._stopped = threading.Event()
+        self._finisher = None
+
+    @property
+    def events(self):
+        """
+        True, if DevTools events are used.
+        """
+        return self._devtools is not None
+
+    @property
+    def downloads(self):
+        """
+        All downloads that were expected or observed, in the order they were expected/observed.
+        """
+        with self._lock:
+            return list(self._downloads)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def start(self):
+        if self.downloads_dir is None:
+            self.downloads_dir = Path(tempfile.mkdtemp(prefix='downloads_', dir=self._base_dir))
+        else:
+            self.downloads_dir.mkdir(parents=True, exist_ok=True)
+        # checksum and renaming are done outside of DevTools' reader thread
+        self._finisher = ThreadPoolExecutor(max_workers=2, thread_name_prefix='download-finisher')
+
+        if self._use_events:
+            try:
+                self._devtools = DevToolsConnection.for_web_driver(self.web_driver, self._on_event, self.timeout,
+                                                                   self.logger)
+                self._devtools.call('Browser.setDownloadBehavior',
+                                    {'behavior': 'allowAndName', 'downloadPath': str(self.downloads_dir),
+                                     'eventsEnabled': True})
+                return
+            except (OSError, ValueError, KeyError, FutureTimeoutError) as e:
+                self.logger.debug(f"DevTools events are not available ({e}), watching {self.downloads_dir}")
+                if self._devtools is not None:
+                    self._devtools.close()
+                    self._devtools = None
+
+        enable_chrome_download(self.web_driver, str(self.downloads_dir))
+        # files that are already in downloads_dir are not downloads
+        with os.scandir(self.downloads_dir) as it:
+            known = {entry.name for entry in it}
+        self._watcher = threading.Thread(target=self._watch, args=(known,), name='download-watcher', daemon=True)
+        self._watcher.start()
+
+    def expect(self):
+        """
+        Registers expectation of the next download. Call it before the action that triggers the download.
+
+        :return: Download (future).
+        """
+        download = Download()
+        with self._lock:
+            self._expected.append(download)
+            self._downloads.append(download)
+        return download
+
+    def wait_all(self, timeout=None):
+        """
+        Waits for all downloads that were expected or observed.
+
+        :param timeout: Optional. How many seconds to wait. None means wait forever.
+        :return: list of Download that are not done yet.
+        """
+        done, not_done = wait_futures(self.downloads, timeout=timeout)
+        return list(not_done)
+
+    def _begin(self, key):
+        # caller holds the lock
+        download = None
+        while self._expected:
+            candidate = self._expected.popleft()
+            if candidate.set_running_or_notify_cancel():
+                download = candidate
+                break
+        if download is None:
+            download = Download()
+            download.set_running_or_notify_cancel()
+            self._downloads.append(download)
+        self._by_guid[key] = download
+        return download
+
+    def _on_event(self, method, params):
+        if method == 'Browser.downloadWillBegin':
+            with self._lock:
+                download = self._begin(params['guid'])
+            download.guid = params['guid']
+            download.url = params.get('url', None)
+            download.suggested_filename = params.get('suggestedFilename', None)
+            download.started_at = time.monotonic()
+        elif method == 'Browser.downloadProgress':
+            with self._lock:
+                download = self._by_guid.get(params['guid'], None)
+            if download is None:
+                return
+            download.received_bytes = params.get('receivedBytes', download.received_bytes)
+            total = params.get('totalBytes', 0)
+            download.total_bytes = total if total > 0 else None
+            state = params.get('state', None)
+            if state == 'completed':
+                download.finished_at = time.monotonic()
+                self._finisher.submit(self._finish, download, Path(self.downloads_dir, download.guid),
+                                      download.suggested_filename or download.guid)
+            elif state == 'canceled':
+                download.finished_at = time.monotonic()
+                download.set_exception(ValueError(f"Download {download.url} was canceled"))
+
+    def _finish(self, download, path, file_name=None):
+        try:
+            final = path
+            if file_name is not None:
+                final = _claim_path(self.downloads_dir, file_name)
+                try:
+                    os.replace(path, final)
+                except BaseException:
+                    with contextlib.suppress(OSError):
+                        os.unlink(final)
+                    raise
+            download.path = final
+            download.received_bytes = final.stat().st_size
+            if self.checksum is not None:
+                digest = hashlib.new(self.checksum)
+                with open(final, 'rb') as f:
+                    for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                        digest.update(chunk)
+                download.checksum = digest.hexdigest()
+            download.set_result(final)
+        except Exception as e:
+            download.set_exception(e)
+
+    def _watch(self, known):
+        inotify = _create_inotify(self.downloads_dir, self.logger)
+        try:
+            while not self._stopped.is_set():
+                with os.scandir(self.downloads_dir) as it:
+                    names = {entry.name for entry in it}
+                for name in sorted(names - known):
+                    if _is_temporary(name):
+                        continue
+                    path = Path(self.downloads_dir, name)
+                    try:
+                        size = path.stat().st_size
+                    except FileNotFoundError:
+                        # it was moved or removed meanwhile, it doesn't resolve expected download
+                        continue
+                    known.add(name)
+                    with self._lock:
+                        download = self._begin(name)
+                    download.suggested_filename = name
+                    download.finished_at = time.monotonic()
+                    download.received_bytes = size
+                    self._finisher.submit(self._finish, download, path)
+                known &= names
+
+                if inotify is not None:
+                    inotify.wait(self.poll_interval)
+                else:
+                    self._stopped.wait(self.poll_interval)
+        finally:
+            if inotify is not None:
+                inotify.close()
+
+    def close(self):
+        """
+        Stops tracking. Downloads that are not finished yet fail with ValueError.
+        If the download directory was created by DownloadManager, it is removed.
+        """
+        self._stopped.set()
+        if self._devtools is not None:
+            self._devtools.close()
+        if self._watcher is not None:
+            self._watcher.join()
+        if self._finisher is not None:
+            self._finisher.shutdown(wait=True)
+
+        for download in self.downloads:
+            if not download.done():
+                download.set_exception(ValueError("DownloadManager was closed before the download has finished"))
+
+        if self._owns_dir and self.downloads_dir is not None:
+            shutil.rmtree(self.downloads_dir, ignore_errors=True)
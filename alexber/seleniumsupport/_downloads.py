@@ -0,0 +1,161 @@
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import sys
+import time
+from contextlib import suppress
+from pathlib import Path
+
+from ._metrics import _span, _incr
+
+# see sys/inotify.h
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+
+_IN_MASK = _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE
+
+_CRDOWNLOAD = '.crdownload'
+
+
+class _Inotify(object):
+    """
+    Minimal inotify binding (Linux only) that watches single directory.
+    """
+    _libc = None
+
+    def __init__(self, path):
+        if _Inotify._libc is None:
+            _Inotify._libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        libc = _Inotify._libc
+
+        self.fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        if libc.inotify_add_watch(self.fd, os.fsencode(path), _IN_MASK) < 0:
+            err = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(err, os.strerror(err))
+
+    def wait(self, timeout):
+        """
+        Waits till some event will occur in the watched directory or timeout seconds.
+        All pending events are drained.
+        """
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return False
+        self.drain()
+        return True
+
+    def drain(self):
+        """
+        Discards all pending events.
+        """
+        with suppress(BlockingIOError):
+            while os.read(self.fd, 64 * 1024):
+                pass
+
+    def close(self):
+        os.close(self.fd)
+
+
+def _create_inotify(path, logger):
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        return _Inotify(path)
+    except (OSError, AttributeError) as e:
+        # for example, ENOSPC when max_user_watches is exceeded
+        logger.debug(f"inotify is not available ({e}), falling back to polling")
+        return None
+
+
+def _pending_downloads(p, file_names):
+    """
+    File is considered as downloaded, if it is present in p and there is no file_name*.crdownload.
+    If p doesn't exist yet (browser creates it on the first download), all files are pending.
+    """
+    try:
+        with os.scandir(p) as it:
+            names = {entry.name for entry in it}
+    except FileNotFoundError:
+        return list(file_names)
+    crdownloads = [name for name in names if name.endswith(_CRDOWNLOAD)]
+    return [file_name for file_name in file_names
+            if file_name not in names or any(name.startswith(file_name) for name in crdownloads)]
+
+
+def wait_chrome_files_finished_downloads(file_names, downloadsPath, timeout=400, poll_interval=0.05,
+                                         max_poll_interval=1, logger=None):
+    """
+    This is Google Chrome specific function.
+    It is event-driven alternative to wait_chrome_file_finished_downloades().
+
+    It relies on Google Chrome following internal mechanism: when Google Chrome downloads file, it has extension
+    ".crdownload". When downloads is finished it Google Chrome rename the file removing this extension.
+
+    On Linux, inotify is used to be notified on changes in downloadsPath, so we return as soon as the last file
+    was renamed. On other platforms (or if inotify is not available) adaptive polling is used: we start with
+    poll_interval and double it up to max_poll_interval.
+    Even with inotify, downloadsPath is consulted at least every max_poll_interval seconds (for example, inotify
+    doesn't report changes on network file systems).
+
+    :param file_names: name of the file or list of names to wait for. You should know them beforehand.
+    :param downloadsPath: the download's folder of the browser. Typically, /home/<YOUR_USERNAME>/Downloads
+    :param timeout: overall timeout in seconds.
+    :param poll_interval: initial polling interval in seconds.
+    :param max_poll_interval: maximum polling interval in seconds.
+    :param logger:
+    :return: list of Path of downloaded files in the order of file_names.
+    """
+    if logger is None:
+        logger = logging.getLogger(__name__)
+    logger.info("wait_chrome_files_finished_downloads()")
+
+    if isinstance(file_names, str):
+        file_names = [file_names]
+
+    p = Path(downloadsPath)
+    deadline = time.monotonic() + timeout
+
+    # closing inotify's file descriptor takes few milliseconds, so we don't create it if there is nothing to wait for
+    if not _pending_downloads(p, file_names):
+        return [Path(p, file_name) for file_name in file_names]
+
+    inotify = _create_inotify(p, logger)
+    try:
+        with _span('wait_chrome_files_finished_downloads', inotify=inotify is not None):
+            _wait_downloads(p, file_names, deadline, inotify, poll_interval, max_poll_interval, logger)
+    finally:
+        if inotify is not None:
+            inotify.close()
+
+    return [Path(p, file_name) for file_name in file_names]
+
+
+def _wait_downloads(p, file_names, deadline, inotify, poll_interval, max_poll_interval, logger):
+    interval = poll_interval
+    # the watch is established before the first check, so we can't miss the rename
+    pending = _pending_downloads(p, file_names)
+    while pending:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise ValueError(f"It takes too much time to download the files {pending}, aborting...")
+        logger.debug(f'{pending} are still downloaded')
+
+        if inotify is not None:
+            inotify.wait(min(remaining, max_poll_interval))
+        else:
+            time.sleep(min(remaining, interval))
+            interval = min(interval * 2, max_poll_interval)
+
+        _incr('wait_chrome_files_finished_downloads.polls')
+        pending = _pending_downloads(p, pending)
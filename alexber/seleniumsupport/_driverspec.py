@@ -0,0 +1,148 @@
+from importlib import import_module
+
+from ._metrics import _span
+
+
+class DriverSpec(object):
+    """
+    web_driver and browser dicts of SeleniumWebDriver() that are validated and compiled once:
+    Web Driver's and Options' classes are resolved and options' arguments are collected.
+    Then create() builds Selenium's Web Driver without repeating this work.
+
+    It is useful when many Web Drivers are created from the same parameters, for example, in short-lived workers
+    or in WebDriverPool.
+
+    Usage example:
+
+        driver_spec = DriverSpec(**dd)  # or DriverSpec(web_driver=dd['web_driver'], browser=dd['browser'])
+        with SeleniumWebDriver(driver_spec=driver_spec, browsermobproxy=bmp_proxy) as web_driver:
+            ...
+
+    If parameters are invalid, ValueError is raised here and not when Web Driver is created.
+
+    :param web_driver: dict, see SeleniumWebDriver().
+    :param browser: Optional. dict, see SeleniumWebDriver().
+    :param connection_pool: Optional. Only for Remote Web Driver. RemoteConnectionPool to send commands through.
+                            Instead, web_driver dict may have connection_pool dict with RemoteConnectionPool's
+                            parameters, then the pool is shared by all Web Drivers with the same command_executor,
+                            see RemoteConnectionPool.shared().
+    :param blocking_profile: Optional. name of one of BLOCKING_PROFILES or BlockingProfile. Chrome's arguments and
+                             prefs of the profile are added, see BlockingProfile.chrome_arguments().
+    :param kwargs: ignored, so you can pass the same dict as to SeleniumWebDriver().
+    """
+    def __init__(self, web_driver=None, browser=None, connection_pool=None, blocking_profile=None, **kwargs):
+        if web_driver is None:
+            raise ValueError("Expected 'web_driver' param not found")
+        name = web_driver.get('name', None)
+        if name is None:
+            raise ValueError("Expected 'name' in 'web_driver' param")
+        browser = {} if browser is None else browser
+
+        self.name = name
+        self.executable_path = web_driver.get('path', None)
+        self.command_executor = web_driver.get('command_executor', None)
+        if self.executable_path is None and self.command_executor is None:
+            raise ValueError("Expected 'path' or 'command_executor' in 'web_driver' param")
+        self.log_file = web_driver.get('log_file', None)
+        self.browser_executable_path = browser.get('path', None)
+        self.arguments = tuple(web_driver.get('arguments', []))
+        self.experimental_options = dict(web_driver.get('experimental_options', {}))
+        if blocking_profile is not None:
+            self._add_blocking_profile(blocking_profile)
+
+        connection_pool_d = web_driver.get('connection_pool', None)
+        if (connection_pool is not None or connection_pool_d is not None) and self.executable_path is not None:
+            raise ValueError("connection_pool is supported only for Remote Web Driver ('command_executor')")
+        if connection_pool is None and connection_pool_d is not None:
+            from ._remote import RemoteConnectionPool
+            try:
+                connection_pool = RemoteConnectionPool.shared(self.command_executor, **connection_pool_d)
+            except TypeError as e:
+                raise ValueError(f"Unsupported connection_pool's parameters {connection_pool_d}") from e
+        self.connection_pool = connection_pool
+
+        # #insipired by https://github.com/clemfromspace/scrapy-selenium/blob/develop/scrapy_selenium/middlewares.py
+        web_driver_base_path = f"selenium.webdriver.{name}"
+        try:
+            self._options_klass = getattr(import_module(f"{web_driver_base_path}.options"), 'Options')
+            if self.executable_path is not None:
+                self._web_driver_klass = getattr(import_module(f"{web_driver_base_path}.webdriver"), 'WebDriver')
+            else:
+                from selenium import webdriver
+                self._web_driver_klass = webdriver.Remote
+        except (ImportError, AttributeError) as e:
+            raise ValueError(f"Unsupported web_driver's name {name}") from e
+
+        try:
+            self.options()
+        except AttributeError as e:
+            # for example, Firefox's Options don't support experimental_options
+            raise ValueError(f"Unsupported options for web_driver's name {name}") from e
+
+    def _add_blocking_profile(self, blocking_profile):
+        from ._blocking import get_blocking_profile
+        profile = get_blocking_profile(blocking_profile)
+        if self.name != 'chrome':
+            raise ValueError(f"Blocking profile is supported only for web_driver's name chrome, but got {self.name}")
+        self.arguments += tuple(profile.chrome_arguments())
+        prefs = profile.chrome_prefs()
+        if prefs:
+            self.experimental_options['prefs'] = {**prefs, **self.experimental_options.get('prefs', {})}
+
+    def options(self, browsermobproxy=None):
+        """
+        Builds new Options object for one Web Driver.
+
+        :param browsermobproxy: Optional. BMP Proxy that Web Driver should use.
+        :return: Options of the Web Driver.
+        """
+        options = self._options_klass()
+        if self.browser_executable_path:
+            options.binary_location = self.browser_executable_path
+        for argument in self.arguments:
+            options.add_argument(argument)
+        if browsermobproxy:
+            options.add_argument(f'--proxy-server={browsermobproxy.proxy}')
+        for key, value in self.experimental_options.items():
+            options.add_experimental_option(key, value)
+        return options
+
+    def create(self, browsermobproxy=None):
+        """
+        Creates Selenium's Web Driver.
+        It is caller responsibility to close web_driver, see closeSeleniumWebDriver().
+
+        :param browsermobproxy: Optional. BMP Proxy that Web Driver should use.
+        :return: web_driver
+        """
+        options = self.options(browsermobproxy)
+
+        # locally installed driver
+        if self.executable_path is not None:
+            web_driver_kwargs = {
+                'executable_path': self.executable_path,
+                "options": options,
+                "service_log_path": self.log_file,
+            }
+        # remote driver
+        else:
+            web_driver_kwargs = {
+                'command_executor': self.command_executor if self.connection_pool is None
+                else self.connection_pool.connection(),
+                'desired_capabilities': options.to_capabilities()
+            }
+
+        with _span('web_driver.create', browser=self.name, remote=self.executable_path is None):
+            web_driver = self._web_driver_klass(**web_driver_kwargs)
+
+        if self.executable_path is not None:
+            # psutil is imported only for local Web Driver
+            from ._teardown import _record_process_tree, _web_driver_pid
+            pid = _web_driver_pid(web_driver)
+            if pid is not None:
+                _record_process_tree(web_driver, pid)
+        return web_driver
+
+    def __repr__(self):
+        return f'{type(self).__name__}(name={self.name!r}, path={self.executable_path!r}, ' \
+               f'command_executor={self.command_executor!r})'
@@ -0,0 +1,209 @@
+import codecs
+import contextlib
+import json
+import re
+
+import requests
+
+_CHUNK_SIZE = 1024 * 1024
+
+_STRUCTURAL = re.compile(r'[\[\]{}",]')
+_STRING_SPECIAL = re.compile(r'["\\]')
+
+
+def _har_url(bmp_proxy):
+    return f'{bmp_proxy.host}/proxy/{bmp_proxy.port}/har'
+
+
+def _spool_response(resp, file_name, chunk_size):
+    resp.raise_for_status()
+    with open(file_name, 'wb') as f:
+        for chunk in resp.iter_content(chunk_size=chunk_size):
+            f.write(chunk)
+
+
+def save_har(bmp_proxy, file_name, chunk_size=_CHUNK_SIZE):
+    """
+    Streams HAR that has been recorded by bmp_proxy directly to file_name.
+    Unlike bmp_proxy.har, the HAR is never held in memory as a whole.
+
+    You can iterate over entries of the saved HAR with iter_har_entries().
+
+    :param bmp_proxy:
+    :param file_name: where to save the HAR.
+    :param chunk_size: Optional. How many bytes to read from BMP Daemon at once.
+    :return: file_name
+    """
+    with contextlib.closing(requests.get(_har_url(bmp_proxy), stream=True)) as resp:
+        _spool_response(resp, file_name, chunk_size)
+    return file_name
+
+
+def rotate_har(bmp_proxy, har_name, file_name=None, title=None, chunk_size=_CHUNK_SIZE, **kwargs):
+    """
+    Starts new HAR with the same capture* parameters as set_new_har() has.
+    BMP Daemon returns the previous HAR, it is streamed to file_name. If file_name is None, the previous HAR
+    is dropped without reading it.
+
+    Note: set_new_har() (as bmp_proxy.new_har()) reads the previous HAR into memory as one JSON blob.
+
+    :param bmp_proxy:
+    :param har_name: name of the new har
+    :param file_name: Optional. Where to save the previous HAR.
+    :param title: Optional.
+    :param chunk_size: Optional. How many bytes to read from BMP Daemon at once.
+    :param kwargs: Optional. Additional options to pass or override.
+    :return: file_name if the previous HAR was saved, None otherwise.
+    """
+    payload = {'initialPageRef': har_name,
+               'captureHeaders': True, 'captureContent': True, 'captureBinaryContent': True,
+               **kwargs}
+    if title is not None:
+        payload['initialPageTitle'] = title
+
+    with contextlib.closing(requests.put(_har_url(bmp_proxy), payload, stream=True)) as resp:
+        # 204 means that there was no previous HAR
+        if file_name is None or resp.status_code == 204:
+            resp.raise_for_status()
+            return None
+        _spool_response(resp, file_name, chunk_size)
+    return file_name
+
+
+class _Buffer(object):
+    """
+    Sliding window over decoded text of fp.
+    When new data is read, the text before the earliest position we still need (pos, mark of the current
+    object, token of the current key) is discarded.
+    """
+    def __init__(self, fp, chunk_size):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.text = ''
+        self.pos = 0
+        self.mark = None
+        self.token = None
+        self.eof = False
+
+    def fill(self):
+        """
+        Reads more data. Raises ValueError, if there is no more data.
+        """
+        while True:
+            if self.eof:
+                raise ValueError("Unexpected end of HAR")
+            raw = self.fp.read(self.chunk_size)
+            if not raw:
+                self.eof = True
+            data = self.decoder.decode(raw, final=self.eof) if isinstance(raw, bytes) else raw
+            if not data:
+                continue
+
+            keep = min(p for p in (self.pos, self.mark, self.token) if p is not None)
+            self.text = self.text[keep:] + data
+            self.pos -= keep
+            if self.mark is not None:
+                self.mark -= keep
+            if self.token is not None:
+                self.token -= keep
+            return
+
+    def skip_string(self):
+        """
+        pos should be right after the opening quote. Moves pos right after the closing quote.
+        """
+        while True:
+            m = _STRING_SPECIAL.search(self.text, self.pos)
+            if m is None:
+                self.pos = len(self.text)
+                self.fill()
+                continue
+            if m.group() == '"':
+                self.pos = m.end()
+                return
+            # escape sequence, we're skipping escaped char
+            if m.end() >= len(self.text):
+                self.pos = m.start()
+                self.fill()
+                continue
+            self.pos = m.end() + 1
+
+
+def _iter_objects(fp, path, chunk_size):
+    """
+    Yields JSON objects of the array that is located by path (sequence of keys) in JSON document fp,
+    one by one. Only one object is held in memory at once.
+    The rest of the document after the array is not read.
+    """
+    path = list(path)
+    b = _Buffer(fp, chunk_size)
+    # every item is [is_object, current_key, expect_key]
+    stack = []
+    target_depth = None
+
+    while True:
+        m = _STRUCTURAL.search(b.text, b.pos)
+        if m is None:
+            b.pos = len(b.text)
+            try:
+                b.fill()
+            except ValueError:
+                if not stack:
+                    return
+                raise
+            continue
+
+        c = m.group()
+        b.pos = m.end()
+        top = stack[-1] if stack else None
+
+        if c == '"':
+            is_key = top is not None and top[0] and top[2]
+            # keys are short, so it is safe to keep them in the buffer
+            b.token = m.start() if is_key else None
+            b.skip_string()
+            if is_key:
+                top[1] = json.loads(b.text[b.token:b.pos])
+                top[2] = False
+                b.token = None
+        elif c == ',':
+            if top is not None and top[0]:
+                top[2] = True
+        elif c in '{[':
+            if c == '{' and target_depth is not None and len(stack) == target_depth:
+                b.mark = m.start()
+            if c == '[' and target_depth is None and all(item[0] for item in stack) \
+                    and [item[1] for item in stack] == path:
+                target_depth = len(stack) + 1
+            stack.append([c == '{', None, c == '{'])
+        else:
+            stack.pop()
+            if target_depth is not None:
+                if len(stack) == target_depth and c == '}':
+                    yield json.loads(b.text[b.mark:b.pos])
+                    b.mark = None
+                elif len(stack) < target_depth:
+                    return
+
+
+def iter_har_entries(har, chunk_size=_CHUNK_SIZE):
+    """
+    Iterates over log.entries of the HAR incrementally. Only one entry is held in memory at once.
+    It is intended to be used with save_har() and rotate_har().
+
+    Usage example:
+
+        save_har(bmp_proxy, 'page.har')
+        for entry in iter_har_entries('page.har'):
+            print(entry['request']['url'])
+
+    :param har: file name or file-like object (binary or text) with HAR.
+    :param chunk_size: Optional. How many bytes to read at once.
+    :return: generator of HAR entries (dicts).
+    """
+    if hasattr(har, 'read'):
+        yield from _iter_objects(har, ('log', 'entries'), chunk_size)
+    else:
+        with open(har, 'rb') as f:
+            yield from _iter_objects(f, ('log', 'entries'), chunk_size)
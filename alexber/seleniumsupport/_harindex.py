@@ -0,0 +1,415 @@
+import base64
+import contextlib
+import heapq
+import zlib
+from array import array
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+import requests
+
+from ._har import _har_url, _iter_objects, _CHUNK_SIZE
+
+_TIMINGS = ('blocked', 'dns', 'connect', 'ssl', 'send', 'wait', 'receive')
+_NO_VALUE = -1
+# shorter bodies are not worth compressing
+_COMPRESS_MIN = 256
+_RAW = b'\x00'
+_ZLIB = b'\x01'
+
+
+class _StringTable(object):
+    """
+    Every distinct string is stored once, columns keep it's id.
+    """
+    def __init__(self):
+        self.strings = []
+        self.ids = {}
+
+    def add(self, s):
+        s = '' if s is None else s
+        string_id = self.ids.get(s, None)
+        if string_id is None:
+            string_id = len(self.strings)
+            self.strings.append(s)
+            self.ids[s] = string_id
+        return string_id
+
+
+class _Headers(object):
+    """
+    Headers of all entries as (name id, value id) pairs in 2 arrays, offsets[row] is where headers of row start.
+    """
+    def __init__(self):
+        self.names = array('I')
+        self.values = array('I')
+        self.offsets = array('Q', [0])
+
+    def append(self, headers, strings):
+        for header in headers or ():
+            self.names.append(strings.add(header.get('name', '')))
+            self.values.append(strings.add(header.get('value', '')))
+        self.offsets.append(len(self.names))
+
+    def get(self, row, strings):
+        start, end = self.offsets[row], self.offsets[row + 1]
+        return [(strings.strings[self.names[i]], strings.strings[self.values[i]]) for i in range(start, end)]
+
+
+def _pack_text(text):
+    if text is None:
+        return None
+    data = text.encode('utf-8')
+    # the first byte tells how the rest is stored, text itself may start with any byte (also with U+0000)
+    if len(data) < _COMPRESS_MIN:
+        return _RAW + data
+    return _ZLIB + zlib.compress(data, 1)
+
+
+def _unpack_text(data):
+    if data is None:
+        return None
+    tag, data = data[:1], data[1:]
+    if tag == _ZLIB:
+        data = zlib.decompress(data)
+    return data.decode('utf-8')
+
+
+def _mime_type(mime_type):
+    # 'text/html; charset=utf-8' -> 'text/html'
+    return (mime_type or '').split(';', 1)[0].strip().lower()
+
+
+def _number(value):
+    return _NO_VALUE if value is None else value
+
+
+class HarRecord(object):
+    """
+    View of one entry of HarIndex. Fields are read from HarIndex's columns on access.
+    """
+    __slots__ = ('_index', 'row')
+
+    def __init__(self, index, row):
+        self._index = index
+        self.row = row
+
+    def _string(self, column):
+        return self._index._strings.strings[column[self.row]]
+
+    @property
+    def url(self):
+        return self._string(self._index._url)
+
+    @property
+    def method(self):
+        return self._string(self._index._method)
+
+    @property
+    def host(self):
+        return self._string(self._index._host)
+
+    @property
+    def pageref(self):
+        return self._string(self._index._pageref) or None
+
+    @property
+    def status(self):
+        return self._index._status[self.row]
+
+    @property
+    def mime_type(self):
+        return self._string(self._index._mime_type)
+
+    @property
+    def server_ip(self):
+        return self._string(self._index._server_ip) or None
+
+    @property
+    def started(self):
+        """
+        startedDateTime as it is in HAR.
+        """
+        return self._string(self._index._started)
+
+    @property
+    def time(self):
+        """
+        Total time of the request in milliseconds.
+        """
+        return self._index._time[self.row]
+
+    @property
+    def timings(self):
+        """
+        dict of blocked, dns, connect, ssl, send, wait, receive in milliseconds, -1 if it is not applicable.
+        """
+        return {name: self._index._timings[name][self.row] for name in _TIMINGS}
+
+    @property
+    def response_size(self):
+        """
+        Response's headers and body in bytes, as they were transferred.
+        """
+        return self._index._response_size(self.row)
+
+    @property
+    def request_headers(self):
+        return self._index._request_headers.get(self.row, self._index._strings)
+
+    @property
+    def response_headers(self):
+        return self._index._response_headers.get(self.row, self._index._strings)
+
+    @property
+    def post_data(self):
+        return _unpack_text(self._index._post_data[self.row])
+
+    @property
+    def text(self):
+        """
+        Response's content as HAR has it (base64 for binary content, see body()), None if it was not captured.
+        """
+        return _unpack_text(self._index._text[self.row])
+
+    def body(self):
+        """
+        :return: response's content as bytes, None if it was not captured.
+        """
+        text = self.text
+        if text is None:
+            return None
+        if self._index._base64[self.row]:
+            return base64.b64decode(text)
+        return text.encode('utf-8')
+
+    def __repr__(self):
+        return f'{type(self).__name__}(method={self.method!r}, url={self.url!r}, status={self.status}, ' \
+               f'time={self.time})'
+
+
+class HarIndex(object):
+    """
+    Compact columnar store of HAR entries for analysis of (long) captures, see set_new_har().
+
+    Strings (URLs, hosts, header names and values, etc.) are interned, numbers (statuses, timings, sizes) are kept
+    in arrays, response's content and post data are kept compressed and decoded only on access.
+    Entries are looked up by indexes (by_url(), by_host(), by_status(), by_mime_type()) and not by linear scan.
+    Entries are returned as HarRecord views.
+
+    Usage example:
+
+        har_index = HarIndex.from_bmp_proxy(bmp_proxy)  # or HarIndex.from_file('page.har')
+        for record in har_index.slowest(10):
+            print(record.url, record.time)
+        print(har_index.bytes_by_host())
+        errors = har_index.by_status(500)
+
+    :param entries: Optional. Iterable of HAR entries (dicts), for example, from iter_har_entries().
+    :param pages: Optional. Iterable of HAR pages (dicts).
+    """
+    def __init__(self, entries=(), pages=()):
+        self._strings = _StringTable()
+        self._url = array('I')
+        self._method = array('I')
+        self._host = array('I')
+        self._pageref = array('I')
+        self._mime_type = array('I')
+        self._server_ip = array('I')
+        self._started = array('I')
+        self._status = array('i')
+        self._time = array('d')
+        self._timings = {name: array('d') for name in _TIMINGS}
+        self._response_headers_size = array('q')
+        self._response_body_size = array('q')
+        self._content_size = array('q')
+        self._request_headers = _Headers()
+        self._response_headers = _Headers()
+        self._base64 = array('b')
+        self._text = []
+        self._post_data = []
+
+        self._by_url = {}
+        self._by_host = {}
+        self._by_status = {}
+        self._by_mime_type = {}
+
+        self.pages = [{'id': page.get('id', None), 'title': page.get('title', None),
+                       'startedDateTime': page.get('startedDateTime', None)} for page in pages]
+        self.extend(entries)
+
+    @classmethod
+    def from_har(cls, har):
+        """
+        :param har: HAR dict, for example, bmp_proxy.har.
+        :return: HarIndex
+        """
+        log = har.get('log', {})
+        return cls(log.get('entries', ()), log.get('pages', ()))
+
+    @classmethod
+    def from_file(cls, har, chunk_size=_CHUNK_SIZE):
+        """
+        Reads HAR incrementally, only one entry is held in memory as dict at once.
+
+        :param har: file name or file-like object (binary or text) with HAR, for example, from save_har().
+                    For file-like object only entries are read, pages are empty.
+        :param chunk_size: Optional. How many bytes to read at once.
+        :return: HarIndex
+        """
+        if hasattr(har, 'read'):
+            # pages are usually before entries, but file-like object can't be read twice
+            return cls(_iter_objects(har, ('log', 'entries'), chunk_size))
+        with open(har, 'rb') as f:
+            pages = list(_iter_objects(f, ('log', 'pages'), chunk_size))
+        with open(har, 'rb') as f:
+            return cls(_iter_objects(f, ('log', 'entries'), chunk_size), pages)
+
+    @classmethod
+    def from_bmp_proxy(cls, bmp_proxy, chunk_size=_CHUNK_SIZE):
+        """
+        Streams HAR that has been recorded by bmp_proxy into HarIndex. Unlike bmp_proxy.har, the HAR is never
+        held in memory as dict. Only entries are read, pages are empty.
+
+        :param bmp_proxy:
+        :param chunk_size: Optional. How many bytes to read from BMP Daemon at once.
+        :return: HarIndex
+        """
+        with contextlib.closing(requests.get(_har_url(bmp_proxy), stream=True)) as resp:
+            resp.raise_for_status()
+            resp.raw.decode_content = True
+            return cls(_iter_objects(resp.raw, ('log', 'entries'), chunk_size))
+
+    def extend(self, entries):
+        """
+        Adds HAR entries.
+
+        :param entries: iterable of HAR entries (dicts).
+        """
+        for entry in entries:
+            self._append(entry)
+
+    def _index(self, index, key, row):
+        rows = index.get(key, None)
+        if rows is None:
+            rows = index[key] = array('I')
+        rows.append(row)
+
+    def _append(self, entry):
+        row = len(self._url)
+        add = self._strings.add
+        request = entry.get('request', {})
+        response = entry.get('response', {})
+        content = response.get('content', {})
+        timings = entry.get('timings', {})
+
+        url = request.get('url', '')
+        host = urlsplit(url).hostname or ''
+        mime_type = _mime_type(content.get('mimeType', None))
+        status = response.get('status', 0) or 0
+
+        url_id = add(url)
+        host_id = add(host)
+        mime_type_id = add(mime_type)
+        self._url.append(url_id)
+        self._host.append(host_id)
+        self._mime_type.append(mime_type_id)
+        self._method.append(add(request.get('method', '')))
+        self._pageref.append(add(entry.get('pageref', None)))
+        self._server_ip.append(add(entry.get('serverIPAddress', None)))
+        self._started.append(add(entry.get('startedDateTime', None)))
+        self._status.append(status)
+        self._time.append(_number(entry.get('time', None)))
+        for name in _TIMINGS:
+            self._timings[name].append(_number(timings.get(name, None)))
+        self._response_headers_size.append(_number(response.get('headersSize', None)))
+        self._response_body_size.append(_number(response.get('bodySize', None)))
+        self._content_size.append(_number(content.get('size', None)))
+        self._request_headers.append(request.get('headers', None), self._strings)
+        self._response_headers.append(response.get('headers', None), self._strings)
+        self._base64.append(content.get('encoding', None) == 'base64')
+        self._text.append(_pack_text(content.get('text', None)))
+        self._post_data.append(_pack_text(request.get('postData', {}).get('text', None)))
+
+        self._index(self._by_url, url_id, row)
+        self._index(self._by_host, host_id, row)
+        self._index(self._by_status, status, row)
+        self._index(self._by_mime_type, mime_type_id, row)
+
+    def _response_size(self, row):
+        headers_size = max(self._response_headers_size[row], 0)
+        body_size = self._response_body_size[row]
+        # bodySize is -1, when it is not known
+        if body_size < 0:
+            body_size = max(self._content_size[row], 0)
+        return headers_size + body_size
+
+    def _records(self, rows):
+        return [HarRecord(self, row) for row in rows]
+
+    def _lookup(self, index, key):
+        string_id = self._strings.ids.get(key, None)
+        return self._records(index.get(string_id, ()))
+
+    def __len__(self):
+        return len(self._url)
+
+    def __getitem__(self, row):
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError(f"{type(self).__name__} index out of range")
+        return HarRecord(self, row)
+
+    def __iter__(self):
+        return (HarRecord(self, row) for row in range(len(self)))
+
+    def by_url(self, url):
+        return self._lookup(self._by_url, url)
+
+    def by_host(self, host):
+        return self._lookup(self._by_host, host)
+
+    def by_status(self, status):
+        return self._records(self._by_status.get(status, ()))
+
+    def by_mime_type(self, mime_type):
+        return self._lookup(self._by_mime_type, _mime_type(mime_type))
+
+    @property
+    def hosts(self):
+        return [self._strings.strings[host_id] for host_id in self._by_host]
+
+    @property
+    def statuses(self):
+        return sorted(self._by_status)
+
+    @property
+    def mime_types(self):
+        return [self._strings.strings[mime_type_id] for mime_type_id in self._by_mime_type]
+
+    def slowest(self, n=10):
+        """
+        :param n: how many records to return.
+        :return: list of n slowest HarRecord, the slowest first.
+        """
+        rows = heapq.nlargest(n, range(len(self)), key=self._time.__getitem__)
+        return self._records(rows)
+
+    def bytes_by_host(self):
+        """
+        :return: OrderedDict host -> transferred response bytes, the largest first.
+        """
+        totals = {}
+        for host_id, rows in self._by_host.items():
+            totals[self._strings.strings[host_id]] = sum(self._response_size(row) for row in rows)
+        return OrderedDict(sorted(totals.items(), key=lambda item: item[1], reverse=True))
+
+    def total_bytes(self):
+        """
+        :return: transferred response bytes of all entries.
+        """
+        return sum(self._response_size(row) for row in range(len(self)))
+
+    def __repr__(self):
+        return f'{type(self).__name__}(entries={len(self)}, hosts={len(self._by_host)})'
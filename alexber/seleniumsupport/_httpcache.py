@@ -0,0 +1,307 @@
+import contextlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+
+from ._datadir import _tree_size, _copy_tree
+from ._metrics import _incr
+
+_SHARD_PREFIX = 'shard-'
+_SNAPSHOT_PREFIX = 'snapshot-'
+
+# shards that are leased in this process, on Windows there is no inter-process locking
+_leased_shards = set()
+_leased_shards_lock = threading.Lock()
+
+
+class HttpCacheLease(object):
+    """
+    Browser's disk cache directory for one session, see HttpCache.lease().
+
+    path - directory to pass to the browser.
+    max_size - how many bytes the browser may use, None if unlimited.
+    """
+    def __init__(self, path, max_size):
+        self.path = path
+        self.max_size = max_size
+
+    def chrome_arguments(self):
+        """
+        :return: list of Google Chrome's arguments, add them to web_driver's arguments.
+        """
+        arguments = [f'--disk-cache-dir={self.path}']
+        if self.max_size is not None:
+            arguments.append(f'--disk-cache-size={self.max_size}')
+        return arguments
+
+    def firefox_prefs(self):
+        """
+        :return: dict of Firefox's prefs.
+        """
+        prefs = {'browser.cache.disk.enable': True, 'browser.cache.disk.parent_directory': self.path}
+        if self.max_size is not None:
+            # Firefox's capacity is in KB and it is ignored while smart sizing is on
+            prefs['browser.cache.disk.smart_size.enabled'] = False
+            prefs['browser.cache.disk.capacity'] = self.max_size // 1024
+        return prefs
+
+    def write_firefox_prefs(self, profile_dir):
+        """
+        Appends firefox_prefs() to user.js of Firefox's profile, for example, the one from BrowserDataDir().
+
+        :param profile_dir:
+        """
+        with open(os.path.join(profile_dir, 'user.js'), 'a', encoding='utf-8') as f:
+            for name, value in self.firefox_prefs().items():
+                f.write(f'user_pref({json.dumps(name)}, {json.dumps(value)});\n')
+
+    def __repr__(self):
+        return f'{type(self).__name__}(path={self.path!r}, max_size={self.max_size})'
+
+
+class HttpCache(object):
+    """
+    Warm HTTP disk cache that is shared by browser sessions (for example, of BrowserDataDir()), so static
+    JS/CSS bundles are not downloaded again by every session.
+
+    Browser's disk cache can't be used by 2 browsers at once, so there are 2 modes:
+        'shard' - cache_dir holds many cache directories (shards). Every session leases the free shard
+                  exclusively (with file lock, so it is safe also across processes on POSIX), shards are reused by
+                  the next sessions. Up to shards sessions can run concurrently, if shards is None, new shard is
+                  created, when all are leased.
+        'snapshot' - every session starts from the copy (reflink where the file system supports it) of the newest
+                     snapshot, on release the session's cache becomes the newest snapshot.
+
+    In 'shard' mode, when cache_dir grows past max_size bytes, least recently used shards that are not leased
+    are removed. In 'snapshot' mode, only 2 newest snapshots are kept, the older of them is removed also when
+    both together are larger than max_size, and session's cache that is larger than max_size is dropped.
+    Browser is also told to keep it's cache in the share of max_size, see HttpCacheLease.chrome_arguments().
+
+    HttpCache is used alongside BrowserDataDir() and not through it: BrowserDataDir() removes it's directory
+    on exit, the cache should outlive it, so it is kept in cache_dir and the browser is pointed to it
+    with it's arguments (prefs).
+
+    Usage example:
+
+        http_cache = HttpCache('/var/cache/crawler', max_size=2 * 1024 ** 3, shards=8)
+        ...
+        with BrowserDataDir(**dd) as data_dir, http_cache.lease() as cache:
+            arguments = [f'--user-data-dir={data_dir}', *cache.chrome_arguments()]
+            ...
+
+    :param cache_dir: root directory of the shared cache.
+    :param max_size: Optional. Maximum size of cache_dir in bytes.
+    :param shards: Optional. Only for 'shard' mode. Maximum number of shards.
+    :param mode: Optional. 'shard' (default) or 'snapshot'.
+    :param copy_mode: Optional. Only for 'snapshot' mode. See BrowserDataDir().
+    :param logger: Optional.
+    """
+    def __init__(self, cache_dir, max_size=None, shards=None, mode='shard', copy_mode='auto', logger=None):
+        if mode not in ('shard', 'snapshot'):
+            raise ValueError(f"Unknown mode {mode}, expected 'shard' or 'snapshot'")
+        if shards is not None and shards < 1:
+            raise ValueError(f"Expected positive shards, but got {shards}")
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.max_size = max_size
+        self.shards = shards
+        self.mode = mode
+        self.copy_mode = copy_mode
+        self.logger = logging.getLogger(__name__) if logger is None else logger
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @property
+    def session_max_size(self):
+        """
+        How many bytes one browser may use for it's cache, None if unlimited.
+        """
+        if self.max_size is None:
+            return None
+        if self.mode == 'shard' and self.shards is not None:
+            return self.max_size // self.shards
+        return self.max_size
+
+    @contextlib.contextmanager
+    def lease(self, timeout=None):
+        """
+        Leases cache directory for one browser session. The browser should be closed before the exit.
+
+        :param timeout: Optional. Only for 'shard' mode with shards. How many seconds to wait for free shard.
+                        None means wait forever.
+        :return: HttpCacheLease
+        """
+        if self.mode == 'shard':
+            with self._lease_shard(timeout) as path:
+                yield HttpCacheLease(path, self.session_max_size)
+        else:
+            with self._lease_snapshot() as path:
+                yield HttpCacheLease(path, self.session_max_size)
+
+    def _try_lock(self, path):
+        """
+        :return: lock (to pass to _unlock()) or None, if path is leased already.
+        """
+        with _leased_shards_lock:
+            if path in _leased_shards:
+                return None
+            _leased_shards.add(path)
+        if fcntl is None:
+            return path, None
+        lock_path = f'{path}.lock'
+        fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            # lock file of evicted shard is removed, the lock that we've got on it doesn't exclude anybody
+            if os.stat(lock_path).st_ino != os.fstat(fd).st_ino:
+                raise FileNotFoundError(lock_path)
+        except OSError:
+            os.close(fd)
+            with _leased_shards_lock:
+                _leased_shards.discard(path)
+            return None
+        return path, fd
+
+    def _unlock(self, lock):
+        path, fd = lock
+        if fd is not None:
+            # closing releases flock
+            os.close(fd)
+        with _leased_shards_lock:
+            _leased_shards.discard(path)
+
+    @contextlib.contextmanager
+    def _lease_shard(self, timeout):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        delay = 0.05
+        while True:
+            lock = self._acquire_shard()
+            if lock is not None:
+                break
+            if deadline is not None and time.monotonic() >= deadline:
+                raise ValueError(f"No free shard of {self.cache_dir} in {timeout} seconds")
+            time.sleep(delay)
+            delay = min(delay * 2, 1)
+
+        path = lock[0]
+        try:
+            os.makedirs(path, exist_ok=True)
+            # used for LRU eviction
+            with contextlib.suppress(OSError):
+                os.utime(path)
+            yield path
+        finally:
+            self._unlock(lock)
+            self._evict()
+
+    def _acquire_shard(self):
+        # the most recently used free shard is the warmest one
+        existing = []
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if entry.name.startswith(_SHARD_PREFIX) and entry.is_dir(follow_symlinks=False):
+                    existing.append((entry.stat(follow_symlinks=False).st_mtime, entry.path))
+        for _, path in sorted(existing, reverse=True):
+            lock = self._try_lock(path)
+            if lock is not None:
+                return lock
+
+        # all existing shards are leased, new one is created (evicted shards' numbers are reused)
+        limit = self.shards if self.shards is not None else len(existing) + 1
+        for i in range(limit):
+            path = os.path.join(self.cache_dir, f'{_SHARD_PREFIX}{i}')
+            if os.path.isdir(path):
+                continue
+            lock = self._try_lock(path)
+            if lock is not None:
+                return lock
+        return None
+
+    @contextlib.contextmanager
+    def _lease_snapshot(self):
+        path = tempfile.mkdtemp(prefix='session-', dir=self.cache_dir)
+        published = False
+        try:
+            newest = self._snapshots()[-1:]
+            if newest:
+                try:
+                    _copy_tree(newest[0], path, self.copy_mode)
+                except (OSError, shutil.Error) as e:
+                    # the snapshot was evicted meanwhile, we're starting with cold cache
+                    self.logger.debug(f"Failed to copy {newest[0]} ({e}), starting with empty cache")
+                    shutil.rmtree(path, ignore_errors=True)
+                    os.makedirs(path, exist_ok=True)
+            yield path
+
+            if self.max_size is None or _tree_size(path) <= self.max_size:
+                os.rename(path, os.path.join(self.cache_dir, f'{_SNAPSHOT_PREFIX}{time.time_ns():020d}-'
+                                                             f'{uuid.uuid4().hex[:8]}'))
+                published = True
+        finally:
+            if not published:
+                shutil.rmtree(path, ignore_errors=True)
+        self._evict()
+
+    def _snapshots(self):
+        """
+        :return: paths of snapshots, the oldest first.
+        """
+        with os.scandir(self.cache_dir) as it:
+            return sorted(entry.path for entry in it
+                          if entry.name.startswith(_SNAPSHOT_PREFIX) and entry.is_dir(follow_symlinks=False))
+
+    def _evict(self):
+        if self.mode == 'snapshot':
+            # only the newest snapshot is used, the previous one is kept for the sessions that are copying it
+            snapshots = self._snapshots()
+            for path in snapshots[:-2]:
+                self._remove(path)
+            previous = snapshots[-2:-1]
+            if self.max_size is not None and previous and \
+                    _tree_size(previous[0]) + _tree_size(snapshots[-1]) > self.max_size:
+                self._remove(previous[0])
+            return
+        if self.max_size is None:
+            return
+
+        shards = []
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if entry.name.startswith(_SHARD_PREFIX) and entry.is_dir(follow_symlinks=False):
+                    shards.append((entry.stat(follow_symlinks=False).st_mtime, entry.path))
+        sized = [(mtime, path, _tree_size(path)) for mtime, path in shards]
+        total = sum(size for _, _, size in sized)
+        for _, path, size in sorted(sized):
+            if total <= self.max_size:
+                break
+            lock = self._try_lock(path)
+            if lock is None:
+                # it is leased now
+                continue
+            try:
+                self._remove(path)
+                if lock[1] is not None:
+                    # it is removed while we hold the lock, see _try_lock()
+                    with contextlib.suppress(OSError):
+                        os.unlink(f'{path}.lock')
+            finally:
+                self._unlock(lock)
+            total -= size
+
+    def _remove(self, path):
+        self.logger.debug(f"Evicting {path} from HTTP cache")
+        _incr('http_cache.evicted', mode=self.mode)
+        shutil.rmtree(path, ignore_errors=True)
+
+    def __repr__(self):
+        return f'{type(self).__name__}(cache_dir={self.cache_dir!r}, mode={self.mode!r}, ' \
+               f'max_size={self.max_size}, shards={self.shards})'
@@ -1,25 +1,20 @@
 import logging
-import base64
+import binascii
 import contextlib
-import psutil
-import signal
 import time
-import tempfile
-from zipfile import ZipFile
 from pathlib import Path
 
-from contextlib import suppress
-from importlib import import_module
-
 from selenium.common.exceptions import  WebDriverException
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.common.by import By
 from selenium.common.exceptions import StaleElementReferenceException
 
-from browsermobproxy import Server as BmpServerDaemon
-from browsermobproxy import Client as BmpClientProxy
+from ._driverspec import DriverSpec
+from ._locators import LocatorCache
+from ._metrics import _span, _incr
+
+# selenium.webdriver, browsermobproxy (with requests), psutil, zipfile and tempfile are imported on the first use,
+# so importing this module is cheap
 
-def save_screenshot(web_driver, screenshot_file_name, screen=None):
+def save_screenshot(web_driver, screenshot_file_name, screen=None, writer=None):
     """
     This is regular function API. If you want a context-manager, please use Screenshot.
     If screen is not None, it is saved into screenshot_file_name.
@@ -28,50 +23,59 @@ def save_screenshot(web_driver, screenshot_file_name, screen=None):
     :param web_driver: Optional if screen provided, otherwise mandatoty.
     :param screenshot_file_name: file_name where screenshot will be saved.
     :param screen: Optional. If not provided, web_driver is used to take screenshot.
+    :param writer: Optional. ScreenshotWriter. If provided, screenshot is decoded and written in the background.
     :return:
     """
     if screenshot_file_name is None:
         raise ValueError
 
-    if screen is None:
-        if web_driver is None:
-            raise ValueError
-        web_driver.save_screenshot(screenshot_file_name)
-    else:
-        # see https://stackoverflow.com/questions/37480641/how-do-i-view-the-screenshot-available-via-screen
+    with _span('screenshot.save', background=writer is not None):
+        if screen is None:
+            if web_driver is None:
+                raise ValueError
+            if writer is None:
+                web_driver.save_screenshot(screenshot_file_name)
+                return
+            screen = web_driver.get_screenshot_as_base64()
+
+        if writer is not None:
+            writer.submit(screenshot_file_name, screen)
+        else:
+            # see https://stackoverflow.com/questions/37480641/how-do-i-view-the-screenshot-available-via-screen
 
-        with open(screenshot_file_name, "wb") as f:
-            f.write(base64.decodebytes(screen.encode()))
+            with open(screenshot_file_name, "wb") as f:
+                # a2b_base64 accepts ASCII str as is, without intermediate copy
+                f.write(binascii.a2b_base64(screen))
 
-def closeBmpDaemon(bmp_daemon):
+def closeBmpDaemon(bmp_daemon, timeout=10):
     """
-    This method fetches all child (grandchild and all ancestors) process ids that was open in bmp_daemon.start().
-    We're calling bmp_daemon.stop() and then we're killing all ancestor's processes.
+    This method fetches all child (grandchild and all ancestors) process ids that was open in bmp_daemon.start()
+    (both the process tree that was recorded on start by BMPDaemon and the current one).
+    We're calling bmp_daemon.stop() and then we're sending SIGTERM to all ancestor's processes.
+    If they didn't exit in timeout seconds, they're killed, see terminate_processes().
 
     If the process was meanwhile terminated, we're ignoring if.
 
     If the process id was reused, we also do nothing.
 
     :param bmp_daemon:
-    :return:
+    :param timeout: Optional. How many seconds to wait after SIGTERM before SIGKILL.
+    :return: TeardownReport or None, if there was nothing to close.
     """
     # see https://github.com/AutomatedTester/browsermob-proxy-py/issues/8#issuecomment-679150656
     if bmp_daemon is not None and bmp_daemon.process is not None:
-        childs_process = []
-        try:
-            cmd_process = psutil.Process(bmp_daemon.process.pid)
-            childs_process = cmd_process.children(recursive=True)
-            childs_process = [*childs_process, cmd_process]
-
-            bmp_daemon.stop()
-        finally:
-            for child in childs_process:
-                # we can't accidentally kill newly created process
-                # we can kill only the process we have cached earlier
-                # if process was already finished we will get NoSuchProcess
-                # that we're just suppressing
-                with suppress(psutil.NoSuchProcess):
-                    child.send_signal(signal.SIGTERM)
+        from ._teardown import _collect_processes, terminate_processes
+        # we can't accidentally kill newly created process
+        # we can kill only the process we have cached earlier
+        with _span('bmp_daemon.close'):
+            childs_process = _collect_processes(bmp_daemon, bmp_daemon.process.pid)
+            try:
+                bmp_daemon.stop()
+            finally:
+                report = terminate_processes(childs_process, timeout)
+        _incr('bmp_daemon.force_killed', len(report.killed))
+        return report
+    return None
 
 def _validate_param(d, param_name):
     if d is None:
@@ -93,12 +97,23 @@ def BMPDaemon(**kwargs):
                 to the executable file.
               options: (dict)
                  port: The default value is 8080. This is the port when BMP daemon will run.
-            start: dict that will be passed to start() method of BMP Daemon.
+                       'auto' means free port, such that proxy_ports ports that follow it are also free.
+                       Chosen port is available as bmp_daemon.port.
+                 host: Optional. The default value is localhost.
+                 proxy_ports: Optional. How many ports after port BMP Proxies can use. The default value is 100
+                              for 'auto' port, otherwise BMP's default range is used.
+                 adopt: Optional. If True and BMP Daemon already runs on port, it is used instead of starting
+                        new one (and it is not stopped on exit). The default value is False.
+            start: dict with options of starting BMP Daemon.
                options: (dict)
                  log_path: The default value is os.getcwd(). This represent directory (without filename!)
                            where logs of BMP Daemon will be written.
                  log_file: The default value is server.log. This represent filename (only filename,
                            without path to directory!) of the log.
+                 timeout: Optional. How many seconds to wait till BMP Daemon answers on REST API.
+                          The default value is retry_sleep * retry_count (30).
+               BMP Daemon is ready, when it answers on REST API, it is polled with exponential backoff
+               (starting from 10 ms).
                See https://github.com/AutomatedTester/browsermob-proxy-py/blob/master/browsermobproxy/server.py#L59
                for undocumented values.
 
@@ -113,11 +128,37 @@ def BMPDaemon(**kwargs):
     daemon_start_d = daemon_d.get('start', None)
     _validate_param(daemon_start_d, 'start')
 
+    from browsermobproxy import Server as BmpServerDaemon, RemoteServer as BmpRemoteServer
+    from ._bmpdaemon import _free_port, _probe, _start
+    from ._teardown import _record_process_tree
+
+    init_options = daemon_init_d.get('options', None) or {}
+    host = init_options.get('host', 'localhost')
+    port = init_options.get('port', 8080)
+    proxy_ports = init_options.get('proxy_ports', None)
+    auto_port = port in ('auto', 0)
+    if auto_port:
+        if proxy_ports is None:
+            proxy_ports = 100
+        port = _free_port(host, proxy_ports)
+    # browsermobproxy.Server doesn't know these options
+    server_options = {k: v for k, v in init_options.items() if k not in ('host', 'proxy_ports', 'adopt')}
+    daemon_init_d = {**daemon_init_d, 'options': {**server_options, 'port': port}}
+
     bmpDaemon = None
 
     try:
-        bmpDaemon = BmpServerDaemon(**daemon_init_d)
-        bmpDaemon.start(**daemon_start_d)
+        with _span('bmp_daemon.start', auto_port=auto_port):
+            if not auto_port and init_options.get('adopt', False) and _probe(host, port, 1):
+                # closeBmpDaemon() doesn't stop BMP Daemon that we didn't start
+                bmpDaemon = BmpRemoteServer(host, port)
+                bmpDaemon.process = None
+                _incr('bmp_daemon.adopted')
+            else:
+                bmpDaemon = BmpServerDaemon(**daemon_init_d)
+                bmpDaemon.host = host
+                _start(bmpDaemon, daemon_start_d.get('options', None), proxy_ports)
+                _record_process_tree(bmpDaemon, bmpDaemon.process.pid)
         yield bmpDaemon
     finally:
         closeBmpDaemon(bmpDaemon)
@@ -135,19 +176,36 @@ def BrowserDataDir(**kwargs):
     :param work_file_prefix: prefix for temporary directory. Optional.
     :param work_file_suffix: suffix for temporary directory. Optional.
     :param template: file to unzip. Mandatory.
+    :param cache_dir: Optional. If supplied, template is extracted only once into this directory
+                      (the cache is keyed by template's hash and mtime) and work_dir gets cheap copy of it.
+    :param cache_max_size: Optional. Maximum size in bytes of cache_dir. When it is exceeded,
+                           least recently used template versions are removed.
+    :param copy_mode: Optional. How to copy from cache_dir. 'auto' (default) uses reflink (copy-on-write)
+                      where the file system supports it, otherwise regular copy. 'hardlink' uses hardlinks,
+                      use it only if browser doesn't modify files of the template in place. 'copy' uses regular copy.
     :return:
     """
 
+    import tempfile
+    from zipfile import ZipFile
+    from ._datadir import _extract_template_cached, _copy_tree
+
     work_dir = kwargs.get('work_dir', None)
     work_file_prefix = kwargs.get('work_file_prefix', None)
     work_file_suffix = kwargs.get('work_file_suffix', None)
+    cache_dir = kwargs.get('cache_dir', None)
 
     with tempfile.TemporaryDirectory(suffix=work_file_suffix, prefix=work_file_prefix, dir=work_dir) as root:
         file = kwargs.get('template', None)
         _validate_param(file, 'template')
 
-        with ZipFile(file, 'r') as zipObj:
-            zipObj.extractall(root)
+        with _span('browser_data_dir.extract', cached=cache_dir is not None):
+            if cache_dir is None:
+                with ZipFile(file, 'r') as zipObj:
+                    zipObj.extractall(root)
+            else:
+                cached = _extract_template_cached(file, cache_dir, kwargs.get('cache_max_size', None))
+                _copy_tree(cached, root, kwargs.get('copy_mode', 'auto'))
         yield root
 
 
@@ -170,6 +228,9 @@ def BMPProxy(**kwargs):
                    port: The default value is 8080. This is the port when BMP daemon is running.
             proxy: dict
               param: URL query (for example httpProxy and httpsProxy vars)
+    :param blocking_profile: Optional. Name of one of BLOCKING_PROFILES or BlockingProfile,
+                             see apply_blocking_profile().
+    :param first_party: Optional. domain or sequence of domains, required for first-party-only blocking profile.
 
     :return:
     """
@@ -184,53 +245,72 @@ def BMPProxy(**kwargs):
 
     bmp_daemon_url = f"{bmp_daemon_host}:{bmp_daemon_port}"
 
+    from browsermobproxy import Client as BmpClientProxy
+
     bmp_proxy = None
     try:
-        bmp_proxy = BmpClientProxy(bmp_daemon_url, bmp_proxy_params)
+        with _span('bmp_proxy.create'):
+            bmp_proxy = BmpClientProxy(bmp_daemon_url, bmp_proxy_params)
+
+        blocking_profile = kwargs.get('blocking_profile', None)
+        if blocking_profile is not None:
+            from ._blocking import apply_blocking_profile
+            apply_blocking_profile(bmp_proxy, blocking_profile, kwargs.get('first_party', None))
 
         yield bmp_proxy
     finally:
         if bmp_proxy is not None:
-            bmp_proxy.close()
+            with _span('bmp_proxy.close'):
+                bmp_proxy.close()
 
 
-def closeSeleniumWebDriver(web_driver):
+def closeSeleniumWebDriver(web_driver, timeout=10):
     """
     This method fetches all child (grandchild and all ancestors) process ids that was open in
-    Selenium's Web Driver initialization.
-    We're calling web_driver.quit() and then we're killing all ancestor's processes.
+    Selenium's Web Driver initialization (both the process tree that was recorded on creation and the current one).
+    We're calling web_driver.quit() and then we're sending SIGTERM to all ancestor's processes.
+    If they didn't exit in timeout seconds, they're killed, see terminate_processes().
 
     If the process was meanwhile terminated, we're ignoring if.
 
     If the process id was reused, we also do nothing.
 
     :param web_driver:
-    :return:
+    :param timeout: Optional. How many seconds to wait after SIGTERM before SIGKILL.
+    :return: TeardownReport or None, if there was no local process (for example, Remote Web Driver).
     """
     # see closeBmpDaemon()
     # see https://github.com/AutomatedTester/browsermob-proxy-py/issues/8#issuecomment-679150656
     if web_driver is not None:
-        if getattr(getattr(web_driver, 'service', {}), 'process', None) is not None:
-            childs_process = []
-            try:
-                cmd_process = psutil.Process(web_driver.service.process.pid)
-                childs_process = cmd_process.children(recursive=True)
-                childs_process = [*childs_process, cmd_process]
-
-                web_driver.quit()
-            finally:
-                for child in childs_process:
-                    # we can't accidentally kill newly created process
-                    # we can kill only the process we have cached earlier
-                    # if process was already finished we will get NoSuchProcess
-                    # that we're just suppressing
-                    with suppress(psutil.NoSuchProcess):
-                        child.send_signal(signal.SIGTERM)
+        from ._teardown import _collect_processes, _web_driver_pid, terminate_processes
+        pid = _web_driver_pid(web_driver)
+        if pid is not None:
+            with _span('web_driver.close'):
+                childs_process = _collect_processes(web_driver, pid)
+                try:
+                    web_driver.quit()
+                finally:
+                    report = terminate_processes(childs_process, timeout)
+            _incr('web_driver.force_killed', len(report.killed))
+            return report
         else:
-            web_driver.quit()
+            with _span('web_driver.close'):
+                web_driver.quit()
+    return None
 
 
 
+def _create_web_driver(**kwargs):
+    """
+    Creates Selenium's Web Driver, see SeleniumWebDriver() for the parameters.
+    It is caller responsibility to close web_driver, see closeSeleniumWebDriver().
+    """
+    #This method assumes that BMPDaemon is already up
+    driver_spec = kwargs.get('driver_spec', None)
+    if driver_spec is None:
+        driver_spec = DriverSpec(**kwargs)
+    return driver_spec.create(kwargs.get('browsermobproxy', None))
+
 
 @contextlib.contextmanager
 def SeleniumWebDriver(**kwargs):
@@ -242,6 +322,11 @@ def SeleniumWebDriver(**kwargs):
     In the exit from the code block inside context-manager, it closes web_driver, see closeSeleniumWebDriver().
 
     :param browsermobproxy. Optional. If you want to use BMP Proxy with Selenium's Web Driver, you should pass the object.
+    :param driver_spec: Optional. DriverSpec that was built from web_driver and browser dicts. If supplied,
+                        web_driver and browser are ignored.
+    :param connection_pool: Optional. Only for Remote Web Driver. RemoteConnectionPool to send commands through.
+    :param blocking_profile: Optional. Only for Google Chrome. Name of one of BLOCKING_PROFILES or BlockingProfile,
+                             the browser itself doesn't load what the profile blocks (for example, images).
     :param browser: dict
              path: Optional. The path to the browser's executable file.
                              If this file is not available in OS environment variables, you should provide explicit
@@ -253,6 +338,9 @@ def SeleniumWebDriver(**kwargs):
                      If this file is not available in OS environment variables, you should provide explicit value.
                log_file: Optional. All logs from the Selenium's Web Driver component will be redirected to this log_file.
                command_executor: Optional. If supplied Remote variant of Selenium's Web Driver will be used.
+               connection_pool: Optional. dict with parameters of RemoteConnectionPool (for example, maxsize, retries),
+                                commands of all Web Drivers with the same command_executor are sent through
+                                the shared pool.
                experimental_options: Optional. For example, for Google Chrome,
                                      'excludeSwitches': ['enable-logging', 'enable-automation'].
                arguments:  Browser's option's arguments. For example,  for Google Chrome,
@@ -261,71 +349,10 @@ def SeleniumWebDriver(**kwargs):
 
     :return:
     """
-    #This method assumes that BMPDaemon is already up
-    web_driver_d = kwargs.get('web_driver', None)
-    _validate_param(web_driver_d, 'web_driver_d')
-
-    browser_d = kwargs.get('browser', {})
-
-    # #insipired by https://github.com/clemfromspace/scrapy-selenium/blob/develop/scrapy_selenium/middlewares.py
-    web_driver_base_path = f"selenium.webdriver.{web_driver_d['name']}"
-
-    web_driver_klass_module = import_module(f"{web_driver_base_path}.webdriver")
-
-    web_driver_options_module = import_module(f"{web_driver_base_path}.options")
-    web_driver_options_klass = getattr(web_driver_options_module, 'Options')
-
-    web_driver_options = web_driver_options_klass()
-
-    web_driver_executable_path = web_driver_d['path']
-
-    web_driver_log_file = web_driver_d.get('log_file', None)
-
-    browser_executable_path = browser_d.get('path', None)
-
-    browsermobproxy = kwargs.get('browsermobproxy', None)
-
-    command_executor = web_driver_d.get('command_executor', None)
-
-    if browser_executable_path:
-        web_driver_options.binary_location = browser_executable_path
-
-    for argument in web_driver_d.get('arguments', []):
-        web_driver_options.add_argument(argument)
-
-    if browsermobproxy:
-        web_driver_options.add_argument(f'--proxy-server={browsermobproxy.proxy}')
-
-
-    for key, value in web_driver_d.get('experimental_options', {}).items():
-        web_driver_options.add_experimental_option(key, value)
-
-    # locally installed driver
-    if web_driver_executable_path is not None:
-        web_driver_klass = getattr(web_driver_klass_module, 'WebDriver')
-
-        web_driver_kwargs = {
-            'executable_path': web_driver_executable_path,
-            "options": web_driver_options,
-            "service_log_path": web_driver_log_file,
-        }
-
-    # remote driver
-    elif command_executor is not None:
-        from selenium import webdriver
-        web_driver_klass = webdriver.Remote
-        capabilities = web_driver_options.to_capabilities()
-
-        web_driver_kwargs = {
-            'command_executor': command_executor,
-            'desired_capabilities': capabilities
-        }
-
-
     web_driver = None
 
     try:
-        web_driver = web_driver_klass(**web_driver_kwargs)
+        web_driver = _create_web_driver(**kwargs)
 
         yield web_driver
     finally:
@@ -333,7 +360,7 @@ def SeleniumWebDriver(**kwargs):
 
 
 @contextlib.contextmanager
-def Screenshot(web_driver, action=None, base_dir=None, logger=None):
+def Screenshot(web_driver, action=None, base_dir=None, logger=None, writer=None):
     """
     It is designed to be used as context-manager. 
     If you want API for simple function call, please use save_screenshot().
@@ -352,6 +379,7 @@ def Screenshot(web_driver, action=None, base_dir=None, logger=None):
     :param action: Optional. Indicator on what action exception occurs.
     :param base_dir: Optional. Directory where to put screenshot.
     :param logger: Optional. If present, logger.warning will be also issued.
+    :param writer: Optional. ScreenshotWriter. If present, screenshot is written in the background.
     :return:
     """
     try:
@@ -368,7 +396,7 @@ def Screenshot(web_driver, action=None, base_dir=None, logger=None):
                                 else \
                                  f'{base_dir}/screen_{action}_{t0_str}.png'
 
-        save_screenshot(web_driver, screenshot_file_name, screen)
+        save_screenshot(web_driver, screenshot_file_name, screen, writer=writer)
         raise e
 
 
@@ -413,13 +441,19 @@ def wait_page_loaded(wait, title=None):
     """
     This is helper function to ensure that some basic elements of the page, such as title are loaded.
 
-    :param wait: how much to wait. WebDriverWait is expecting.
+    See also wait_page_ready() that checks everything in one call per poll and returns page-load metrics.
+
+    :param wait: how much to wait. WebDriverWait or AdaptiveWait is expecting.
     :param title: what should be in the page's title.
     :return:
     """
-    if title is not None:
-        wait.until(EC.title_contains(title))
-    wait.until(EC.visibility_of_all_elements_located((By.XPATH, '/html/body')))
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.common.by import By
+
+    with _span('wait_page_loaded'):
+        if title is not None:
+            wait.until(EC.title_contains(title))
+        wait.until(EC.visibility_of_all_elements_located((By.XPATH, '/html/body')))
 
 def click_sync(web_driver, web_element):
     """
@@ -454,6 +488,8 @@ def wait_chrome_file_finished_downloades(file_name, downloadsPath, default_sleep
 
     Note: if the file is very bigger (more than 200MB) you may need to increase retries number.
 
+    See also wait_chrome_files_finished_downloads() that doesn't sleep, but returns as soon as the file was renamed.
+
 
     :param file_name: to check
     :param downloadsPath: the download's folder of the browser. Typically, /home/<YOUR_USERNAME>/Downloads
@@ -466,27 +502,29 @@ def wait_chrome_file_finished_downloades(file_name, downloadsPath, default_sleep
         logger = logging.getLogger(__name__)
     logger.info("wait_file_downloades()")
 
-    p = Path(downloadsPath)
-
-    while retries > 0:
-        #https://docs.python.org/3/library/os.html#os.scandir
-        #https://msdn.microsoft.com/en-us/library/windows/desktop/aa364418(v=vs.85).aspx
-        #https://msdn.microsoft.com/en-us/library/windows/desktop/aa364428(v=vs.85).aspx
-        #In rare cases or on a heavily loaded system, file attribute information on
-        #NTFS file systems may not be current at the time this function is called.
-        #We want to give a filesystem time to sync with Python's System Call
-        time.sleep(default_sleep_time)
-        with _glob_gen(p, f"{file_name}*.crdownload") as gen:
-            try:
-                filename = next(gen)
-            except StopIteration:
-                break
-            else:
-                logger.info(f'{filename.name} is still downloaded')
-                retries -= 1
-
-    if retries <= 0:
-        raise ValueError("It takes too much time to download the file, aborting...")
+    with _span('wait_chrome_file_finished_downloades'):
+        p = Path(downloadsPath)
+
+        while retries > 0:
+            #https://docs.python.org/3/library/os.html#os.scandir
+            #https://msdn.microsoft.com/en-us/library/windows/desktop/aa364418(v=vs.85).aspx
+            #https://msdn.microsoft.com/en-us/library/windows/desktop/aa364428(v=vs.85).aspx
+            #In rare cases or on a heavily loaded system, file attribute information on
+            #NTFS file systems may not be current at the time this function is called.
+            #We want to give a filesystem time to sync with Python's System Call
+            time.sleep(default_sleep_time)
+            with _glob_gen(p, f"{file_name}*.crdownload") as gen:
+                try:
+                    filename = next(gen)
+                except StopIteration:
+                    break
+                else:
+                    logger.info(f'{filename.name} is still downloaded')
+                    retries -= 1
+                    _incr('wait_chrome_file_finished_downloades.retries')
+
+        if retries <= 0:
+            raise ValueError("It takes too much time to download the file, aborting...")
 
 
 #https://stackoverflow.com/questions/34915421/make-selenium-driver-wait-until-elements-style-attribute-has-changed
@@ -495,14 +533,22 @@ class wait_for_display(object):
     Sometimes, we want to make Selenium Web driver wait until elements style attribute has changed.
     This is usefull for dynamically loaded material.
     For example, we want to wait for the display style to change to none (or to "inline-block" or some other value)
+
+    The element is resolved once and is reused between polls, it is resolved again only when it becomes stale,
+    see LocatorCache. You can share locator_cache between conditions.
+
+    See also wait_for_display_change() that is push-based and doesn't re-query the element on every poll.
     """
-    def __init__(self, locator, display_style='none'):
+    def __init__(self, locator, display_style='none', locator_cache=None):
         self.locator = locator
         self.display_style = display_style
+        self.locator_cache = LocatorCache() if locator_cache is None else locator_cache
 
     def __call__(self, driver):
+        _incr('wait_for_display.polls')
         try:
-            element = driver.find_element(*self.locator)
-            return element.value_of_css_property("display") == self.display_style
+            return self.locator_cache.run(driver, self.locator,
+                                          lambda element: element.value_of_css_property("display") ==
+                                                          self.display_style)
         except StaleElementReferenceException:
             return False
\ No newline at end of file
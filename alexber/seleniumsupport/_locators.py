@@ -0,0 +1,166 @@
+import threading
+import weakref
+
+from selenium.common.exceptions import StaleElementReferenceException
+
+# identity of the current document, it is set on the first check and is lost on navigation
+_DOCUMENT_ID_SCRIPT = """
+if (!window.__seleniumsupportDocumentId) {
+    window.__seleniumsupportDocumentId = Date.now().toString(36) + Math.random().toString(36).slice(2);
+}
+return window.__seleniumsupportDocumentId;
+"""
+
+
+class LocatorCache(object):
+    """
+    Keeps WebElements that locators were resolved to, so custom waits (see wait_for_display, element_condition)
+    don't call find_element() on every poll. Cached WebElement is re-resolved only when it becomes stale
+    (navigation makes all WebElements of the previous document stale) or when navigation is detected.
+
+    Note: if the element stays in the DOM, but another element starts to match the locator first,
+    the cached element is still used. Call invalidate() when you know that the page has changed.
+
+    Navigation detection:
+        None - only staleness is used, it costs no extra WebDriver's commands. It is the default.
+        'url' - current_url is compared on every lookup (one command per lookup).
+        'document' - identity of the document (set by small script) is compared on every lookup
+                     (one command per lookup), it catches also reload of the same URL.
+
+    Usage example:
+
+        locator_cache = LocatorCache()
+        wait = WebDriverWait(web_driver, timeout=70, poll_frequency=0.1)
+        wait.until(wait_for_display((By.XPATH, 'xpath'), locator_cache=locator_cache))
+        print(locator_cache.stats())
+
+    :param navigation: Optional. None, 'url' or 'document'.
+    """
+    def __init__(self, navigation=None):
+        if navigation not in (None, 'url', 'document'):
+            raise ValueError(f"Unknown navigation {navigation}, expected None, 'url' or 'document'")
+        self.navigation = navigation
+        self._lock = threading.Lock()
+        # web_driver -> [navigation token, {locator: WebElement}]
+        self._drivers = weakref.WeakKeyDictionary()
+        self._hits = 0
+        self._misses = 0
+        self._stale = 0
+        self._navigations = 0
+
+    def _token(self, driver):
+        if self.navigation == 'url':
+            return driver.current_url
+        if self.navigation == 'document':
+            return driver.execute_script(_DOCUMENT_ID_SCRIPT)
+        return None
+
+    def _elements(self, driver):
+        token = self._token(driver)
+        with self._lock:
+            entry = self._drivers.get(driver, None)
+            if entry is None:
+                entry = self._drivers[driver] = [token, {}]
+            elif entry[0] != token:
+                entry[0] = token
+                if entry[1]:
+                    self._navigations += 1
+                    entry[1].clear()
+            return entry[1]
+
+    def find_element(self, driver, locator):
+        """
+        :param driver:
+        :param locator: tuple (by, value).
+        :return: cached or newly resolved WebElement.
+        :raises NoSuchElementException: if locator doesn't match anything.
+        """
+        locator = tuple(locator)
+        elements = self._elements(driver)
+        with self._lock:
+            element = elements.get(locator, None)
+            if element is not None:
+                self._hits += 1
+                return element
+            self._misses += 1
+        element = driver.find_element(*locator)
+        with self._lock:
+            elements[locator] = element
+        return element
+
+    def invalidate(self, driver=None, locator=None):
+        """
+        Drops cached WebElements.
+
+        :param driver: Optional. If not supplied, the whole cache is dropped.
+        :param locator: Optional. If not supplied, all WebElements of the driver are dropped.
+        """
+        with self._lock:
+            if driver is None:
+                self._drivers.clear()
+                return
+            entry = self._drivers.get(driver, None)
+            if entry is None:
+                return
+            if locator is None:
+                entry[1].clear()
+            else:
+                entry[1].pop(tuple(locator), None)
+
+    def run(self, driver, locator, f):
+        """
+        Calls f(element) on WebElement of locator. If the cached WebElement turns out to be stale,
+        locator is resolved again and f is called once more.
+
+        :return: what f returns.
+        :raises StaleElementReferenceException: if also newly resolved WebElement is stale.
+        """
+        element = self.find_element(driver, locator)
+        try:
+            return f(element)
+        except StaleElementReferenceException:
+            with self._lock:
+                self._stale += 1
+            self.invalidate(driver, locator)
+            return f(self.find_element(driver, locator))
+
+    def stats(self):
+        """
+        :return: dict with hits, misses, stale (cached WebElement was stale) and navigations (cache was dropped
+                 because navigation was detected).
+        """
+        with self._lock:
+            return {'hits': self._hits, 'misses': self._misses, 'stale': self._stale,
+                    'navigations': self._navigations}
+
+    def reset_stats(self):
+        with self._lock:
+            self._hits = self._misses = self._stale = self._navigations = 0
+
+
+class element_condition(object):
+    """
+    WebDriverWait's condition that resolves locator through LocatorCache and checks predicate(element).
+    The condition returns the element, if predicate is not supplied, otherwise what predicate returns.
+    If the element is stale also after it was resolved again, the condition returns False.
+
+    Usage example:
+
+        wait.until(element_condition((By.ID, 'status'), lambda element: element.text == 'Done'))
+
+    :param locator: tuple (by, value).
+    :param predicate: Optional. callable predicate(element).
+    :param locator_cache: Optional. LocatorCache to share between conditions. If not supplied,
+                          the condition has it's own one.
+    """
+    def __init__(self, locator, predicate=None, locator_cache=None):
+        self.locator = locator
+        self.predicate = predicate
+        self.locator_cache = LocatorCache() if locator_cache is None else locator_cache
+
+    def __call__(self, driver):
+        predicate = self.predicate if self.predicate is not None else (lambda element: element)
+        try:
+            return self.locator_cache.run(driver, self.locator, predicate)
+        except StaleElementReferenceException:
+            return False
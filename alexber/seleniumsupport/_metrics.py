@@ -0,0 +1,155 @@
+import contextlib
+import contextvars
+import logging
+import threading
+import time
+
+SPAN = 'span'
+COUNTER = 'counter'
+
+# copy-on-write, so emitting doesn't require lock
+_listeners = ()
+_listeners_lock = threading.Lock()
+
+_current_recorder = contextvars.ContextVar('seleniumsupport_metrics_recorder', default=None)
+
+
+def add_metrics_listener(listener):
+    """
+    Registers process-wide listener of timing metrics.
+    listener is callable with signature listener(name, kind, value, tags), where
+        kind is 'span' (value is duration in seconds) or 'counter' (value is increment);
+        tags is dict, for span it always has 'error' key.
+    It is called synchronously in the thread that emits the metric, so it should be cheap
+    (for example, it can put the metric to the queue of your metrics pipeline).
+
+    :param listener:
+    :return:
+    """
+    global _listeners
+    with _listeners_lock:
+        _listeners = (*_listeners, listener)
+
+
+def remove_metrics_listener(listener):
+    """
+    Unregisters listener that was registered by add_metrics_listener().
+
+    :param listener:
+    :return:
+    """
+    global _listeners
+    with _listeners_lock:
+        _listeners = tuple(l for l in _listeners if l is not listener)
+
+
+def _emit(name, kind, value, tags):
+    for listener in _listeners:
+        try:
+            listener(name, kind, value, tags)
+        except Exception:
+            logging.getLogger(__name__).warning(f"Metrics listener {listener} failed", exc_info=True)
+    recorder = _current_recorder.get()
+    if recorder is not None:
+        recorder(name, kind, value, tags)
+
+
+@contextlib.contextmanager
+def _span(name, /, **tags):
+    """
+    Measures duration of the code block. If there is no listener and no active recorder, it does nothing.
+    """
+    if not _listeners and _current_recorder.get() is None:
+        yield
+        return
+    error = False
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        error = True
+        raise
+    finally:
+        _emit(name, SPAN, time.perf_counter() - start, {**tags, 'error': error})
+
+
+def _incr(name, value=1, /, **tags):
+    """
+    Increments counter. If there is no listener and no active recorder, it does nothing.
+    """
+    if not _listeners and _current_recorder.get() is None:
+        return
+    _emit(name, COUNTER, value, tags)
+
+
+class MetricsRecorder(object):
+    """
+    Aggregates timing metrics of this package: for every span count, total, min, max duration (in seconds)
+    and number of errors, for every counter it's sum.
+
+    It can be used as context-manager, then it records metrics that are emitted in the current context
+    (thread or asyncio task) only. Note, that new threads don't inherit the context.
+    It can also be registered as process-wide listener, see add_metrics_listener().
+
+    Usage example:
+
+        with MetricsRecorder() as recorder:
+            with SeleniumWebDriver(**dd) as web_driver:
+                ...
+        print(recorder.snapshot()['spans']['web_driver.create'])
+
+    Emitted metrics:
+        spans: bmp_daemon.start, bmp_daemon.close, bmp_proxy.create, bmp_proxy.close, web_driver.create,
+               web_driver.close, browser_data_dir.extract, wait_page_loaded, wait_page_ready,
+               wait_chrome_file_finished_downloades, wait_chrome_files_finished_downloads, screenshot.save,
+               crawl.task, remote.command, adaptive_wait, process_monitor.sample
+        counters: web_driver.force_killed, bmp_daemon.force_killed, wait_chrome_file_finished_downloades.retries,
+                  wait_chrome_files_finished_downloads.polls, wait_for_display.polls, pool.created, pool.retired,
+                  crawl.retries, crawl.timeouts, crawl.sessions_replaced, http_cache.evicted,
+                  bmp_daemon.adopted, bmp_daemon_group.unhealthy, adaptive_wait.polls,
+                  process_monitor.over_limit
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._spans = {}
+        self._counters = {}
+        self._token = None
+
+    def __enter__(self):
+        self._token = _current_recorder.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        _current_recorder.reset(self._token)
+        self._token = None
+
+    def __call__(self, name, kind, value, tags):
+        with self._lock:
+            if kind == SPAN:
+                stats = self._spans.get(name, None)
+                if stats is None:
+                    stats = self._spans[name] = {'count': 0, 'total': 0.0, 'min': value, 'max': value, 'errors': 0}
+                stats['count'] += 1
+                stats['total'] += value
+                stats['min'] = min(stats['min'], value)
+                stats['max'] = max(stats['max'], value)
+                if tags.get('error', False):
+                    stats['errors'] += 1
+            else:
+                self._counters[name] = self._counters.get(name, 0) + value
+
+    def snapshot(self):
+        """
+        :return: dict with 'spans' (name -> dict of count, total, min, max, errors) and 'counters' (name -> sum).
+        """
+        with self._lock:
+            return {'spans': {name: dict(stats) for name, stats in self._spans.items()},
+                    'counters': dict(self._counters)}
+
+    def reset(self):
+        """
+        Discards all recorded metrics.
+        """
+        with self._lock:
+            self._spans.clear()
+            self._counters.clear()
@@ -0,0 +1,227 @@
+import logging
+import threading
+import time
+import weakref
+from contextlib import suppress
+
+import psutil
+
+from ._teardown import _recorded_processes, _process_tree, _web_driver_pid, _bmp_daemon_pid
+from ._metrics import _span, _incr
+
+
+class _Watch(object):
+    """
+    One watched Web Driver or BMP Daemon, it's limits and the last sample.
+    """
+    def __init__(self, pid, max_rss, max_age, on_limit):
+        self.pid = pid
+        self.max_rss = max_rss
+        self.max_age = max_age
+        self.on_limit = on_limit
+        self.started_at = time.monotonic()
+        # psutil.Process objects are kept between samples, cpu_percent() is measured since the previous call
+        self.processes = {}
+        self.sample = None
+        self.over_limit = None
+
+    def age(self):
+        return time.monotonic() - self.started_at
+
+    def limit(self, rss):
+        if self.max_rss is not None and rss is not None and rss >= self.max_rss:
+            return 'max_rss'
+        if self.max_age is not None and self.age() >= self.max_age:
+            return 'max_age'
+        return None
+
+
+def _sample_processes(watch, owner):
+    """
+    :return: (processes, rss, cpu_percent) of the process tree of the owner (the current one and the one that
+             was recorded on start).
+    """
+    current = _process_tree(watch.pid)
+    with suppress(TypeError):
+        current.extend(_recorded_processes.get(owner, ()))
+    processes = {}
+    rss = 0
+    cpu_percent = 0.0
+    for process in dict.fromkeys(current):
+        # psutil.Process is equal to another one only if both pid and creation time are equal
+        process = watch.processes.get(process, process)
+        try:
+            with process.oneshot():
+                rss += process.memory_info().rss
+                cpu_percent += process.cpu_percent(None)
+        except (psutil.NoSuchProcess, psutil.ZombieProcess):
+            continue
+        except psutil.AccessDenied:
+            pass
+        processes[process] = process
+    watch.processes = processes
+    return len(processes), rss, cpu_percent
+
+
+class ProcessTreeMonitor(object):
+    """
+    Samples memory (RSS) and CPU of process trees of Web Drivers (driver, browser and it's renderers) and BMP Daemons
+    on the background thread every interval seconds, see stats().
+
+    Watched owner that crosses max_rss or max_age is marked as over limit (see over_limit()) and on_limit is called.
+    The monitor itself doesn't close anything, the session can't be quit while the job uses it. WebDriverPool and
+    CrawlScheduler (see their max_rss parameter) check over_limit() between leases/tasks and replace such Web Driver
+    with the new one that is built from the same DriverSpec.
+
+    Note: RSS of all processes of the tree is summed, memory that is shared between the processes is counted
+    more than once, so it is the upper bound.
+
+    Usage example:
+
+        with ProcessTreeMonitor(interval=5) as monitor:
+            with BMPDaemon(**dd) as bmp_daemon:
+                monitor.watch(bmp_daemon, max_rss=2 * 1024 ** 3, on_limit=lambda owner, sample: logger.warning(sample))
+                with WebDriverPool(size=4, max_rss=3 * 1024 ** 3, monitor=monitor, **dd) as pool:
+                    ...
+                print(monitor.stats())
+
+    :param interval: Optional. How many seconds between samples. The default value is 5.
+    :param logger: Optional.
+    """
+    def __init__(self, interval=5, logger=None):
+        if interval <= 0:
+            raise ValueError(f"Expected positive interval, but got {interval}")
+        self.interval = interval
+        self.logger = logging.getLogger(__name__) if logger is None else logger
+        self._lock = threading.Lock()
+        self._watches = weakref.WeakKeyDictionary()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def start(self):
+        """
+        Starts the background thread. It is also started by the first watch().
+        """
+        with self._lock:
+            if self._stop.is_set():
+                raise ValueError(f"{type(self).__name__} is closed")
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='process-tree-monitor', daemon=True)
+            self._thread.start()
+
+    def close(self):
+        """
+        Stops the background thread. Watched processes are not affected.
+        """
+        self._stop.set()
+        with self._lock:
+            thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.sample()
+            except Exception:
+                self.logger.warning("Failed to sample process trees", exc_info=True)
+
+    def watch(self, owner, pid=None, max_rss=None, max_age=None, on_limit=None):
+        """
+        Starts to watch process tree of owner. Watching stops, when owner is garbage collected or unwatch() is called.
+
+        :param owner: Web Driver or BMP Daemon.
+        :param pid: Optional. Root of the process tree. The default is the process of Web Driver's service or
+                    of BMP Daemon. Remote Web Driver has no local process, only max_age applies to it.
+        :param max_rss: Optional. How many bytes process tree can take.
+        :param max_age: Optional. How many seconds owner can live.
+        :param on_limit: Optional. callable on_limit(owner, sample) that is called once, when owner crosses the limit.
+                         It is called on the background thread (or on the caller of over_limit()), so it should be
+                         cheap and it should not quit Web Driver that may be in use.
+        :return: owner
+        """
+        if pid is None:
+            pid = _web_driver_pid(owner)
+        if pid is None:
+            pid = _bmp_daemon_pid(owner)
+        with self._lock:
+            self._watches[owner] = _Watch(pid, max_rss, max_age, on_limit)
+        self.start()
+        return owner
+
+    def unwatch(self, owner):
+        with self._lock:
+            self._watches.pop(owner, None)
+
+    def _check(self, owner, watch, rss):
+        reason = watch.limit(rss)
+        if reason is None:
+            return
+        with self._lock:
+            # on_limit is called once, also if the background thread and over_limit() race
+            if watch.over_limit is not None:
+                return
+            watch.over_limit = reason
+        _incr('process_monitor.over_limit', reason=reason)
+        self.logger.info(f"{type(owner).__name__} (pid {watch.pid}) has crossed {reason}, rss={rss}, "
+                         f"age={watch.age():.0f}")
+        if watch.on_limit is not None:
+            try:
+                watch.on_limit(owner, self._snapshot(watch))
+            except Exception:
+                self.logger.warning("on_limit has failed", exc_info=True)
+
+    def _snapshot(self, watch):
+        sample = watch.sample or {'processes': 0, 'rss': None, 'cpu_percent': None}
+        return {'pid': watch.pid, **sample, 'age': watch.age(), 'over_limit': watch.over_limit}
+
+    def sample(self):
+        """
+        Samples all watched process trees now. It is called by the background thread.
+
+        :return: list of dicts, see stats().
+        """
+        with self._lock:
+            watches = list(self._watches.items())
+        with _span('process_monitor.sample', owners=len(watches)):
+            for owner, watch in watches:
+                rss = None
+                if watch.pid is not None:
+                    processes, rss, cpu_percent = _sample_processes(watch, owner)
+                    watch.sample = {'processes': processes, 'rss': rss, 'cpu_percent': cpu_percent}
+                self._check(owner, watch, rss)
+        return [self._snapshot(watch) for _, watch in watches]
+
+    def over_limit(self, owner):
+        """
+        :param owner: Web Driver or BMP Daemon that was passed to watch().
+        :return: 'max_rss' or 'max_age', if owner has crossed the limit (RSS as of the last sample, age as of now),
+                 otherwise None (also if owner is not watched).
+        """
+        with self._lock:
+            watch = self._watches.get(owner, None)
+        if watch is None:
+            return None
+        self._check(owner, watch, None if watch.sample is None else watch.sample['rss'])
+        return watch.over_limit
+
+    def stats(self, owner=None):
+        """
+        :param owner: Optional. Web Driver or BMP Daemon that was passed to watch().
+        :return: dict with pid, processes, rss (bytes), cpu_percent (of one core, summed over the processes),
+                 age (seconds) and over_limit of owner as of the last sample (None, if owner is not watched),
+                 if owner is not supplied, list of such dicts of all watched owners.
+        """
+        with self._lock:
+            if owner is not None:
+                watch = self._watches.get(owner, None)
+                return None if watch is None else self._snapshot(watch)
+            return [self._snapshot(watch) for watch in self._watches.values()]
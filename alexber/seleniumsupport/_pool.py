@@ -0,0 +1,418 @@
+import logging
+import contextlib
+import threading
+import time
+from collections import deque
+from contextlib import suppress
+
+import requests
+from selenium.common.exceptions import WebDriverException
+from browsermobproxy import Client as BmpClientProxy
+
+from ._impl import _validate_param, closeSeleniumWebDriver
+from ._driverspec import DriverSpec
+from ._metrics import _incr
+
+
+def reset_web_driver(web_driver):
+    """
+    Brings web_driver to "clean" state, so it can be reused by another job.
+    All windows except the first one are closed, cookies, localStorage and sessionStorage are cleared
+    and the browser navigates to about:blank.
+
+    If web_driver is broken, WebDriverException will be raised. Such web_driver should not be reused.
+
+    :param web_driver:
+    :return:
+    """
+    handles = web_driver.window_handles
+    for handle in handles[1:]:
+        web_driver.switch_to.window(handle)
+        web_driver.close()
+    web_driver.switch_to.window(handles[0])
+
+    # storage is bound to the current origin, so we should clear it before we're leaving the page
+    # on about:blank, data: urls, etc. accessing storage raises SecurityError in JavaScript
+    with suppress(WebDriverException):
+        web_driver.execute_script("window.localStorage.clear(); window.sessionStorage.clear();")
+    web_driver.delete_all_cookies()
+    web_driver.get('about:blank')
+
+
+def reset_bmp_proxy(bmp_proxy):
+    """
+    Brings bmp_proxy to "clean" state, so it can be reused by another job.
+    Blacklist, whitelist, rewrite rules and DNS cache are cleared. New empty HAR without capture* options is started,
+    the previous HAR is dropped (it is not read into memory).
+
+    Note: unlike a fresh BMP Proxy, bmp_proxy keeps capturing after reset, BMP REST API can only replace HAR,
+    it can't stop the capture. Entries (without headers and content) of everything that goes through bmp_proxy
+    are accumulated till the next HAR is started, so the job should start it's own HAR with set_new_har()
+    before the first request.
+
+    Note: headers, interceptors, limits and timeouts can't be cleared through BMP REST API. If you have changed them,
+    you should discard bmp_proxy instead of reusing it.
+
+    If BMP Daemon fails to handle the request, requests.HTTPError will be raised.
+
+    :param bmp_proxy:
+    :return:
+    """
+    # see https://github.com/lightbody/browsermob-proxy#rest-api
+    base_url = f'{bmp_proxy.host}/proxy/{bmp_proxy.port}'
+    for path in ('blacklist', 'whitelist', 'rewrite', 'dns/cache'):
+        requests.delete(f'{base_url}/{path}').raise_for_status()
+
+    # BMP Daemon returns the previous HAR in the response, we're closing the connection without reading it
+    with contextlib.closing(requests.put(f'{base_url}/har', stream=True)) as resp:
+        resp.raise_for_status()
+
+
+class _PoolEntry(object):
+    __slots__ = ('resource', 'created_at', 'uses')
+
+    def __init__(self, resource):
+        self.resource = resource
+        self.created_at = time.monotonic()
+        self.uses = 0
+
+
+class _BasePool(object):
+    """
+    Keeps up to size resources and leases them out.
+    Between leases resource is reset. Resource is retired after max_uses leases or when it is older than
+    max_age seconds, or when it's reset has failed. Retired resource is replaced by the new one on demand.
+
+    Subclasses should implement _create_resource(), _reset_resource() and _close_resource().
+    """
+    def __init__(self, size=1, max_uses=None, max_age=None, logger=None):
+        if size < 1:
+            raise ValueError(f"Expected positive size, but got {size}")
+
+        self.size = size
+        self.max_uses = max_uses
+        self.max_age = max_age
+        self.logger = logging.getLogger(__name__) if logger is None else logger
+
+        self._idle = deque()
+        self._leased = {}
+        self._count = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def _create_resource(self):
+        raise NotImplementedError
+
+    def _reset_resource(self, resource):
+        raise NotImplementedError
+
+    def _close_resource(self, resource):
+        raise NotImplementedError
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def start(self):
+        """
+        Creates resources up to size.
+        """
+        while True:
+            with self._cond:
+                if self._closed or self._count >= self.size:
+                    return
+                self._count += 1
+            entry = self._create()
+            with self._cond:
+                self._idle.append(entry)
+                self._cond.notify()
+
+    def _create(self):
+        try:
+            entry = _PoolEntry(self._create_resource())
+            _incr('pool.created', pool=type(self).__name__)
+            return entry
+        except BaseException:
+            with self._cond:
+                self._count -= 1
+                self._cond.notify()
+            raise
+
+    def _retire(self, entry):
+        self.logger.debug(f"Retiring {type(entry.resource).__name__} after {entry.uses} uses")
+        _incr('pool.retired', pool=type(self).__name__)
+        try:
+            self._close_resource(entry.resource)
+        except Exception:
+            self.logger.warning(f"Failed to close {type(entry.resource).__name__}", exc_info=True)
+
+    def _is_expired(self, entry):
+        if self.max_uses is not None and entry.uses >= self.max_uses:
+            return True
+        if self.max_age is not None and time.monotonic() - entry.created_at >= self.max_age:
+            return True
+        return False
+
+    def acquire(self, timeout=None):
+        """
+        Leases resource from the pool. If there is no idle resource and the pool has less than size resources,
+        the new one is created. Otherwise, we're waiting till some resource will be released.
+
+        It is caller responsibility to call release(). Consider to use lease() instead.
+
+        :param timeout: Optional. How many seconds to wait for free resource. None means wait forever.
+        :return: resource
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        expired = []
+        entry = None
+        try:
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise ValueError(f"{type(self).__name__} is closed")
+                    while self._idle:
+                        candidate = self._idle.popleft()
+                        if self._is_expired(candidate):
+                            self._count -= 1
+                            expired.append(candidate)
+                        else:
+                            entry = candidate
+                            break
+                    if entry is not None:
+                        break
+                    if self._count < self.size:
+                        self._count += 1
+                        break
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise ValueError(f"It takes too much time to get resource from {type(self).__name__}, "
+                                         f"aborting...")
+                    self._cond.wait(remaining)
+        finally:
+            for candidate in expired:
+                self._retire(candidate)
+
+        if entry is None:
+            entry = self._create()
+
+        entry.uses += 1
+        with self._cond:
+            self._leased[id(entry.resource)] = entry
+        return entry.resource
+
+    def release(self, resource, discard=False):
+        """
+        Returns resource to the pool. It is reset before it will be leased again.
+        If reset fails or resource is expired, it is retired.
+
+        :param resource: that was obtained by acquire().
+        :param discard: Optional. If True, resource will be retired.
+        :return:
+        """
+        with self._cond:
+            entry = self._leased.pop(id(resource), None)
+        if entry is None:
+            raise ValueError(f"resource doesn't belong to {type(self).__name__}")
+
+        if not discard and not self._closed and not self._is_expired(entry):
+            try:
+                self._reset_resource(resource)
+            except Exception:
+                self.logger.warning(f"Failed to reset {type(resource).__name__}", exc_info=True)
+                discard = True
+        else:
+            discard = True
+
+        if discard:
+            self._retire(entry)
+
+        with self._cond:
+            if discard:
+                self._count -= 1
+            else:
+                self._idle.append(entry)
+            self._cond.notify()
+
+    @contextlib.contextmanager
+    def lease(self, timeout=None):
+        """
+        Context-manager version of acquire()/release().
+
+        :param timeout: Optional. How many seconds to wait for free resource. None means wait forever.
+        :return: resource
+        """
+        resource = self.acquire(timeout)
+        try:
+            yield resource
+        finally:
+            self.release(resource)
+
+    def close(self):
+        """
+        Closes all idle resources. Leased resources will be closed on release.
+        """
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._count -= len(idle)
+            self._cond.notify_all()
+
+        for entry in idle:
+            self._retire(entry)
+
+
+class WebDriverPool(_BasePool):
+    """
+    Keeps up to size pre-launched Selenium's Web Drivers that are built from the same parameters
+    as SeleniumWebDriver() and leases them out.
+
+    Between leases web_driver is reset, see reset_web_driver().
+    Web Driver is retired (closed, see closeSeleniumWebDriver()) after max_uses leases or when it is older than
+    max_age seconds, or when it's reset has failed. Retired Web Driver is replaced by the new one on demand.
+    If max_rss is supplied, process tree of every Web Driver is watched by ProcessTreeMonitor and Web Driver
+    that has grown past max_rss bytes is retired on release (or when it is idle, on the next acquire).
+
+    It is designed to be used as context-manager. On enter, size Web Drivers are launched.
+    On exit, all Web Drivers are closed.
+
+    Note: if you pass browsermobproxy, all Web Drivers in the pool will share the same BMP Proxy.
+
+    Usage example:
+
+        with WebDriverPool(size=4, max_uses=50, **dd) as pool:
+            with pool.lease() as web_driver:
+                web_driver.get(url)
+
+    :param size: maximum number of Web Drivers in the pool. The default value is 1.
+    :param max_uses: Optional. How many times Web Driver can be leased before it is retired.
+    :param max_age: Optional. How many seconds Web Driver can live before it is retired.
+    :param logger: Optional.
+    :param max_rss: Optional. How many bytes process tree of Web Driver (driver, browser and it's renderers)
+                    can take before it is retired.
+    :param monitor: Optional. ProcessTreeMonitor to use with max_rss. If not supplied, the pool has it's own one
+                    that samples every 5 seconds, it is closed with the pool.
+    :param kwargs: the same parameters as SeleniumWebDriver() has (web_driver, browser, browsermobproxy, driver_spec).
+    """
+    def __init__(self, size=1, max_uses=None, max_age=None, logger=None, max_rss=None, monitor=None, **kwargs):
+        driver_spec = kwargs.get('driver_spec', None)
+        # web_driver/browser dicts are validated and compiled once for all Web Drivers of the pool
+        self.driver_spec = DriverSpec(**kwargs) if driver_spec is None else driver_spec
+        super().__init__(size=size, max_uses=max_uses, max_age=max_age, logger=logger)
+        self.browsermobproxy = kwargs.get('browsermobproxy', None)
+        self.max_rss = max_rss
+        self.monitor = monitor
+        self._own_monitor = False
+        if max_rss is not None and monitor is None:
+            # psutil is imported only when memory is watched
+            from ._monitor import ProcessTreeMonitor
+            self.monitor = ProcessTreeMonitor(logger=logger)
+            self._own_monitor = True
+
+    def _create_resource(self):
+        web_driver = self.driver_spec.create(self.browsermobproxy)
+        if self.monitor is not None:
+            self.monitor.watch(web_driver, max_rss=self.max_rss)
+        return web_driver
+
+    def _is_expired(self, entry):
+        if super()._is_expired(entry):
+            return True
+        return self.monitor is not None and self.monitor.over_limit(entry.resource) is not None
+
+    def _reset_resource(self, web_driver):
+        reset_web_driver(web_driver)
+
+    def _close_resource(self, web_driver):
+        if self.monitor is not None:
+            self.monitor.unwatch(web_driver)
+        closeSeleniumWebDriver(web_driver)
+
+    def close(self):
+        super().close()
+        if self._own_monitor:
+            self.monitor.close()
+
+
+class BMPProxyPool(_BasePool):
+    """
+    Keeps up to size pre-created BMP Proxies on one shared BMP Daemon and leases them out.
+    It assumes that BMPDaemon is already up. It receives the same parameters as BMPProxy().
+
+    Ports of BMP Proxies are allocated from ports. Pool tracks which ports are free, closed BMP Proxy returns
+    it's port back.
+    Between leases bmp_proxy is reset, see reset_bmp_proxy(), instead of being closed. Leased bmp_proxy has
+    empty HAR capture running, start your own with set_new_har().
+    BMP Proxy is retired (closed) after max_uses leases or when it is older than max_age seconds,
+    or when it's reset has failed.
+
+    It is designed to be used as context-manager. On enter, size BMP Proxies are created.
+    On exit, all BMP Proxies are closed.
+
+    Usage example:
+
+        with BMPProxyPool(size=16, ports=range(9100, 9200), **dd) as pool:
+            with pool.lease() as bmp_proxy:
+                set_new_har(bmp_proxy, 'har_name')
+
+    :param size: maximum number of BMP Proxies in the pool. The default value is 1.
+    :param ports: Optional. Iterable of ports to allocate BMP Proxies from. It should have at least size ports.
+                  If not supplied, BMP Daemon chooses the port (as BMPProxy() does).
+    :param max_uses: Optional. How many times BMP Proxy can be leased before it is retired.
+    :param max_age: Optional. How many seconds BMP Proxy can live before it is retired.
+    :param logger: Optional.
+    :param browsermob: the same dict as BMPProxy() has.
+    """
+    def __init__(self, size=1, ports=None, max_uses=None, max_age=None, logger=None, **kwargs):
+        browsermob_d = kwargs.get('browsermob', None)
+        _validate_param(browsermob_d, 'browsermob')
+        super().__init__(size=size, max_uses=max_uses, max_age=max_age, logger=logger)
+
+        bmp_daemon_host = browsermob_d.get('daemon', {}).get('init', {}).get('options', {}).get('host', 'localhost')
+        bmp_daemon_port = browsermob_d.get('daemon', {}).get('init', {}).get('options', {}).get('port', 8080)
+        self.bmp_daemon_url = f"{bmp_daemon_host}:{bmp_daemon_port}"
+        self.bmp_proxy_params = browsermob_d.get('proxy', {}).get('param', {})
+
+        self._free_ports = None
+        if ports is not None:
+            self._free_ports = deque(ports)
+            if len(self._free_ports) < size:
+                raise ValueError(f"Expected at least {size} ports, but got {len(self._free_ports)}")
+
+    @property
+    def free_ports(self):
+        """
+        Ports that are not used by BMP Proxies of this pool. None, if ports was not supplied.
+        """
+        with self._cond:
+            return None if self._free_ports is None else list(self._free_ports)
+
+    def _create_resource(self):
+        params = self.bmp_proxy_params
+        port = None
+        if self._free_ports is not None:
+            with self._cond:
+                port = self._free_ports.popleft()
+            params = {**params, 'port': port}
+        try:
+            return BmpClientProxy(self.bmp_daemon_url, params)
+        except BaseException:
+            if port is not None:
+                with self._cond:
+                    self._free_ports.append(port)
+            raise
+
+    def _reset_resource(self, bmp_proxy):
+        reset_bmp_proxy(bmp_proxy)
+
+    def _close_resource(self, bmp_proxy):
+        try:
+            bmp_proxy.close()
+        finally:
+            if self._free_ports is not None:
+                with self._cond:
+                    self._free_ports.append(bmp_proxy.port)
@@ -0,0 +1,136 @@
+import threading
+import time
+
+import urllib3
+from selenium.webdriver.remote.remote_connection import RemoteConnection
+
+from ._metrics import _span, MetricsRecorder, SPAN
+
+_shared_pools = {}
+_shared_pools_lock = threading.Lock()
+
+
+class PooledRemoteConnection(RemoteConnection):
+    """
+    RemoteConnection of one Remote Web Driver that sends it's commands through shared RemoteConnectionPool.
+    Latency of every command is recorded, see RemoteConnectionPool.stats().
+    """
+    def __init__(self, pool):
+        # resolve_ip probes the executor with extra connection per Web Driver, urllib3 resolves the host anyway
+        super().__init__(pool.command_executor, keep_alive=False, resolve_ip=False)
+        # requests always go through the shared PoolManager
+        self.keep_alive = True
+        self._conn = pool.pool_manager
+        self._pool = pool
+
+    def get_remote_connection_headers(self, parsed_url, keep_alive=False):
+        headers = RemoteConnection.get_remote_connection_headers(parsed_url, keep_alive)
+        if not self._pool.keep_alive:
+            headers['Connection'] = 'close'
+        return headers
+
+    def execute(self, command, params):
+        error = False
+        start = time.perf_counter()
+        try:
+            with _span('remote.command', command=command):
+                return super().execute(command, params)
+        except BaseException:
+            error = True
+            raise
+        finally:
+            self._pool._stats(command, SPAN, time.perf_counter() - start, {'error': error})
+
+
+class RemoteConnectionPool(object):
+    """
+    HTTP connection pool to the Remote Web Driver's command_executor (for example, Selenium Grid) that is shared
+    by many Web Drivers. By default, every webdriver.Remote has it's own RemoteConnection, that opens new connection
+    per command (or keeps it's own pool with keep_alive), with many concurrent sessions it causes socket churn and
+    TIME_WAIT buildup.
+
+    Use shared() to get the pool that is reused by all Web Drivers that point at the same command_executor
+    with the same parameters. You can also pass connection_pool dict in web_driver dict of SeleniumWebDriver(),
+    see DriverSpec.
+
+    Usage example:
+
+        pool = RemoteConnectionPool.shared('http://grid:4444/wd/hub', maxsize=64, retries=2)
+        with SeleniumWebDriver(connection_pool=pool, **dd) as web_driver:
+            ...
+        print(pool.stats()['get'])
+
+    :param command_executor: URL of the remote server.
+    :param maxsize: Optional. How many connections to keep open. The default value is 10.
+    :param block: Optional. If True, no more than maxsize connections are used at once, commands wait for
+                  free connection. The default value is False.
+    :param keep_alive: Optional. Whether connections are reused between commands. The default value is True.
+    :param connect_timeout: Optional. How many seconds connecting can take.
+    :param read_timeout: Optional. How many seconds waiting for response can take. Note, that some commands
+                         (for example, page load) can take long.
+    :param retries: Optional. How many times connecting is retried. Commands are never retried after they were sent,
+                    they are not idempotent. The default value is 0.
+    :param backoff_factor: Optional. See urllib3.util.Retry.
+    """
+    def __init__(self, command_executor, maxsize=10, block=False, keep_alive=True, connect_timeout=None,
+                 read_timeout=None, retries=0, backoff_factor=0):
+        if maxsize < 1:
+            raise ValueError(f"Expected positive maxsize, but got {maxsize}")
+        self.command_executor = command_executor.rstrip('/')
+        self.maxsize = maxsize
+        self.keep_alive = keep_alive
+        self.pool_manager = urllib3.PoolManager(
+            maxsize=maxsize, block=block,
+            timeout=urllib3.Timeout(connect=connect_timeout, read=read_timeout),
+            retries=urllib3.Retry(total=None, connect=retries, read=False, status=0, redirect=3,
+                                  backoff_factor=backoff_factor, raise_on_status=False))
+        self._stats = MetricsRecorder()
+
+    @classmethod
+    def shared(cls, command_executor, **kwargs):
+        """
+        :param command_executor: URL of the remote server.
+        :param kwargs: Optional. See RemoteConnectionPool().
+        :return: RemoteConnectionPool that is shared by all callers with the same parameters.
+        """
+        key = (command_executor.rstrip('/'), tuple(sorted(kwargs.items())))
+        with _shared_pools_lock:
+            pool = _shared_pools.get(key, None)
+            if pool is None:
+                pool = _shared_pools[key] = cls(command_executor, **kwargs)
+            return pool
+
+    def connection(self):
+        """
+        :return: RemoteConnection for one Web Driver, pass it as command_executor to webdriver.Remote.
+        """
+        return PooledRemoteConnection(self)
+
+    def stats(self):
+        """
+        :return: dict command -> dict of count, total, min, max (in seconds) and errors.
+        """
+        return self._stats.snapshot()['spans']
+
+    def reset_stats(self):
+        self._stats.reset()
+
+    def close(self):
+        """
+        Closes all idle connections. The pool is removed from shared pools.
+        """
+        with _shared_pools_lock:
+            for key, pool in list(_shared_pools.items()):
+                if pool is self:
+                    del _shared_pools[key]
+        self.pool_manager.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __repr__(self):
+        return f'{type(self).__name__}(command_executor={self.command_executor!r}, maxsize={self.maxsize}, ' \
+               f'keep_alive={self.keep_alive})'
@@ -0,0 +1,167 @@
+import binascii
+import hashlib
+import logging
+import os
+import queue
+import struct
+import threading
+import zlib
+
+_PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+_STOP = object()
+
+
+def recompress_png(png, compress_level=9):
+    """
+    Losslessly re-compresses PNG image data with zlib compress_level.
+    All IDAT chunks are merged into one, all other chunks are kept as is.
+
+    :param png: bytes of PNG image
+    :param compress_level: zlib compression level, from 0 to 9.
+    :return: bytes of PNG image
+    """
+    if png[:8] != _PNG_SIGNATURE:
+        raise ValueError("Not a PNG image")
+
+    chunks = []
+    idat = []
+    pos = 8
+    while pos < len(png):
+        length, chunk_type = struct.unpack('>I4s', png[pos:pos + 8])
+        data = png[pos + 8:pos + 8 + length]
+        pos += 12 + length
+        if chunk_type == b'IDAT':
+            if not idat:
+                # placeholder for merged IDAT
+                chunks.append(None)
+            idat.append(data)
+        else:
+            chunks.append((chunk_type, data))
+
+    compressed = zlib.compress(zlib.decompress(b''.join(idat)), compress_level)
+
+    out = [_PNG_SIGNATURE]
+    for chunk in chunks:
+        chunk_type, data = (b'IDAT', compressed) if chunk is None else chunk
+        out.append(struct.pack('>I4s', len(data), chunk_type))
+        out.append(data)
+        out.append(struct.pack('>I', zlib.crc32(chunk_type + data)))
+    return b''.join(out)
+
+
+class ScreenshotWriter(object):
+    """
+    Decodes and writes screenshots in background thread(s), off the hot path.
+
+    Screenshots are put into bounded queue, if the queue is full, submit() blocks.
+    If screenshot is identical to the previous written one, it is not written again, but hardlinked
+    (if hardlink fails, it is written as usual).
+    Optionally, PNG is losslessly re-compressed, see recompress_png().
+
+    It is designed to be used as context-manager. On exit, all pending screenshots are written.
+    You can pass it to Screenshot() or save_screenshot() as writer.
+
+    Usage example:
+
+        with ScreenshotWriter() as writer:
+            with Screenshot(web_driver, action='login', writer=writer):
+                ...
+
+    :param maxsize: Optional. Maximum number of pending screenshots. The default value is 16.
+    :param workers: Optional. Number of worker threads. The default value is 1.
+    :param compress_level: Optional. If supplied, PNG is re-compressed with this zlib level.
+    :param logger: Optional.
+    """
+    def __init__(self, maxsize=16, workers=1, compress_level=None, logger=None):
+        self.compress_level = compress_level
+        self.logger = logging.getLogger(__name__) if logger is None else logger
+        self.written = 0
+        self.deduplicated = 0
+        self.failed = 0
+
+        self._queue = queue.Queue(maxsize)
+        self._lock = threading.Lock()
+        self._last_digest = None
+        self._last_file_name = None
+        self._closed = False
+        self._threads = [threading.Thread(target=self._run, name=f'ScreenshotWriter-{i}', daemon=True)
+                         for i in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def submit(self, screenshot_file_name, screen):
+        """
+        Schedules screen to be written into screenshot_file_name.
+
+        :param screenshot_file_name: file_name where screenshot will be saved.
+        :param screen: base64 encoded PNG (as web_driver.get_screenshot_as_base64() returns) or PNG bytes.
+        :return:
+        """
+        if self._closed:
+            raise ValueError("ScreenshotWriter is closed")
+        self._queue.put((screenshot_file_name, screen))
+
+    def flush(self):
+        """
+        Blocks till all submitted screenshots are written.
+        """
+        self._queue.join()
+
+    def close(self):
+        """
+        Writes all pending screenshots and stops worker threads.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        for _ in self._threads:
+            self._queue.put(_STOP)
+        for thread in self._threads:
+            thread.join()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is _STOP:
+                    return
+                self._write(*item)
+            except Exception:
+                with self._lock:
+                    self.failed += 1
+                self.logger.warning(f"Failed to write screenshot {item[0]}", exc_info=True)
+            finally:
+                self._queue.task_done()
+
+    def _write(self, screenshot_file_name, screen):
+        # a2b_base64 accepts ASCII str as is, without intermediate copy
+        png = binascii.a2b_base64(screen) if isinstance(screen, str) else screen
+        digest = hashlib.blake2b(png, digest_size=16).digest()
+
+        with self._lock:
+            previous = self._last_file_name if digest == self._last_digest else None
+        if previous is not None:
+            try:
+                os.link(previous, screenshot_file_name)
+                with self._lock:
+                    self.deduplicated += 1
+                return
+            except OSError:
+                pass
+
+        if self.compress_level is not None:
+            png = recompress_png(png, self.compress_level)
+        with open(screenshot_file_name, 'wb') as f:
+            f.write(png)
+
+        with self._lock:
+            self._last_digest = digest
+            self._last_file_name = screenshot_file_name
+            self.written += 1
@@ -0,0 +1,187 @@
+import logging
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor, wait as wait_futures
+from contextlib import suppress
+
+import psutil
+
+# owner (web_driver, bmp_daemon) -> processes that were recorded when the session was started
+_recorded_processes = weakref.WeakKeyDictionary()
+
+_KILL_WAIT_TIMEOUT = 1
+
+
+class TeardownReport(object):
+    """
+    What teardown has done.
+
+    terminated - processes that exited after SIGTERM (or by themselves after quit).
+    killed - processes that didn't exit in time and were force-killed (SIGKILL).
+    survived - processes that were still alive after SIGKILL (for example, access denied).
+    errors - exceptions from quit()/stop() and from signal delivery.
+    """
+    def __init__(self):
+        self.terminated = []
+        self.killed = []
+        self.survived = []
+        self.errors = []
+
+    def merge(self, other):
+        self.terminated.extend(other.terminated)
+        self.killed.extend(other.killed)
+        self.survived.extend(other.survived)
+        self.errors.extend(other.errors)
+        return self
+
+    def __repr__(self):
+        return f'{type(self).__name__}(terminated={[p.pid for p in self.terminated]}, ' \
+               f'killed={[p.pid for p in self.killed]}, survived={[p.pid for p in self.survived]}, ' \
+               f'errors={self.errors})'
+
+
+def _process_tree(pid):
+    # if the process was meanwhile terminated, we're ignoring if
+    with suppress(psutil.NoSuchProcess):
+        root = psutil.Process(pid)
+        return [*root.children(recursive=True), root]
+    return []
+
+
+def _record_process_tree(owner, pid):
+    """
+    Records process tree of pid when the session starts. It is used on teardown, so we can find processes
+    that were re-parented meanwhile.
+    """
+    with suppress(TypeError):
+        _recorded_processes[owner] = _process_tree(pid)
+
+
+def _collect_processes(owner, pid):
+    """
+    Process tree of pid now together with the tree that was recorded on start.
+    psutil.Process is equal to another one only if both pid and creation time are equal, so we can't
+    accidentally kill newly created process that reused the pid.
+    """
+    recorded = []
+    with suppress(TypeError):
+        recorded = _recorded_processes.pop(owner, [])
+    current = [] if pid is None else _process_tree(pid)
+    return list(dict.fromkeys([*current, *recorded]))
+
+
+def _web_driver_pid(web_driver):
+    process = getattr(getattr(web_driver, 'service', None), 'process', None)
+    return None if process is None else process.pid
+
+
+def _bmp_daemon_pid(bmp_daemon):
+    process = getattr(bmp_daemon, 'process', None)
+    return None if process is None else process.pid
+
+
+def _is_zombie(process):
+    try:
+        return process.status() == psutil.STATUS_ZOMBIE
+    except psutil.NoSuchProcess:
+        return True
+    except psutil.AccessDenied:
+        return False
+
+
+def terminate_processes(processes, timeout=10, logger=None):
+    """
+    Sends SIGTERM to all processes, waits up to timeout seconds for them to exit (psutil.wait_procs())
+    and sends SIGKILL to the rest.
+
+    :param processes: list of psutil.Process
+    :param timeout: how many seconds to wait after SIGTERM.
+    :param logger: Optional.
+    :return: TeardownReport
+    """
+    if logger is None:
+        logger = logging.getLogger(__name__)
+    report = TeardownReport()
+
+    signalled = []
+    for process in processes:
+        try:
+            process.terminate()
+            signalled.append(process)
+        except psutil.NoSuchProcess:
+            report.terminated.append(process)
+        except psutil.AccessDenied as e:
+            report.errors.append(e)
+
+    gone, alive = psutil.wait_procs(signalled, timeout=max(timeout, 0))
+    report.terminated.extend(gone)
+
+    for process in alive:
+        logger.warning(f"Process {process.pid} didn't exit after SIGTERM, killing it")
+        try:
+            process.kill()
+        except psutil.NoSuchProcess:
+            pass
+        except psutil.AccessDenied as e:
+            report.errors.append(e)
+
+    gone, alive = psutil.wait_procs(alive, timeout=_KILL_WAIT_TIMEOUT)
+    report.killed.extend(gone)
+    for process in alive:
+        # zombie is dead, it is just not reaped yet by it's (new) parent
+        if _is_zombie(process):
+            report.killed.append(process)
+        else:
+            report.survived.append(process)
+    return report
+
+
+def teardown_all(web_drivers=(), bmp_daemons=(), timeout=30, quit_timeout=None, logger=None):
+    """
+    Tears down many Web Drivers and BMP Daemons in parallel with one overall deadline.
+
+    First, web_driver.quit() and bmp_daemon.stop() are called in parallel, up to quit_timeout seconds.
+    Then, all processes of their process trees (recorded on start and current) get SIGTERM,
+    processes that didn't exit till the deadline are force-killed, see terminate_processes().
+
+    :param web_drivers: Optional. Web Drivers to close.
+    :param bmp_daemons: Optional. BMP Daemons to close.
+    :param timeout: overall timeout in seconds. SIGKILL is sent on this deadline.
+    :param quit_timeout: Optional. How many seconds to wait for quit()/stop(). The default value is half of timeout.
+    :param logger: Optional.
+    :return: TeardownReport
+    """
+    if logger is None:
+        logger = logging.getLogger(__name__)
+    deadline = time.monotonic() + timeout
+    if quit_timeout is None:
+        quit_timeout = timeout / 2
+
+    web_drivers = [web_driver for web_driver in web_drivers if web_driver is not None]
+    bmp_daemons = [bmp_daemon for bmp_daemon in bmp_daemons if bmp_daemon is not None]
+
+    processes = []
+    for web_driver in web_drivers:
+        processes.extend(_collect_processes(web_driver, _web_driver_pid(web_driver)))
+    for bmp_daemon in bmp_daemons:
+        processes.extend(_collect_processes(bmp_daemon, _bmp_daemon_pid(bmp_daemon)))
+    processes = list(dict.fromkeys(processes))
+
+    report = TeardownReport()
+    calls = [web_driver.quit for web_driver in web_drivers]
+    calls.extend(bmp_daemon.stop for bmp_daemon in bmp_daemons if bmp_daemon.process is not None)
+    if calls:
+        executor = ThreadPoolExecutor(max_workers=len(calls), thread_name_prefix='teardown')
+        try:
+            futures = [executor.submit(call) for call in calls]
+            done, not_done = wait_futures(futures, timeout=quit_timeout)
+            for future in done:
+                if future.exception() is not None:
+                    report.errors.append(future.exception())
+            if not_done:
+                logger.warning(f"{len(not_done)} quit/stop calls didn't finish in {quit_timeout} seconds")
+        finally:
+            # hanging calls will fail, when their processes will be killed
+            executor.shutdown(wait=False)
+
+    return report.merge(terminate_processes(processes, deadline - time.monotonic(), logger))
@@ -0,0 +1,296 @@
+from selenium.common.exceptions import StaleElementReferenceException, JavascriptException, TimeoutException
+
+from ._batch import _FIND_FUNCTION
+from ._metrics import _span
+
+_MUTATION_SCRIPT = _FIND_FUNCTION + """
+var spec = arguments[0], timeoutMs = arguments[1], done = arguments[arguments.length - 1];
+
+function first() {
+    var found = find(spec.by, spec.value);
+    return found.length ? found[0] : null;
+}
+
+function check() {
+    var el = first();
+    switch (spec.kind) {
+        case 'appearance':
+            return el;
+        case 'removal':
+            return el === null;
+        case 'style':
+            return el !== null && window.getComputedStyle(el).getPropertyValue(spec.name) === spec.expected;
+        case 'text':
+            return el !== null && (el.innerText !== undefined ? el.innerText : el.textContent).indexOf(spec.expected) !== -1;
+    }
+    throw new Error('Unsupported kind ' + spec.kind);
+}
+
+var initial = check();
+if (initial) {
+    return done(initial);
+}
+
+var finished = false, timer = null, observer = null, resizeObserver = null;
+var events = ['transitionend', 'animationend'];
+
+function finish(value) {
+    if (finished) {
+        return;
+    }
+    finished = true;
+    clearTimeout(timer);
+    observer.disconnect();
+    if (resizeObserver !== null) {
+        resizeObserver.disconnect();
+    }
+    events.forEach(function (name) {
+        document.removeEventListener(name, onChange, true);
+    });
+    done(value);
+}
+
+function onChange() {
+    var value = check();
+    if (value) {
+        finish(value);
+    }
+}
+
+observer = new MutationObserver(onChange);
+observer.observe(document.documentElement, {subtree: true, childList: true, attributes: true, characterData: true});
+// style may be changed without DOM mutation, for example, by media query or animation
+if (spec.kind === 'style' && window.ResizeObserver) {
+    var el = first();
+    if (el !== null) {
+        resizeObserver = new ResizeObserver(onChange);
+        resizeObserver.observe(el);
+    }
+}
+events.forEach(function (name) {
+    document.addEventListener(name, onChange, true);
+});
+timer = setTimeout(function () {
+    finish(false);
+}, timeoutMs);
+"""
+
+
+class _mutation_wait(object):
+    """
+    Base class for push-based waits. Condition is checked inside the page and MutationObserver is installed,
+    so one execute_async_script() call resolves as soon as the DOM changes (or after max_block seconds).
+
+    It is designed to be used as WebDriverWait's condition: wait.until(condition).
+    max_block should be less than web_driver's script timeout (the default is 30 seconds).
+    """
+    kind = None
+
+    def __init__(self, locator, max_block=5):
+        self.locator = locator
+        self.max_block = max_block
+
+    def _spec(self):
+        return {'kind': self.kind, 'by': self.locator[0], 'value': self.locator[1]}
+
+    def __call__(self, driver):
+        try:
+            return driver.execute_async_script(_MUTATION_SCRIPT, self._spec(), int(self.max_block * 1000))
+        except (StaleElementReferenceException, TimeoutException):
+            return False
+        except JavascriptException:
+            # for example, document was unloaded while we're waiting
+            return False
+
+
+class wait_for_style_change(_mutation_wait):
+    """
+    Push-based wait until computed style property_name of the element becomes value.
+    The element may be absent in the beginning.
+
+    Usage example:
+
+        wait = WebDriverWait(web_driver, timeout=70, poll_frequency=0.1)
+        wait.until(wait_for_style_change((By.XPATH, 'xpath'), 'visibility', 'hidden'))
+    """
+    kind = 'style'
+
+    def __init__(self, locator, property_name, value, max_block=5):
+        super().__init__(locator, max_block)
+        self.property_name = property_name
+        self.value = value
+
+    def _spec(self):
+        return {**super()._spec(), 'name': self.property_name, 'expected': self.value}
+
+
+class wait_for_display_change(wait_for_style_change):
+    """
+    Push-based version of wait_for_display().
+
+    Usage example:
+
+        wait = WebDriverWait(web_driver, timeout=70, poll_frequency=0.1)
+        wait.until(wait_for_display_change((By.XPATH, 'xpath')))
+    """
+    def __init__(self, locator, display_style='none', max_block=5):
+        super().__init__(locator, 'display', display_style, max_block)
+
+
+class wait_for_element_appearance(_mutation_wait):
+    """
+    Push-based wait until the element is present in the DOM. The condition returns WebElement.
+    """
+    kind = 'appearance'
+
+
+class wait_for_element_removal(_mutation_wait):
+    """
+    Push-based wait until the element is removed from the DOM.
+    """
+    kind = 'removal'
+
+
+class wait_for_text_change(_mutation_wait):
+    """
+    Push-based wait until rendered text of the element contains text.
+    """
+    kind = 'text'
+
+    def __init__(self, locator, text, max_block=5):
+        super().__init__(locator, max_block)
+        self.text = text
+
+    def _spec(self):
+        return {**super()._spec(), 'expected': self.text}
+
+
+_READY_SCRIPT = """
+var spec = arguments[0];
+var perf = window.performance;
+
+if (spec.networkIdle && !window.__seleniumSupportNetwork) {
+    var network = window.__seleniumSupportNetwork = {inflight: 0, last: perf.now()};
+    var start = function () {
+        network.inflight++;
+    };
+    var end = function () {
+        network.inflight = Math.max(0, network.inflight - 1);
+        network.last = perf.now();
+    };
+    if (window.fetch) {
+        var originalFetch = window.fetch;
+        window.fetch = function () {
+            start();
+            return originalFetch.apply(this, arguments).then(function (resp) {
+                end();
+                return resp;
+            }, function (err) {
+                end();
+                throw err;
+            });
+        };
+    }
+    var originalSend = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function () {
+        start();
+        this.addEventListener('loadend', end);
+        return originalSend.apply(this, arguments);
+    };
+}
+
+if (document.readyState !== 'complete') {
+    return false;
+}
+if (spec.title !== null && document.title.indexOf(spec.title) === -1) {
+    return false;
+}
+var body = document.body;
+if (!body) {
+    return false;
+}
+var bodyStyle = window.getComputedStyle(body);
+if (bodyStyle.display === 'none' || bodyStyle.visibility === 'hidden') {
+    return false;
+}
+
+var resources = perf.getEntriesByType('resource');
+if (spec.networkIdle) {
+    var net = window.__seleniumSupportNetwork;
+    var last = net.last;
+    for (var i = 0; i < resources.length; i++) {
+        last = Math.max(last, resources[i].responseEnd);
+    }
+    if (net.inflight > 0 || perf.now() - last < spec.idleMs) {
+        return false;
+    }
+}
+
+var navigation = perf.getEntriesByType('navigation')[0];
+return {
+    url: document.location.href,
+    title: document.title,
+    navigation: navigation ? navigation.toJSON() : null,
+    timing: perf.timing ? perf.timing.toJSON() : null,
+    resourceCount: resources.length,
+    resources: spec.resources ? resources.map(function (r) {
+        return r.toJSON();
+    }) : null
+};
+"""
+
+
+class page_ready(object):
+    """
+    Readiness probe of the page. It checks document.readyState, the title, visibility of the body and,
+    optionally, network idle in one execute_script() per poll.
+
+    Network idle means that there is no in-flight fetch/XHR and no resource has finished in the last
+    idle_time seconds. Note, fetch/XHR are tracked only from the first poll on.
+
+    When the page is ready, the condition returns dict with url, title, navigation (Navigation Timing entry),
+    timing (legacy performance.timing), resourceCount and resources (Resource Timing entries, if resources is True).
+
+    It is designed to be used as WebDriverWait's condition, see wait_page_ready().
+
+    :param title: Optional. What should be in the page's title.
+    :param network_idle: Optional. Whether to wait for network idle.
+    :param idle_time: Optional. How many seconds network should be quiet. The default value is 0.5.
+    :param resources: Optional. Whether to return Resource Timing entries.
+    """
+    def __init__(self, title=None, network_idle=False, idle_time=0.5, resources=False):
+        self.title = title
+        self.network_idle = network_idle
+        self.idle_time = idle_time
+        self.resources = resources
+
+    def __call__(self, driver):
+        spec = {'title': self.title, 'networkIdle': self.network_idle, 'idleMs': int(self.idle_time * 1000),
+                'resources': self.resources}
+        try:
+            return driver.execute_script(_READY_SCRIPT, spec)
+        except JavascriptException:
+            # for example, document was unloaded while we're checking
+            return False
+
+
+def wait_page_ready(wait, title=None, network_idle=False, idle_time=0.5, resources=False):
+    """
+    Single-call alternative to wait_page_loaded(). See page_ready for the details.
+
+    Usage example:
+
+        wait = WebDriverWait(web_driver, timeout=70, poll_frequency=0.2)
+        metrics = wait_page_ready(wait, network_idle=True)
+        load_time = metrics['navigation']['loadEventEnd']
+
+    :param wait: how much to wait. WebDriverWait is expecting.
+    :param title: Optional. What should be in the page's title.
+    :param network_idle: Optional. Whether to wait for network idle.
+    :param idle_time: Optional. How many seconds network should be quiet.
+    :param resources: Optional. Whether to return Resource Timing entries.
+    :return: dict with page's Navigation Timing / Resource Timing data.
+    """
+    with _span('wait_page_ready'):
+        return wait.until(page_ready(title=title, network_idle=network_idle, idle_time=idle_time,
+                                     resources=resources))
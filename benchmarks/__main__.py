@@ -0,0 +1,316 @@
+"""
+Offline benchmarks of session lifecycle and helpers of alexber.seleniumsupport.
+
+Browser and BrowserMob Proxy are replaced by in-process fake servers, see benchmarks._fakes, so it runs
+on plain Linux box without browser and without network.
+
+Usage example:
+
+    python -m benchmarks --save baseline.json
+    # ... change the code ...
+    python -m benchmarks --baseline baseline.json --tolerance 0.2
+
+With --baseline, exit code is 1 if p50 of some benchmark is worse than the baseline by more than tolerance.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import ExitStack
+from pathlib import Path
+
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.remote.remote_connection import RemoteConnection
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.wait import WebDriverWait
+
+from alexber.seleniumsupport import AdaptiveWait, DriverSpec, RemoteConnectionPool, SeleniumWebDriver, BMPProxy, \
+    Screenshot, ScreenshotWriter, set_new_har, wait_page_loaded, wait_page_ready, wait_for_display, \
+    wait_chrome_files_finished_downloads
+
+from ._fakes import FakeWebDriverServer, FakeBMPServer
+
+BASELINE_VERSION = 1
+
+_benchmarks = {}
+
+
+def benchmark(name):
+    """
+    Registers benchmark. Benchmark is function that receives context dict and returns callable
+    (one measured operation).
+    """
+    def decorator(f):
+        _benchmarks[name] = f
+        return f
+    return decorator
+
+
+def _percentile(sorted_values, p):
+    # nearest-rank
+    index = max(0, min(len(sorted_values) - 1, int(round(p / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def _summary(samples):
+    values = sorted(samples)
+    total = sum(values)
+    return {
+        'iterations': len(values),
+        'min': values[0],
+        'p50': _percentile(values, 50),
+        'p90': _percentile(values, 90),
+        'p99': _percentile(values, 99),
+        'max': values[-1],
+        'mean': statistics.mean(values),
+        'ops_per_sec': len(values) / total if total else None,
+    }
+
+
+def run_benchmark(operation, iterations, warmup):
+    for _ in range(warmup):
+        operation()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        operation()
+        samples.append(time.perf_counter() - start)
+    return _summary(samples)
+
+
+@benchmark('web_driver.lifecycle')
+def _web_driver_lifecycle(ctx):
+    def operation():
+        with SeleniumWebDriver(**ctx['dd']):
+            pass
+    return operation
+
+
+@benchmark('web_driver.lifecycle.driver_spec')
+def _web_driver_lifecycle_driver_spec(ctx):
+    driver_spec = DriverSpec(**ctx['dd'])
+
+    def operation():
+        with SeleniumWebDriver(driver_spec=driver_spec):
+            pass
+    return operation
+
+
+def _connection_pool(ctx):
+    return ctx['enter'](RemoteConnectionPool(ctx['dd']['web_driver']['command_executor'], connect_timeout=30,
+                                             read_timeout=30))
+
+
+@benchmark('web_driver.lifecycle.connection_pool')
+def _web_driver_lifecycle_connection_pool(ctx):
+    driver_spec = DriverSpec(connection_pool=_connection_pool(ctx), **ctx['dd'])
+
+    def operation():
+        with SeleniumWebDriver(driver_spec=driver_spec):
+            pass
+    return operation
+
+
+@benchmark('bmp_proxy.lifecycle')
+def _bmp_proxy_lifecycle(ctx):
+    def operation():
+        with BMPProxy(browsermob=ctx['browsermob']):
+            pass
+    return operation
+
+
+@benchmark('set_new_har')
+def _set_new_har(ctx):
+    bmp_proxy = ctx['enter'](BMPProxy(browsermob=ctx['browsermob']))
+
+    def operation():
+        set_new_har(bmp_proxy, 'har_name')
+    return operation
+
+
+@benchmark('wait_page_loaded')
+def _wait_page_loaded(ctx):
+    wait = WebDriverWait(ctx['enter'](SeleniumWebDriver(**ctx['dd'])), timeout=5, poll_frequency=0.01)
+
+    def operation():
+        wait_page_loaded(wait, title=FakeWebDriverServer.title)
+    return operation
+
+
+@benchmark('wait_page_loaded.connection_pool')
+def _wait_page_loaded_connection_pool(ctx):
+    web_driver = ctx['enter'](SeleniumWebDriver(connection_pool=_connection_pool(ctx), **ctx['dd']))
+    wait = WebDriverWait(web_driver, timeout=5, poll_frequency=0.01)
+
+    def operation():
+        wait_page_loaded(wait, title=FakeWebDriverServer.title)
+    return operation
+
+
+@benchmark('wait_page_loaded.adaptive')
+def _wait_page_loaded_adaptive(ctx):
+    wait = AdaptiveWait(ctx['enter'](SeleniumWebDriver(**ctx['dd'])), timeout=5)
+
+    def operation():
+        wait_page_loaded(wait, title=FakeWebDriverServer.title)
+    return operation
+
+
+@benchmark('wait_page_ready')
+def _wait_page_ready(ctx):
+    wait = WebDriverWait(ctx['enter'](SeleniumWebDriver(**ctx['dd'])), timeout=5, poll_frequency=0.01)
+
+    def operation():
+        wait_page_ready(wait, title=FakeWebDriverServer.title)
+    return operation
+
+
+@benchmark('wait_for_display')
+def _wait_for_display(ctx):
+    wait = WebDriverWait(ctx['enter'](SeleniumWebDriver(**ctx['dd'])), timeout=5, poll_frequency=0.01)
+
+    def operation():
+        wait.until(wait_for_display((By.XPATH, '//div'), 'block'))
+    return operation
+
+
+@benchmark('wait_for_display.adaptive')
+def _wait_for_display_adaptive(ctx):
+    wait = AdaptiveWait(ctx['enter'](SeleniumWebDriver(**ctx['dd'])), timeout=5)
+
+    def operation():
+        wait.until(wait_for_display((By.XPATH, '//div'), 'block'))
+    return operation
+
+
+@benchmark('wait_chrome_files_finished_downloads')
+def _wait_downloads(ctx):
+    downloads_dir = tempfile.mkdtemp(dir=ctx['tmp_dir'])
+    Path(downloads_dir, 'report.pdf').touch()
+
+    def operation():
+        wait_chrome_files_finished_downloads('report.pdf', downloads_dir, timeout=5)
+    return operation
+
+
+def _screenshot_operation(web_driver, base_dir, writer=None):
+    def operation():
+        try:
+            with Screenshot(web_driver, action='bench', base_dir=base_dir, writer=writer):
+                raise WebDriverException('bench')
+        except WebDriverException:
+            pass
+    return operation
+
+
+@benchmark('screenshot')
+def _screenshot(ctx):
+    web_driver = ctx['enter'](SeleniumWebDriver(**ctx['dd']))
+    return _screenshot_operation(web_driver, tempfile.mkdtemp(dir=ctx['tmp_dir']))
+
+
+@benchmark('screenshot.writer')
+def _screenshot_writer(ctx):
+    web_driver = ctx['enter'](SeleniumWebDriver(**ctx['dd']))
+    writer = ctx['enter'](ScreenshotWriter())
+    return _screenshot_operation(web_driver, tempfile.mkdtemp(dir=ctx['tmp_dir']), writer)
+
+
+def run(names=None, iterations=200, warmup=10, latency=0):
+    """
+    Runs benchmarks against fresh fake servers.
+
+    :param names: Optional. Names of benchmarks to run. The default is all of them.
+    :param iterations: how many measured operations per benchmark.
+    :param warmup: how many not measured operations per benchmark.
+    :param latency: Optional. How many seconds every request to the fake servers should take.
+    :return: dict name -> summary (iterations, min, p50, p90, p99, max, mean in seconds and ops_per_sec).
+    """
+    results = {}
+    # explicit timeout, so hanging fake server fails the benchmark (and newer urllib3 rejects selenium's default)
+    RemoteConnection.set_timeout(30)
+    try:
+        for name in (names or _benchmarks):
+            with ExitStack() as stack:
+                # sessions that benchmark opens are closed before the servers
+                web_driver_server = stack.enter_context(FakeWebDriverServer(latency))
+                bmp_server = stack.enter_context(FakeBMPServer(latency))
+                ctx = {
+                    'dd': {'web_driver': {'name': 'chrome', 'path': None,
+                                          'command_executor': web_driver_server.url}},
+                    'browsermob': bmp_server.browsermob,
+                    'tmp_dir': stack.enter_context(tempfile.TemporaryDirectory()),
+                    'enter': stack.enter_context,
+                }
+                operation = _benchmarks[name](ctx)
+                results[name] = run_benchmark(operation, iterations, warmup)
+    finally:
+        RemoteConnection.reset_timeout()
+    return results
+
+
+def compare(results, baseline, tolerance=0.2):
+    """
+    :return: list of (name, baseline p50, current p50) of benchmarks that are slower than baseline
+             by more than tolerance.
+    """
+    regressions = []
+    for name, summary in results.items():
+        base = baseline.get('results', {}).get(name, None)
+        if base is None:
+            continue
+        if summary['p50'] > base['p50'] * (1 + tolerance):
+            regressions.append((name, base['p50'], summary['p50']))
+    return regressions
+
+
+def _format(results):
+    lines = [f"{'benchmark':<40}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}{'ops/s':>10}"]
+    for name, s in results.items():
+        lines.append(f"{name:<40}{s['p50'] * 1000:>10.3f}{s['p90'] * 1000:>10.3f}{s['p99'] * 1000:>10.3f}"
+                     f"{s['max'] * 1000:>10.3f}{s['ops_per_sec'] or 0:>10.1f}")
+    return '\n'.join(lines)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description=__doc__.strip().splitlines()[0])
+    parser.add_argument('names', nargs='*', help=f'benchmarks to run, one of {list(_benchmarks)}')
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument('--latency', type=float, default=0, help='seconds per request to the fake servers')
+    parser.add_argument('--save', help='file to write results (baseline) to')
+    parser.add_argument('--baseline', help='file with baseline to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    ns = parser.parse_args(args)
+
+    unknown = [name for name in ns.names if name not in _benchmarks]
+    if unknown:
+        parser.error(f'unknown benchmarks {unknown}, expected some of {list(_benchmarks)}')
+
+    logging.basicConfig(level=logging.WARNING)
+    results = run(ns.names, ns.iterations, ns.warmup, ns.latency)
+    print(_format(results))
+
+    if ns.save:
+        with open(ns.save, 'w') as f:
+            json.dump({'version': BASELINE_VERSION, 'python': platform.python_version(),
+                       'platform': platform.platform(), 'cpu_count': os.cpu_count(),
+                       'iterations': ns.iterations, 'latency': ns.latency, 'results': results}, f, indent=2)
+
+    if ns.baseline:
+        with open(ns.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, ns.tolerance)
+        for name, base, current in regressions:
+            print(f'REGRESSION {name}: p50 {base * 1000:.3f} ms -> {current * 1000:.3f} ms', file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
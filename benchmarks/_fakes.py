@@ -0,0 +1,241 @@
+import base64
+import itertools
+import json
+import re
+import struct
+import threading
+import time
+import uuid
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# see https://www.w3.org/TR/webdriver/#elements
+_ELEMENT_KEY = 'element-6066-11e4-a52e-4f735466cecf'
+
+
+def _png(width=64, height=64):
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+    raw = b''.join(b'\x00' + b'\x80\x80\x80' * width for _ in range(height))
+    return b''.join([b'\x89PNG\r\n\x1a\n',
+                     chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)),
+                     chunk(b'IDAT', zlib.compress(raw)),
+                     chunk(b'IEND', b'')])
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # headers and body in one segment, otherwise Nagle's algorithm delays kept-alive connections by 40 ms
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _body(self):
+        length = int(self.headers.get('Content-Length', 0))
+        if not length:
+            return None
+        data = self.rfile.read(length)
+        # BMP REST API receives form-encoded body
+        if 'json' not in self.headers.get('Content-Type', 'application/json'):
+            return data
+        return json.loads(data)
+
+    def _reply(self, status=200, payload=None):
+        data = b'' if payload is None else json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _dispatch(self):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        body = self._body()
+        for method, pattern, handler in self.server.routes:
+            if method != self.command:
+                continue
+            match = pattern.fullmatch(self.path.split('?', 1)[0])
+            if match is not None:
+                status, payload = handler(body, *match.groups())
+                self._reply(status, payload)
+                return
+        self._reply(404, {'value': {'error': 'unknown command', 'message': f'{self.command} {self.path}'}})
+
+    do_GET = do_POST = do_PUT = do_DELETE = _dispatch
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # selenium opens new connection per command, the default backlog (5) resets them under load
+    request_queue_size = 128
+
+
+class _FakeServer(object):
+    """
+    In-process HTTP server on the random local port. It is designed to be used as context-manager.
+
+    :param latency: Optional. How many seconds every request should take, to emulate network/browser.
+    """
+    def __init__(self, latency=0):
+        self.latency = latency
+        self._httpd = None
+        self._thread = None
+
+    def _routes(self):
+        raise NotImplementedError
+
+    @property
+    def port(self):
+        return self._httpd.server_address[1]
+
+    def __enter__(self):
+        self._httpd = _HTTPServer(('127.0.0.1', 0), _Handler)
+        self._httpd.latency = self.latency
+        self._httpd.routes = [(method, re.compile(pattern), handler) for method, pattern, handler in self._routes()]
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name=type(self).__name__, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        self._thread.join()
+
+
+class FakeWebDriverServer(_FakeServer):
+    """
+    Minimal W3C WebDriver remote end. Every session has one page with the title 'Fake page',
+    every locator matches one element that is displayed with 'display: block'.
+
+    Usage example:
+
+        with FakeWebDriverServer() as server:
+            with SeleniumWebDriver(web_driver={'name': 'chrome', 'path': None,
+                                               'command_executor': server.url}) as web_driver:
+                web_driver.get('http://example.com')
+    """
+    title = 'Fake page'
+
+    def __init__(self, latency=0):
+        super().__init__(latency)
+        self.sessions = set()
+        self._element_ids = itertools.count()
+        self._screenshot = base64.b64encode(_png()).decode('ascii')
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.port}'
+
+    def _element(self):
+        return {_ELEMENT_KEY: f'element-{next(self._element_ids)}'}
+
+    def _script_result(self, script):
+        # wait_page_ready()
+        if 'document.readyState' in script:
+            return {'url': 'http://example.com/', 'title': self.title, 'navigation': None, 'timing': None,
+                    'resourceCount': 0, 'resources': None}
+        return True
+
+    def _new_session(self, body):
+        session_id = uuid.uuid4().hex
+        self.sessions.add(session_id)
+        return 200, {'value': {'sessionId': session_id, 'capabilities': {'browserName': 'fake'}}}
+
+    def _delete_session(self, body, session_id):
+        self.sessions.discard(session_id)
+        return 200, {'value': None}
+
+    def _routes(self):
+        session = '/session/([^/]+)'
+        element = f'{session}/element/([^/]+)'
+        return [
+            ('POST', '/session', self._new_session),
+            ('DELETE', session, self._delete_session),
+            ('POST', f'{session}/url', lambda body, sid: (200, {'value': None})),
+            ('GET', f'{session}/url', lambda body, sid: (200, {'value': 'http://example.com/'})),
+            ('GET', f'{session}/title', lambda body, sid: (200, {'value': self.title})),
+            ('GET', f'{session}/screenshot', lambda body, sid: (200, {'value': self._screenshot})),
+            ('POST', f'{session}/execute/sync',
+             lambda body, sid: (200, {'value': self._script_result(body['script'])})),
+            ('POST', f'{session}/execute/async',
+             lambda body, sid: (200, {'value': self._script_result(body['script'])})),
+            ('POST', f'{session}/element', lambda body, sid: (200, {'value': self._element()})),
+            ('POST', f'{session}/elements', lambda body, sid: (200, {'value': [self._element()]})),
+            ('GET', f'{element}/css/([^/]+)', lambda body, sid, eid, name: (200, {'value': 'block'})),
+            ('POST', f'{element}/click', lambda body, sid, eid: (200, {'value': None})),
+            ('GET', f'{session}/window/handles', lambda body, sid: (200, {'value': ['window-0']})),
+            ('POST', f'{session}/window', lambda body, sid: (200, {'value': None})),
+            ('DELETE', f'{session}/window', lambda body, sid: (200, {'value': []})),
+            ('DELETE', f'{session}/cookie', lambda body, sid: (200, {'value': None})),
+        ]
+
+
+class FakeBMPServer(_FakeServer):
+    """
+    Minimal BrowserMob Proxy REST API: creating/deleting proxies, HAR and blacklist/whitelist/rewrite/dns cache.
+    It doesn't proxy anything.
+
+    Usage example:
+
+        with FakeBMPServer() as server:
+            with BMPProxy(browsermob=server.browsermob) as bmp_proxy:
+                set_new_har(bmp_proxy, 'har_name')
+    """
+    def __init__(self, latency=0, first_port=9000):
+        super().__init__(latency)
+        self.proxies = {}
+        self._ports = itertools.count(first_port)
+        self._lock = threading.Lock()
+
+    @property
+    def browsermob(self):
+        """
+        browsermob dict for BMPProxy() and BMPProxyPool().
+        """
+        return {'daemon': {'init': {'options': {'host': '127.0.0.1', 'port': self.port}}}}
+
+    def _har(self, ref=None, title=None):
+        return {'log': {'version': '1.2', 'creator': {'name': 'FakeBMPServer', 'version': '0'},
+                        'pages': [{'id': ref, 'title': title or ref}] if ref is not None else [],
+                        'entries': []}}
+
+    def _new_proxy(self, body):
+        with self._lock:
+            port = next(self._ports)
+            self.proxies[port] = self._har()
+        return 200, {'port': port}
+
+    def _delete_proxy(self, body, port):
+        with self._lock:
+            found = self.proxies.pop(int(port), None)
+        return (200, None) if found is not None else (404, None)
+
+    def _new_har(self, body, port):
+        # body is form-encoded, we don't parse it
+        with self._lock:
+            previous = self.proxies.get(int(port))
+            if previous is None:
+                return 404, None
+            self.proxies[int(port)] = self._har('Page 1')
+        return (204, None) if not previous['log']['entries'] and not previous['log']['pages'] else (200, previous)
+
+    def _get_har(self, body, port):
+        with self._lock:
+            har = self.proxies.get(int(port))
+        return (200, har) if har is not None else (404, None)
+
+    def _routes(self):
+        proxy = '/proxy/([0-9]+)'
+        return [
+            ('POST', '/proxy', self._new_proxy),
+            ('GET', '/proxy', lambda body: (200, {'proxyList': [{'port': port} for port in list(self.proxies)]})),
+            ('DELETE', proxy, self._delete_proxy),
+            ('PUT', f'{proxy}/har', self._new_har),
+            ('GET', f'{proxy}/har', self._get_har),
+            ('PUT', f'{proxy}/(?:blacklist|whitelist)', lambda body, port: (200, None)),
+            ('DELETE', f'{proxy}/(?:blacklist|whitelist|rewrite|dns/cache)', lambda body, port: (200, None)),
+        ]
@@ -0,0 +1,155 @@
+import asyncio
+import logging
+import time
+
+import pytest
+from selenium.common.exceptions import TimeoutException, NoSuchElementException
+from selenium.webdriver.support.wait import WebDriverWait
+
+from alexber.seleniumsupport import AdaptiveWait, Deadline, all_of, any_of, SeleniumWebDriver, wait_page_loaded, \
+    async_wait_until, async_wait_page_loaded, async_wait_page_ready, MetricsRecorder
+from benchmarks._fakes import FakeWebDriverServer
+
+logger = logging.getLogger(__name__)
+
+
+def _after(seconds, value='ok'):
+    end = time.monotonic() + seconds
+    return lambda driver: time.monotonic() >= end and value
+
+
+def _never(driver):
+    return False
+
+
+def _missing(driver):
+    raise NoSuchElementException('missing')
+
+
+def test_until(request):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    wait = AdaptiveWait(None, timeout=2, name='ready')
+    with MetricsRecorder() as recorder:
+        assert wait.until(_after(0.2)) == 'ok'
+
+    assert wait.last['name'] == 'ready'
+    assert wait.last['ok']
+    # backoff from 10 ms: 0, 10, 30, 70, 150, 310 ms
+    assert 3 <= wait.last['polls'] <= 8
+    assert recorder.snapshot()['counters']['adaptive_wait.polls'] == wait.last['polls']
+
+
+def test_until_timeout(request):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    wait = AdaptiveWait(None, timeout=0.3, max_interval=0.05)
+    with pytest.raises(TimeoutException):
+        wait.until(_missing)
+
+    assert not wait.last['ok']
+    assert wait.last['elapsed'] >= 0.3
+
+
+def test_until_not(request):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    wait = AdaptiveWait(None, timeout=1)
+    assert wait.until_not(_never) is False
+    assert wait.until_not(_missing) is True
+
+
+def test_max_load(request):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    def slow(driver):
+        time.sleep(0.05)
+        return False
+
+    wait = AdaptiveWait(None, timeout=0.6, max_load=0.25)
+    with pytest.raises(TimeoutException):
+        wait.until(slow)
+    # every poll of 50 ms is followed by at least 150 ms sleep
+    assert wait.last['polls'] <= 4
+
+
+def test_deadline(request):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    deadline = Deadline(0.3)
+    wait = deadline.wait(None)
+    with pytest.raises(TimeoutException):
+        wait.until(_never)
+    start = time.monotonic()
+    with pytest.raises(TimeoutException):
+        wait.until(_never)
+    # the deadline is shared, the second wait fails after one poll
+    assert time.monotonic() - start < 0.1
+    assert wait.last['polls'] == 1
+    assert deadline.expired()
+
+
+def test_all_of_any_of(request):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    assert all_of(lambda d: 1, lambda d: 2)(None) == [1, 2]
+    assert all_of(lambda d: 1, _never)(None) is False
+    assert any_of(_missing, _never, lambda d: 3)(None) == 3
+    assert any_of(_missing, _never)(None) is False
+    with pytest.raises(ValueError):
+        all_of()
+
+
+@pytest.mark.parametrize('kwargs', [
+    {},
+    {'timeout': 1, 'deadline': Deadline(1)},
+    {'timeout': 1, 'initial': 0},
+    {'timeout': 1, 'max_load': 0},
+])
+def test_invalid(request, kwargs):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    with pytest.raises(ValueError):
+        AdaptiveWait(None, **kwargs)
+
+
+def test_wait_page_loaded(request, dd):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    with SeleniumWebDriver(**dd) as web_driver:
+        wait = AdaptiveWait(web_driver, timeout=5)
+        wait_page_loaded(wait, title=FakeWebDriverServer.title)
+        assert len(wait.history) == 2
+
+
+def test_async_wait_until(request):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    async def run():
+        wait = AdaptiveWait(None, timeout=2)
+        assert await async_wait_until(wait, _after(0.1)) == 'ok'
+        assert wait.last['ok'] and wait.last['polls'] > 1
+
+        wait = Deadline(0.2).wait(None)
+        with pytest.raises(TimeoutException):
+            await async_wait_until(wait, _never)
+        assert not wait.last['ok']
+
+        with pytest.raises(ValueError):
+            await async_wait_until(object(), _never)
+
+    asyncio.run(run())
+
+
+def test_async_wait_page(request, dd):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    async def run(web_driver):
+        for wait in (AdaptiveWait(web_driver, timeout=5), Deadline(5).wait(web_driver),
+                     WebDriverWait(web_driver, timeout=5, poll_frequency=0.01)):
+            await async_wait_page_loaded(wait, title=FakeWebDriverServer.title)
+            metrics = await async_wait_page_ready(wait, title=FakeWebDriverServer.title)
+            assert metrics['title'] == FakeWebDriverServer.title
+
+    with SeleniumWebDriver(**dd) as web_driver:
+        asyncio.run(run(web_driver))
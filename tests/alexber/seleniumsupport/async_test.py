@@ -0,0 +1,59 @@
+import asyncio
+import logging
+
+import pytest
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.support.wait import WebDriverWait
+
+from alexber.seleniumsupport import AsyncSeleniumWebDriver, AsyncBMPProxy, async_run, async_set_new_har, \
+    async_wait_until, SeleniumWebDriver
+
+logger = logging.getLogger(__name__)
+
+
+def test_async_web_driver(request, stub_dd, stub_web_drivers):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    async def run():
+        async with AsyncSeleniumWebDriver(**stub_dd) as web_driver:
+            await async_run(web_driver.get, 'http://example.com/')
+            assert web_driver.current_url == 'http://example.com/'
+            assert not web_driver.quitted
+        assert web_driver.quitted
+
+    asyncio.run(run())
+    assert len(stub_web_drivers) == 1
+
+
+def test_async_set_new_har(request, stub_bmp):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    async def run():
+        async with AsyncBMPProxy(browsermob=stub_bmp.browsermob) as bmp_proxy:
+            await async_set_new_har(bmp_proxy, 'har_name')
+            assert stub_bmp.proxies[bmp_proxy.port]['log']['pages'][0]['id'] == 'har_name'
+        assert not stub_bmp.proxies
+
+    asyncio.run(run())
+
+
+def test_async_wait_until(request, stub_dd):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    polls = []
+
+    def condition(driver):
+        polls.append(driver)
+        return len(polls) >= 3 and 'ok'
+
+    async def run(web_driver):
+        wait = WebDriverWait(web_driver, timeout=5, poll_frequency=0.01)
+        assert await async_wait_until(wait, condition) == 'ok'
+        assert polls == [web_driver] * 3
+
+        wait = WebDriverWait(web_driver, timeout=0.05, poll_frequency=0.01)
+        with pytest.raises(TimeoutException):
+            await async_wait_until(wait, lambda driver: False, 'never')
+
+    with SeleniumWebDriver(**stub_dd) as web_driver:
+        asyncio.run(run(web_driver))
@@ -0,0 +1,175 @@
+import json
+import logging
+import shutil
+import subprocess
+
+import pytest
+from selenium.webdriver.common.by import By
+
+from alexber.seleniumsupport import execute_batch
+from alexber.seleniumsupport._batch import _BATCH_SCRIPT, _normalize_operation
+
+logger = logging.getLogger(__name__)
+
+node = pytest.mark.skipif(shutil.which('node') is None, reason="node is not installed")
+
+# minimal DOM that is enough for _BATCH_SCRIPT, elements are serialized as their id
+_DOM = """
+function Element(id, className, text, attributes, style, broken) {
+    this.id = id;
+    this.className = className;
+    this.innerText = text;
+    this.attributes = attributes;
+    this.style = style;
+    this.broken = broken;
+    this.clicks = 0;
+}
+Element.prototype.getAttribute = function (name) {
+    return name in this.attributes ? this.attributes[name] : null;
+};
+Element.prototype.click = function () {
+    this.clicks++;
+};
+Element.prototype.getBoundingClientRect = function () {
+    if (this.broken) {
+        throw new Error('detached');
+    }
+    return {left: 1, top: 2, width: 3, height: 4};
+};
+Element.prototype.toJSON = function () {
+    return 'element:' + this.id;
+};
+
+var elements = [
+    new Element('a', 'cell', 'A', {'data-x': '1'}, {display: 'block'}, false),
+    new Element('b', 'cell', 'B', {}, {display: 'none'}, true),
+];
+var CSS = {escape: function (value) { return value; }};
+var XPathResult = {ORDERED_NODE_SNAPSHOT_TYPE: 7};
+var window = {
+    pageXOffset: 10, pageYOffset: 20,
+    getComputedStyle: function (el) {
+        return {getPropertyValue: function (name) { return el.style[name]; }};
+    },
+};
+var document = {
+    querySelectorAll: function (selector) {
+        return elements.filter(function (el) {
+            return selector === '.' + el.className || selector === '#' + el.id;
+        });
+    },
+    getElementsByClassName: function (name) {
+        return elements.filter(function (el) { return el.className === name; });
+    },
+    evaluate: function (xpath) {
+        throw new Error('SyntaxError: invalid xpath ' + xpath);
+    },
+};
+"""
+
+
+def _run_batch(targets, operations):
+    """
+    Runs _BATCH_SCRIPT in node on the minimal DOM. Element target is passed as {'element': id}.
+    """
+    ops = [_normalize_operation(operation) for operation in operations]
+    code = _DOM + f"""
+var targets = {json.dumps(targets)}.map(function (target) {{
+    if (target.element === undefined) {{
+        return target;
+    }}
+    return {{element: elements.filter(function (el) {{ return el.id === target.element; }})[0]}};
+}});
+var script = new Function({json.dumps(_BATCH_SCRIPT)});
+console.log(JSON.stringify(script(targets, {json.dumps(ops)})));
+"""
+    out = subprocess.run(['node', '-e', code], check=True, capture_output=True, text=True).stdout
+    return json.loads(out)
+
+
+class _Driver(object):
+    def __init__(self, result):
+        self.result = result
+        self.calls = []
+
+    def execute_script(self, script, *args):
+        self.calls.append((script, args))
+        return self.result
+
+
+@pytest.mark.parametrize('operation, expected', [
+    ('text', ['text', None]),
+    ('click', ['click', None]),
+    (('attribute', 'href'), ['attribute', 'href']),
+    (['style', 'display'], ['style', 'display']),
+])
+def test_normalize_operation(request, operation, expected):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    assert _normalize_operation(operation) == expected
+
+
+@pytest.mark.parametrize('operation', ['hover', ('text', 'x', 'y'), 'attribute', ('property', None)])
+def test_normalize_operation_invalid(request, operation):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    with pytest.raises(ValueError):
+        _normalize_operation(operation)
+
+
+def test_execute_batch(request):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    web_element = object()
+    driver = _Driver([{'text': 'A'}, [{'text': 'B'}]])
+
+    result = execute_batch(driver, [web_element, (By.CSS_SELECTOR, '.cell')], ['text', ('attribute', 'href')])
+
+    assert result == [{'text': 'A'}, [{'text': 'B'}]]
+    (script, args), = driver.calls
+    assert script == _BATCH_SCRIPT
+    assert args == ([{'element': web_element}, {'by': 'css selector', 'value': '.cell'}],
+                    [['text', None], ['attribute', 'href']])
+
+    # invalid operation is rejected before the round trip
+    with pytest.raises(ValueError):
+        execute_batch(driver, [web_element], ['hover'])
+    assert len(driver.calls) == 1
+
+
+@node
+def test_element_target(request):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    result = _run_batch([{'element': 'a'}], ['text', ('attribute', 'data-x'), ('style', 'display'), 'rect',
+                                            'element', 'click'])
+
+    assert result == [{'text': 'A', 'attributes': {'data-x': '1'}, 'styles': {'display': 'block'},
+                       'rect': {'x': 11, 'y': 22, 'width': 3, 'height': 4}, 'element': 'element:a',
+                       'clicked': True}]
+
+
+@node
+def test_locator_target(request):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    result = _run_batch([{'by': By.CLASS_NAME, 'value': 'cell'}, {'by': By.ID, 'value': 'missing'}],
+                        ['text', ('property', 'id')])
+
+    assert result == [[{'text': 'A', 'properties': {'id': 'a'}}, {'text': 'B', 'properties': {'id': 'b'}}], []]
+
+
+@node
+def test_errors(request):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    result = _run_batch([{'by': By.CSS_SELECTOR, 'value': '.cell'}, {'by': By.XPATH, 'value': '//td['},
+                         {'by': 'unknown', 'value': 'x'}], ['text', 'rect'])
+
+    cells, xpath, unknown = result
+    # the operations before the failed one are still reported
+    assert cells[0] == {'text': 'A', 'rect': {'x': 11, 'y': 22, 'width': 3, 'height': 4}}
+    assert cells[1] == {'text': 'B', 'error': 'Error: detached'}
+    # the result of locator is list also if the locator has failed
+    assert xpath == [{'error': 'Error: SyntaxError: invalid xpath //td['}]
+    assert unknown == [{'error': 'Error: Unsupported locator strategy unknown'}]
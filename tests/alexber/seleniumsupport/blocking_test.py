@@ -0,0 +1,91 @@
+import logging
+
+import pytest
+
+from alexber.seleniumsupport import BlockingProfile, BLOCKING_PROFILES, get_blocking_profile, \
+    apply_blocking_profile, exclude_blocked_entries, blocking_report, BMPProxy, DriverSpec
+
+logger = logging.getLogger(__name__)
+
+
+@pytest.mark.parametrize('profile, url, blocked', [
+    ('no-images', 'http://a.com/logo.PNG', True),
+    ('no-images', 'https://a.com/logo.jpg?v=1', True),
+    ('no-images', 'http://a.com/app.js', False),
+    ('no-media', 'http://a.com/font.woff2', True),
+    ('text-only', 'http://a.com/site.css', True),
+    ('text-only', 'https://www.google-analytics.com/collect', True),
+    ('no-trackers', 'https://stats.doubleclick.net:443/x', True),
+    ('no-trackers', 'https://notdoubleclick.net/x', False),
+    ('no-trackers', 'http://a.com/logo.png', False),
+])
+def test_is_blocked(request, profile, url, blocked):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    assert get_blocking_profile(profile).is_blocked(url) == blocked
+
+
+def test_first_party_only(request):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    profile = BLOCKING_PROFILES['first-party-only']
+    assert not profile.is_blocked('https://www.a.com/page', first_party='a.com')
+    assert profile.is_blocked('https://cdn.b.com/lib.js', first_party='a.com')
+    assert not profile.is_blocked('https://cdn.b.com/lib.js', first_party=['a.com', 'b.com'])
+    with pytest.raises(ValueError):
+        profile.is_blocked('https://a.com/')
+
+
+def test_get_blocking_profile(request):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    profile = BlockingProfile('custom', patterns=(r'.*/ads/.*',), status_code=404)
+    assert get_blocking_profile(profile) is profile
+    assert profile.is_blocked('http://a.com/ads/1')
+    with pytest.raises(ValueError):
+        get_blocking_profile('unknown')
+
+
+def test_chrome_arguments(request):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    profile = BlockingProfile('custom', domains=('ads.com',), block_images=True)
+    assert profile.chrome_arguments() == ['--blink-settings=imagesEnabled=false',
+                                          '--host-resolver-rules=MAP ads.com ~NOTFOUND, MAP *.ads.com ~NOTFOUND']
+    assert profile.chrome_prefs() == {'profile.managed_default_content_settings.images': 2}
+
+
+def test_har(request):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    har = {'log': {'entries': [
+        {'pageref': 'p', 'request': {'url': 'http://a.com/'}, 'response': {'headersSize': 10, 'bodySize': 90}},
+        {'pageref': 'p', 'request': {'url': 'http://a.com/logo.png'}, 'response': {'headersSize': 10, 'bodySize': 990}},
+    ]}}
+
+    filtered = exclude_blocked_entries(har, 'no-images')
+    assert [entry['request']['url'] for entry in filtered['log']['entries']] == ['http://a.com/']
+    assert len(har['log']['entries']) == 2
+
+    assert blocking_report(har, 'no-images') == {'p': {'requests': 2, 'bytes': 1100, 'blocked_requests': 1,
+                                                       'blocked_bytes': 1000}}
+
+
+def test_apply_blocking_profile(request, bmp_server):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    with BMPProxy(browsermob=bmp_server.browsermob, blocking_profile='no-images') as bmp_proxy:
+        assert apply_blocking_profile(bmp_proxy, 'first-party-only', first_party='a.com').name == 'first-party-only'
+        with pytest.raises(ValueError):
+            apply_blocking_profile(bmp_proxy, 'first-party-only')
+
+
+def test_driver_spec(request):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    with pytest.raises(ValueError):
+        DriverSpec(web_driver={'name': 'firefox', 'path': None, 'command_executor': 'http://127.0.0.1:1'},
+                   blocking_profile='no-images')
+    spec = DriverSpec(web_driver={'name': 'chrome', 'path': None, 'command_executor': 'http://127.0.0.1:1'},
+                      blocking_profile='no-images')
+    assert '--blink-settings=imagesEnabled=false' in spec.options().arguments
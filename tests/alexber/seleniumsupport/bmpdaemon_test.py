@@ -0,0 +1,112 @@
+import json
+import logging
+import socket
+
+import psutil
+import pytest
+from browsermobproxy import Server
+
+from alexber.seleniumsupport import BMPDaemon
+from alexber.seleniumsupport import _bmpdaemon
+from alexber.seleniumsupport._bmpdaemon import _free_port, _is_port_free, _probe, _start
+
+logger = logging.getLogger(__name__)
+
+
+def _daemon_d(path, tmp_path, timeout=10, **options):
+    return {'init': {'path': path, 'options': options},
+            'start': {'options': {'log_path': str(tmp_path), 'timeout': timeout}}}
+
+
+def _logged_options(tmp_path):
+    with open(tmp_path / 'server.log') as f:
+        return json.loads(f.readline())
+
+
+def test_free_port(request, monkeypatch):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    port = _free_port('localhost', 10)
+    assert all(_is_port_free('localhost', p) for p in range(port, port + 11))
+
+    with socket.socket() as busy:
+        busy.bind(('localhost', 0))
+        busy.listen()
+        busy_port = busy.getsockname()[1]
+        assert not _is_port_free('localhost', busy_port)
+
+        # the first candidate's range contains busy port
+        candidates = iter([busy_port - 5, port])
+        monkeypatch.setattr(_bmpdaemon.random, 'randint', lambda low, high: next(candidates))
+        assert _free_port('localhost', 10) == port
+
+        monkeypatch.setattr(_bmpdaemon.random, 'randint', lambda low, high: busy_port - 5)
+        with pytest.raises(ValueError):
+            _free_port('localhost', 10, attempts=3)
+
+
+def test_probe(request, bmp_server, web_driver_server):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    assert _probe('127.0.0.1', bmp_server.port, 1)
+    # answers, but it is not BMP Daemon
+    assert not _probe('127.0.0.1', web_driver_server.port, 1)
+    assert not _probe('127.0.0.1', _free_port('127.0.0.1', 0), 1)
+
+
+def test_auto_port(request, tmp_path, bmp_executable):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    with BMPDaemon(daemon=_daemon_d(bmp_executable(), tmp_path, port='auto', proxy_ports=5)) as bmp_daemon:
+        port = bmp_daemon.port
+        assert _probe('localhost', port, 1)
+        process = psutil.Process(bmp_daemon.process.pid)
+
+    assert _logged_options(tmp_path) == {'port': str(port), 'proxyPortRange': f'{port + 1}-{port + 5}'}
+    assert not process.is_running()
+    assert bmp_daemon.log_file.closed
+
+
+def test_readiness_timeout(request, tmp_path, bmp_executable):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    bmp_daemon = Server(bmp_executable('hang'), {'port': _free_port('localhost', 0)})
+    with pytest.raises(ValueError, match='too much time'):
+        _start(bmp_daemon, {'log_path': str(tmp_path), 'timeout': 0.3})
+
+    assert bmp_daemon.process.poll() is not None
+    assert bmp_daemon.log_file.closed
+
+
+def test_exited(request, tmp_path, bmp_executable):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    bmp_daemon = Server(bmp_executable('exit'), {'port': _free_port('localhost', 0)})
+    with pytest.raises(ValueError, match='exited with code 3'):
+        _start(bmp_daemon, {'log_path': str(tmp_path), 'timeout': 10})
+
+    assert bmp_daemon.log_file.closed
+
+
+def test_adopt(request, tmp_path, bmp_server, bmp_executable):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    # the executable is not started, BMP Daemon already runs on the port
+    daemon_d = _daemon_d(bmp_executable('exit'), tmp_path, port=bmp_server.port, host='127.0.0.1', adopt=True)
+    with BMPDaemon(daemon=daemon_d) as bmp_daemon:
+        assert bmp_daemon.process is None
+        assert bmp_daemon.url == f'http://127.0.0.1:{bmp_server.port}'
+    # it is not stopped on exit
+    assert _probe('127.0.0.1', bmp_server.port, 1)
+    assert not (tmp_path / 'server.log').exists()
+
+
+def test_adopt_nothing_runs(request, tmp_path, bmp_executable):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    port = _free_port('localhost', 0)
+    with BMPDaemon(daemon=_daemon_d(bmp_executable(), tmp_path, port=port, adopt=True)) as bmp_daemon:
+        assert bmp_daemon.process is not None
+        assert _probe('localhost', port, 1)
+    # BMP's default range of BMP Proxies' ports is used
+    assert _logged_options(tmp_path) == {'port': str(port)}
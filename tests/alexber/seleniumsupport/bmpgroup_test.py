@@ -0,0 +1,157 @@
+import json
+import logging
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from alexber.seleniumsupport import BMPDaemonGroup, BMPDaemons
+from alexber.seleniumsupport import _bmpdaemon
+from alexber.seleniumsupport._bmpdaemon import _free_port, _probe
+from benchmarks._fakes import FakeBMPServer
+
+logger = logging.getLogger(__name__)
+
+
+def _closed_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _dead_browsermob():
+    return {'daemon': {'init': {'options': {'host': '127.0.0.1', 'port': _closed_port()}}}}
+
+
+class _SickHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        # neither JSON, nor UTF-8, parsing it raises ValueError
+        body = b'\xff\xfe Internal Server Error'
+        self.send_response(500)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def sick_browsermob():
+    """
+    BMP Daemon that answers on creating BMP Proxy with non-JSON 500 response.
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _SickHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield {'daemon': {'init': {'options': {'host': '127.0.0.1', 'port': server.server_address[1]}}}}
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_spread(request, bmp_server):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    with FakeBMPServer() as other:
+        group = BMPDaemonGroup([bmp_server.browsermob, other.browsermob])
+        with group.proxy(), group.proxy():
+            assert [stats['proxies'] for stats in group.stats()] == [1, 1]
+            assert len(bmp_server.proxies) == 1
+            assert len(other.proxies) == 1
+        assert [stats['proxies'] for stats in group.stats()] == [0, 0]
+        assert bmp_server.proxies == {}
+        assert other.proxies == {}
+
+
+def test_unhealthy(request, bmp_server):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    group = BMPDaemonGroup([_dead_browsermob(), bmp_server.browsermob], retry_after=60)
+    # the dead BMP Daemon is tried first, it is taken out of rotation
+    with group.proxy():
+        pass
+    assert [stats['healthy'] for stats in group.stats()] == [False, True]
+    with group.proxy():
+        assert len(bmp_server.proxies) == 1
+
+
+def test_sick(request, bmp_server, sick_browsermob):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    group = BMPDaemonGroup([sick_browsermob, bmp_server.browsermob], retry_after=60)
+    # the sick BMP Daemon is tried first, it's response is not JSON, it is taken out of rotation
+    with group.proxy():
+        assert len(bmp_server.proxies) == 1
+    assert [stats['healthy'] for stats in group.stats()] == [False, True]
+
+
+def test_invalid_blocking_profile(request, bmp_server):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    group = BMPDaemonGroup([bmp_server.browsermob])
+    with pytest.raises(ValueError):
+        with group.proxy(blocking_profile='unknown'):
+            pass
+    with pytest.raises(ValueError):
+        with group.proxy(blocking_profile='first-party-only'):
+            pass
+    assert bmp_server.proxies == {}
+    assert [stats['healthy'] for stats in group.stats()] == [True]
+
+
+def test_no_healthy(request):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    group = BMPDaemonGroup([_dead_browsermob()])
+    with pytest.raises(ValueError):
+        with group.proxy():
+            pass
+
+
+def test_check_health(request, bmp_server):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    group = BMPDaemonGroup([_dead_browsermob(), bmp_server.browsermob])
+    stats = group.check_health()
+    assert [s['healthy'] for s in stats] == [False, True]
+    assert stats[1]['latency'] is not None
+
+
+def test_invalid(request, bmp_server):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    with pytest.raises(ValueError):
+        BMPDaemonGroup([])
+    with pytest.raises(ValueError):
+        BMPDaemonGroup([bmp_server.browsermob], strategy='random')
+
+
+def test_bmp_daemons(request, monkeypatch, tmp_path, bmp_executable):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    count, proxy_ports = 4, 10
+    base = _free_port('localhost', count * (proxy_ports + 1))
+    # every candidate is offered twice, daemons would collide, if their ports were chosen independently
+    candidates = iter([base + (i // 2) * (proxy_ports + 1) for i in range(2 * count)])
+    monkeypatch.setattr(_bmpdaemon.random, 'randint', lambda low, high: next(candidates))
+
+    dd = {'init': {'path': bmp_executable(), 'options': {'port': 'auto', 'proxy_ports': proxy_ports}},
+          'start': {'options': {'log_path': str(tmp_path), 'timeout': 10}}}
+    with BMPDaemons(count=count, daemon=dd) as bmp_daemons:
+        ports = sorted(bmp_daemon.port for bmp_daemon in bmp_daemons)
+        assert ports == [base + i * (proxy_ports + 1) for i in range(count)]
+        assert all(_probe('localhost', port, 1) for port in ports)
+
+    ranges = []
+    for i in range(count):
+        with open(tmp_path / f'server-{i}.log') as f:
+            options = json.loads(f.readline())
+        first, last = map(int, options['proxyPortRange'].split('-'))
+        ranges.append((int(options['port']), last))
+        assert first == int(options['port']) + 1
+    ranges.sort()
+    assert all(last < first for (_, last), (first, _) in zip(ranges, ranges[1:]))
@@ -0,0 +1,230 @@
+import io
+import itertools
+import json
+import re
+import sys
+from urllib.parse import parse_qsl, urlsplit
+
+import pytest
+import requests
+from selenium.webdriver.remote.remote_connection import RemoteConnection
+
+from benchmarks._fakes import FakeWebDriverServer, FakeBMPServer
+
+
+class _SwitchTo(object):
+    def __init__(self, web_driver):
+        self._web_driver = web_driver
+
+    def window(self, handle):
+        if handle not in self._web_driver.window_handles:
+            raise ValueError(f"Unknown window {handle}")
+        self._web_driver.current_window_handle = handle
+
+
+class StubWebDriver(object):
+    """
+    Stands in for webdriver.Remote, so helpers can be tested without WebDriver server and browser.
+    """
+    def __init__(self, command_executor=None, **kwargs):
+        self.command_executor = command_executor
+        self.kwargs = kwargs
+        self.window_handles = ['window-0']
+        self.current_window_handle = 'window-0'
+        self.current_url = 'about:blank'
+        self.title = 'Stub page'
+        self.scripts = []
+        self.quitted = False
+        self.switch_to = _SwitchTo(self)
+
+    def get(self, url):
+        self.current_url = url
+
+    def close(self):
+        self.window_handles.remove(self.current_window_handle)
+
+    def execute_script(self, script, *args):
+        self.scripts.append(script)
+
+    def delete_all_cookies(self):
+        pass
+
+    def quit(self):
+        self.quitted = True
+
+
+@pytest.fixture
+def stub_web_drivers(monkeypatch):
+    """
+    webdriver.Remote is replaced by StubWebDriver.
+
+    :return: list of created StubWebDrivers.
+    """
+    from selenium import webdriver
+    web_drivers = []
+
+    def create(**kwargs):
+        web_driver = StubWebDriver(**kwargs)
+        web_drivers.append(web_driver)
+        return web_driver
+
+    monkeypatch.setattr(webdriver, 'Remote', create)
+    return web_drivers
+
+
+@pytest.fixture
+def stub_dd(stub_web_drivers):
+    return {'web_driver': {'name': 'chrome', 'path': None, 'command_executor': 'http://localhost:4444/wd/hub'}}
+
+
+class StubResponse(object):
+    def __init__(self, status_code, body=None):
+        self.status_code = status_code
+        self.content = b'' if body is None else json.dumps(body).encode('utf-8')
+        self.raw = io.BytesIO(self.content)
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} Error", response=self)
+
+    def iter_content(self, chunk_size=1, decode_unicode=False):
+        for i in range(0, len(self.content), chunk_size):
+            yield self.content[i:i + chunk_size]
+
+    def close(self):
+        pass
+
+
+class StubBMP(object):
+    """
+    Stands in for BMP Daemon's REST API, requests.get(), put(), post() and delete() are routed to it.
+    """
+    def __init__(self):
+        self.proxies = {}
+        self.requests = []
+        self._ports = itertools.count(9000)
+
+    @property
+    def browsermob(self):
+        """
+        browsermob dict for BMPProxy() and BMPProxyPool().
+        """
+        return {'daemon': {'init': {'options': {'port': 8080}}}}
+
+    def har(self, ref=None, entries=()):
+        return {'log': {'version': '1.2', 'pages': [] if ref is None else [{'id': ref, 'title': ref}],
+                        'entries': list(entries)}}
+
+    def _new_proxy(self, query):
+        port = int(query['port']) if 'port' in query else next(self._ports)
+        if port in self.proxies:
+            return StubResponse(500)
+        self.proxies[port] = self.har()
+        return StubResponse(200, {'port': port})
+
+    def _new_har(self, port, data):
+        previous = self.proxies[port]
+        self.proxies[port] = self.har((data or {}).get('initialPageRef', 'Page 1'))
+        if not previous['log']['pages'] and not previous['log']['entries']:
+            return StubResponse(204)
+        return StubResponse(200, previous)
+
+    def handle(self, method, url, data=None, **kwargs):
+        parts = urlsplit(url)
+        self.requests.append((method, parts.path))
+        if parts.path == '/proxy' and method == 'POST':
+            return self._new_proxy(dict(parse_qsl(parts.query)))
+        m = re.fullmatch(r'/proxy/([0-9]+)(/.*)?', parts.path)
+        if m is None or int(m.group(1)) not in self.proxies:
+            return StubResponse(404)
+        port, path = int(m.group(1)), m.group(2)
+        if path is None and method == 'DELETE':
+            del self.proxies[port]
+            return StubResponse(200)
+        if path == '/har' and method == 'PUT':
+            return self._new_har(port, data)
+        if path == '/har' and method == 'GET':
+            return StubResponse(200, self.proxies[port])
+        return StubResponse(200)
+
+
+@pytest.fixture
+def stub_bmp(monkeypatch):
+    """
+    requests.get(), put(), post() and delete() are routed to StubBMP.
+    """
+    bmp = StubBMP()
+    for method in ('GET', 'PUT', 'POST', 'DELETE'):
+        monkeypatch.setattr(requests, method.lower(),
+                            lambda url, data=None, _method=method, **kwargs: bmp.handle(_method, url, data, **kwargs))
+    return bmp
+
+
+@pytest.fixture
+def web_driver_server():
+    # explicit timeout, newer urllib3 rejects selenium's default
+    RemoteConnection.set_timeout(30)
+    try:
+        with FakeWebDriverServer() as server:
+            yield server
+    finally:
+        RemoteConnection.reset_timeout()
+
+
+@pytest.fixture
+def bmp_server():
+    with FakeBMPServer() as server:
+        yield server
+
+
+@pytest.fixture
+def dd(web_driver_server):
+    return {'web_driver': {'name': 'chrome', 'path': None, 'command_executor': web_driver_server.url}}
+
+
+_BMP_EXECUTABLE = """
+import json
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+options = dict(arg[2:].split('=', 1) for arg in sys.argv[1:])
+print(json.dumps(options), flush=True)
+if MODE == 'exit':
+    sys.exit(3)
+if MODE == 'hang':
+    time.sleep(60)
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = json.dumps({'proxyList': []}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+HTTPServer(('localhost', int(options['port'])), Handler).serve_forever()
+"""
+
+
+@pytest.fixture
+def bmp_executable(tmp_path):
+    """
+    Factory of executables that stand in for browsermob-proxy, they print their options into the log.
+    mode 'serve' answers on REST API on --port, 'exit' exits with code 3, 'hang' never answers.
+    """
+    def create(mode='serve'):
+        path = tmp_path / f'browsermob-proxy-{mode}'
+        path.write_text(f'#!{sys.executable}\nMODE = {mode!r}\n{_BMP_EXECUTABLE}')
+        path.chmod(0o755)
+        return str(path)
+    return create
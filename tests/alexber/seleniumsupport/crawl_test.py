@@ -0,0 +1,136 @@
+import logging
+import threading
+import time
+
+import pytest
+
+from alexber.seleniumsupport import CrawlScheduler, crawl
+from alexber.seleniumsupport._crawl import _STOP
+
+logger = logging.getLogger(__name__)
+
+
+def _job(session, task):
+    if task == 'fail':
+        raise ValueError('fail')
+    return task * 2
+
+
+def test_crawl(request, dd, web_driver_server):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    results = list(crawl(range(10), _job, workers=3, **dd))
+
+    assert sorted(result.value for result in results) == [i * 2 for i in range(10)]
+    assert all(result.ok and result.attempts == 1 for result in results)
+    # all sessions are closed
+    assert not web_driver_server.sessions
+
+
+def test_crawl_retries(request, dd):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    results = list(crawl(['fail', 1], _job, workers=1, retries=2, **dd))
+    results = {result.task: result for result in results}
+
+    assert not results['fail'].ok
+    assert isinstance(results['fail'].error, ValueError)
+    assert results['fail'].attempts == 3
+    assert results[1].value == 2
+
+
+def test_crawl_max_uses(request, dd):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    web_drivers = []
+
+    def job(session, task):
+        web_drivers.append(session.web_driver)
+        return task
+
+    list(crawl(range(6), job, workers=1, max_uses=2, **dd))
+
+    assert len({id(web_driver) for web_driver in web_drivers}) == 3
+
+
+def test_map_abandoned(request, dd):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    release = threading.Event()
+
+    def job(session, task):
+        if task != 0:
+            release.wait(5)
+        return task
+
+    with CrawlScheduler(job, workers=2, **dd) as scheduler:
+        results = scheduler.map(range(4))
+        assert next(results).task == 0
+        results.close()
+        release.set()
+
+        # results of the abandoned map() don't leak into the next one
+        assert [result.task for result in scheduler.map([10])] == [10]
+
+
+# the worker dies with SystemExit
+@pytest.mark.filterwarnings('ignore::pytest.PytestUnhandledThreadExceptionWarning')
+def test_worker_dies(request, dd, web_driver_server):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    def job(session, task):
+        if task == 'exit':
+            raise SystemExit(3)
+        return task
+
+    with CrawlScheduler(job, workers=1, max_pending=1, **dd) as scheduler:
+        results = scheduler.map(['a', 'exit', 'c'])
+        assert next(results).task == 'a'
+        with pytest.raises(ValueError) as exc_info:
+            next(results)
+        assert isinstance(exc_info.value.__cause__, SystemExit)
+        # the session of the dead worker is closed
+        assert not web_driver_server.sessions
+
+        # the worker is replaced
+        assert [result.task for result in scheduler.map(['d'])] == ['d']
+
+
+def test_close_during_map(request, dd):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    started = threading.Event()
+    release = threading.Event()
+    tasks = []
+    errors = []
+
+    def job(session, task):
+        started.set()
+        release.wait(5)
+        return task
+
+    def consume():
+        try:
+            for result in scheduler.map(['a', 'b', 'c']):
+                tasks.append(result.task)
+        except ValueError as e:
+            errors.append(e)
+
+    scheduler = CrawlScheduler(job, workers=1, **dd)
+    consumer = threading.Thread(target=consume)
+    consumer.start()
+    assert started.wait(5)
+    closer = threading.Thread(target=scheduler.close)
+    closer.start()
+    # close() has dropped the tasks that were not started yet
+    deadline = time.monotonic() + 5
+    while list(scheduler._tasks.queue) != [_STOP] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    release.set()
+    closer.join(5)
+    consumer.join(5)
+
+    assert not consumer.is_alive()
+    # the result of the running task is reported before the error
+    assert tasks == ['a']
+    assert len(errors) == 1
@@ -0,0 +1,67 @@
+import logging
+import os
+from zipfile import ZipFile
+
+import pytest
+
+from alexber.seleniumsupport import BrowserDataDir
+
+logger = logging.getLogger(__name__)
+
+
+def _template(path, content='state'):
+    with ZipFile(path, 'w') as zipObj:
+        zipObj.writestr('Default/Preferences', content)
+    return str(path)
+
+
+def test_template(request, tmp_path):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    template = _template(tmp_path / 'template.zip')
+    with BrowserDataDir(work_dir=str(tmp_path), template=template) as root:
+        with open(os.path.join(root, 'Default', 'Preferences')) as f:
+            assert f.read() == 'state'
+    assert not os.path.exists(root)
+
+
+@pytest.mark.parametrize('copy_mode', ['auto', 'hardlink', 'copy'])
+def test_cache_dir(request, tmp_path, copy_mode):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    template = _template(tmp_path / 'template.zip')
+    cache_dir = tmp_path / 'cache'
+    for _ in range(2):
+        with BrowserDataDir(work_dir=str(tmp_path), template=template, cache_dir=str(cache_dir),
+                            copy_mode=copy_mode) as root:
+            with open(os.path.join(root, 'Default', 'Preferences')) as f:
+                assert f.read() == 'state'
+    # the template was extracted only once
+    assert len(os.listdir(cache_dir)) == 1
+
+
+def test_cache_max_size(request, tmp_path):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    cache_dir = tmp_path / 'cache'
+    for i in range(3):
+        template = _template(tmp_path / f'template{i}.zip', content='x' * 1000)
+        with BrowserDataDir(work_dir=str(tmp_path), template=template, cache_dir=str(cache_dir),
+                            cache_max_size=1500):
+            pass
+    # only the last template is kept
+    assert len(os.listdir(cache_dir)) == 1
+
+
+def test_invalid(request, tmp_path):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    with pytest.raises(ValueError):
+        with BrowserDataDir(work_dir=str(tmp_path)):
+            pass
+
+    template = _template(tmp_path / 'template.zip')
+    with pytest.raises(ValueError):
+        with BrowserDataDir(work_dir=str(tmp_path), template=template, cache_dir=str(tmp_path / 'cache'),
+                            copy_mode='move'):
+            pass
@@ -0,0 +1,250 @@
+import json
+import logging
+import socket
+import struct
+import threading
+
+import pytest
+
+from alexber.seleniumsupport import DevToolsConnection
+from alexber.seleniumsupport._devtools import _WebSocket, _OP_CLOSE, _OP_CONTINUATION, _OP_PING, _OP_PONG, _OP_TEXT
+
+logger = logging.getLogger(__name__)
+
+
+def _recv_exactly(sock, n):
+    buf = b''
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            raise ConnectionError("connection was closed")
+        buf += chunk
+    return buf
+
+
+def _read_frame(sock):
+    """
+    Reads frame as server does.
+
+    :return: fin, opcode, unmasked payload
+    """
+    first, second = _recv_exactly(sock, 2)
+    assert second & 0x80, "client frames are masked"
+    length = second & 0x7F
+    if length == 126:
+        length = struct.unpack('>H', _recv_exactly(sock, 2))[0]
+    elif length == 127:
+        length = struct.unpack('>Q', _recv_exactly(sock, 8))[0]
+    mask = _recv_exactly(sock, 4)
+    payload = bytes(b ^ mask[i % 4] for i, b in enumerate(_recv_exactly(sock, length)))
+    return bool(first & 0x80), first & 0x0F, payload
+
+
+def _frame(opcode, payload, fin=True):
+    """
+    Frame as server sends it, not masked.
+    """
+    header = bytearray([(0x80 if fin else 0) | opcode])
+    length = len(payload)
+    if length < 126:
+        header.append(length)
+    elif length < 1 << 16:
+        header.append(126)
+        header += struct.pack('>H', length)
+    else:
+        header.append(127)
+        header += struct.pack('>Q', length)
+    return bytes(header) + payload
+
+
+def _connected_websocket():
+    client, server = socket.socketpair()
+    ws = _WebSocket.__new__(_WebSocket)
+    ws.sock = client
+    ws._send_lock = threading.Lock()
+    return ws, server
+
+
+class _FakeDevTools(object):
+    """
+    WebSocket server that answers on one connection as DevTools does.
+    Command 'Fail' returns error, before the result of any other command event 'Test.event' is sent.
+
+    :param status: status of the handshake response.
+    """
+    def __init__(self, status=101):
+        self.status = status
+        self.calls = []
+        self._listener = socket.socket()
+        self._listener.bind(('127.0.0.1', 0))
+        self._listener.listen()
+        self.url = f'ws://127.0.0.1:{self._listener.getsockname()[1]}/devtools/browser/id'
+        self.conn = None
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def _serve(self):
+        self.conn, _ = self._listener.accept()
+        request = b''
+        while b'\r\n\r\n' not in request:
+            request += self.conn.recv(4096)
+        self.request = request.decode('ascii')
+        reason = 'Switching Protocols' if self.status == 101 else 'Not Found'
+        self.conn.sendall(f'HTTP/1.1 {self.status} {reason}\r\nUpgrade: websocket\r\n'
+                          f'Connection: Upgrade\r\n\r\n'.encode('ascii'))
+        if self.status != 101:
+            return
+        try:
+            while True:
+                fin, opcode, payload = _read_frame(self.conn)
+                if opcode == _OP_CLOSE:
+                    return
+                message = json.loads(payload)
+                self.calls.append(message)
+                if message['method'] == 'Hang':
+                    continue
+                if message['method'] == 'Fail':
+                    answer = {'id': message['id'], 'error': {'code': -32601, 'message': 'not found'}}
+                else:
+                    event = {'method': 'Test.event', 'params': {'id': message['id']}}
+                    self.conn.sendall(_frame(_OP_TEXT, json.dumps(event).encode('utf-8')))
+                    answer = {'id': message['id'], 'result': {'echo': message['params']}}
+                self.conn.sendall(_frame(_OP_TEXT, json.dumps(answer).encode('utf-8')))
+        except OSError:
+            # including ConnectionError, client has gone
+            pass
+
+    def disconnect(self):
+        self.conn.shutdown(socket.SHUT_RDWR)
+
+    def close(self):
+        self._listener.close()
+        self._thread.join(5)
+        if self.conn is not None:
+            self.conn.close()
+
+
+@pytest.fixture
+def fake_devtools():
+    servers = []
+
+    def create(status=101):
+        server = _FakeDevTools(status)
+        servers.append(server)
+        return server
+
+    yield create
+    for server in servers:
+        server.close()
+
+
+def test_send_frame(request):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    ws, server = _connected_websocket()
+    try:
+        # 7-bit, 16-bit and 64-bit lengths
+        for text in ('hello', 'x' * 200, 'y' * 70000, 'привет'):
+            ws.send(text)
+            assert _read_frame(server) == (True, _OP_TEXT, text.encode('utf-8'))
+    finally:
+        ws.sock.close()
+        server.close()
+
+
+def test_recv(request):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    ws, server = _connected_websocket()
+    try:
+        for text in ('hello', 'x' * 200, 'y' * 70000):
+            server.sendall(_frame(_OP_TEXT, text.encode('utf-8')))
+            assert ws.recv() == text
+
+        # fragmented message with ping in the middle
+        server.sendall(_frame(_OP_TEXT, 'при'.encode('utf-8'), fin=False))
+        server.sendall(_frame(_OP_PING, b'ping'))
+        server.sendall(_frame(_OP_CONTINUATION, 'вет'.encode('utf-8')))
+        assert ws.recv() == 'привет'
+        assert _read_frame(server) == (True, _OP_PONG, b'ping')
+
+        server.sendall(_frame(_OP_CLOSE, b''))
+        with pytest.raises(ConnectionError):
+            ws.recv()
+
+        server.close()
+        with pytest.raises(ConnectionError):
+            ws.recv()
+    finally:
+        ws.sock.close()
+        server.close()
+
+
+def test_handshake(request, fake_devtools):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    server = fake_devtools()
+    ws = _WebSocket(server.url, timeout=5)
+    ws.close()
+    assert server.request.startswith('GET /devtools/browser/id HTTP/1.1\r\n')
+    assert 'Sec-WebSocket-Version: 13\r\n' in server.request
+
+    server = fake_devtools(status=404)
+    with pytest.raises(ConnectionError, match='404'):
+        _WebSocket(server.url, timeout=5)
+
+
+def test_call(request, fake_devtools):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    server = fake_devtools()
+    events = []
+    with DevToolsConnection(server.url, on_event=lambda method, params: events.append((method, params)),
+                            timeout=5) as devtools:
+        assert devtools.call('Browser.getVersion') == {'echo': {}}
+        assert devtools.call('Browser.setDownloadBehavior', {'behavior': 'deny'}) == \
+            {'echo': {'behavior': 'deny'}}
+        with pytest.raises(ValueError, match='not found'):
+            devtools.call('Fail')
+    assert [call['method'] for call in server.calls] == ['Browser.getVersion', 'Browser.setDownloadBehavior', 'Fail']
+    assert [call['id'] for call in server.calls] == [1, 2, 3]
+    # event is delivered before the result of the command
+    assert events == [('Test.event', {'id': 1}), ('Test.event', {'id': 2})]
+
+    with pytest.raises(ValueError, match='closed'):
+        devtools.call('Browser.getVersion')
+
+
+def test_disconnect(request, fake_devtools):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    server = fake_devtools()
+    errors = []
+
+    def call():
+        try:
+            devtools.call('Hang')
+        except ConnectionError as e:
+            errors.append(e)
+
+    with DevToolsConnection(server.url, timeout=5) as devtools:
+        thread = threading.Thread(target=call)
+        thread.start()
+        while not server.calls:
+            thread.join(0.01)
+        server.disconnect()
+        thread.join(5)
+        # pending call fails, it doesn't wait for the timeout
+        assert len(errors) == 1
+        with pytest.raises(ValueError, match='closed'):
+            devtools.call('Browser.getVersion')
+
+
+def test_for_web_driver(request):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    class _Driver(object):
+        capabilities = {'browserName': 'firefox'}
+
+    with pytest.raises(ValueError):
+        DevToolsConnection.for_web_driver(_Driver())
@@ -0,0 +1,116 @@
+import contextlib
+import hashlib
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+from alexber.seleniumsupport import DownloadManager, Download
+
+logger = logging.getLogger(__name__)
+
+
+def _slow(f):
+    def wrapper(*args, **kwargs):
+        # widens the window between choosing the name and moving the file
+        time.sleep(0.05)
+        return f(*args, **kwargs)
+    return wrapper
+
+
+def test_finish_same_name(request, tmp_path, monkeypatch):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    monkeypatch.setattr(os, 'rename', _slow(os.rename))
+    monkeypatch.setattr(os, 'replace', _slow(os.replace))
+
+    manager = DownloadManager(None, downloads_dir=tmp_path, checksum='sha256')
+    count = 8
+    downloads = []
+    threads = []
+    barrier = threading.Barrier(count)
+
+    def finish(download, path):
+        barrier.wait()
+        manager._finish(download, path, 'report.pdf')
+
+    for i in range(count):
+        # as browser does with allowAndName, the file is named by guid
+        path = Path(tmp_path, f'guid-{i}')
+        path.write_bytes(f'content {i}'.encode('utf-8'))
+        download = Download()
+        downloads.append(download)
+        threads.append(threading.Thread(target=finish, args=(download, path)))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    paths = [download.result(timeout=5) for download in downloads]
+    # parallel downloads of the files with the same name don't clash
+    assert len(set(paths)) == count
+    assert {path.name for path in paths} == {'report.pdf', *(f'report ({i}).pdf' for i in range(1, count))}
+    assert sorted(path.read_bytes() for path in paths) == sorted(f'content {i}'.encode('utf-8') for i in range(count))
+    for download in downloads:
+        assert download.checksum == hashlib.sha256(download.path.read_bytes()).hexdigest()
+    assert sorted(p.name for p in tmp_path.iterdir()) == sorted(path.name for path in paths)
+
+
+class _Executor(object):
+    def __init__(self):
+        self._commands = {}
+
+
+class _Driver(object):
+    """
+    Web Driver without DevTools, as Remote Web Driver.
+    """
+    def __init__(self):
+        self.command_executor = _Executor()
+        self.capabilities = {}
+        self.executed = []
+
+    def execute(self, command, params=None):
+        self.executed.append((command, params))
+
+
+def test_watch(request, tmp_path):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    Path(tmp_path, 'old.txt').write_text('old')
+    web_driver = _Driver()
+    with DownloadManager(web_driver, downloads_dir=tmp_path, poll_interval=0.05) as manager:
+        assert not manager.events
+        assert web_driver.executed[0][1]['params']['downloadPath'] == str(tmp_path)
+        download = manager.expect()
+        # download in progress is not reported
+        Path(tmp_path, 'report.pdf.crdownload').write_bytes(b'con')
+        time.sleep(0.2)
+        assert not download.done()
+        Path(tmp_path, 'report.pdf').write_bytes(b'content')
+        assert download.result(timeout=5) == Path(tmp_path, 'report.pdf')
+        assert download.size == len(b'content')
+        assert manager.downloads == [download]
+
+
+def test_watch_vanished(request, tmp_path, monkeypatch):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    scandir = os.scandir
+
+    @contextlib.contextmanager
+    def scandir_with_ghost(path):
+        # the file is moved away between listing the directory and stat()
+        with scandir(path) as it:
+            yield [*it, SimpleNamespace(name='ghost.pdf')]
+
+    with DownloadManager(_Driver(), downloads_dir=tmp_path, poll_interval=0.05) as manager:
+        monkeypatch.setattr(os, 'scandir', scandir_with_ghost)
+        download = manager.expect()
+        time.sleep(0.2)
+        assert not download.done()
+        Path(tmp_path, 'report.pdf').write_bytes(b'content')
+        assert download.result(timeout=5) == Path(tmp_path, 'report.pdf')
+        assert manager.downloads == [download]
@@ -0,0 +1,73 @@
+import logging
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from alexber.seleniumsupport import wait_chrome_files_finished_downloads
+
+logger = logging.getLogger(__name__)
+
+
+def test_already_downloaded(request, tmp_path):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    (tmp_path / 'a.txt').write_text('a')
+
+    assert wait_chrome_files_finished_downloads('a.txt', tmp_path, timeout=1) == [Path(tmp_path, 'a.txt')]
+
+
+def test_wait(request, tmp_path):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    (tmp_path / 'a.txt').write_text('a')
+    (tmp_path / 'b.txt.crdownload').write_text('b')
+
+    def finish():
+        time.sleep(0.1)
+        (tmp_path / 'b.txt.crdownload').rename(tmp_path / 'b.txt')
+
+    thread = threading.Thread(target=finish)
+    thread.start()
+    try:
+        start = time.monotonic()
+        paths = wait_chrome_files_finished_downloads(['a.txt', 'b.txt'], tmp_path, timeout=10)
+        assert time.monotonic() - start < 5
+    finally:
+        thread.join()
+
+    assert paths == [Path(tmp_path, 'a.txt'), Path(tmp_path, 'b.txt')]
+
+
+def test_timeout(request, tmp_path):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    (tmp_path / 'a.txt.crdownload').write_text('a')
+
+    with pytest.raises(ValueError):
+        wait_chrome_files_finished_downloads('a.txt', tmp_path, timeout=0.2)
+
+
+def test_missing_dir(request, tmp_path):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    downloads_path = tmp_path / 'downloads'
+
+    with pytest.raises(ValueError):
+        wait_chrome_files_finished_downloads('a.txt', downloads_path, timeout=0.2)
+
+    def finish():
+        time.sleep(0.1)
+        # browser creates the download's folder on the first download
+        downloads_path.mkdir()
+        (downloads_path / 'a.txt').write_text('a')
+
+    thread = threading.Thread(target=finish)
+    thread.start()
+    try:
+        paths = wait_chrome_files_finished_downloads('a.txt', downloads_path, timeout=10, max_poll_interval=0.1)
+    finally:
+        thread.join()
+
+    assert paths == [Path(downloads_path, 'a.txt')]
@@ -0,0 +1,116 @@
+import logging
+from types import SimpleNamespace
+
+import pytest
+
+from alexber.seleniumsupport import DriverSpec
+
+logger = logging.getLogger(__name__)
+
+
+def _web_driver_d(**kwargs):
+    return {'name': 'chrome', 'command_executor': 'http://localhost:4444/wd/hub', **kwargs}
+
+
+class _LocalWebDriver(object):
+    """
+    Stands in for locally installed Web Driver.
+    """
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+
+
+def test_compile(request):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+    from selenium.webdriver.chrome.webdriver import WebDriver
+
+    web_driver_d = _web_driver_d(arguments=['--headless'], experimental_options={'prefs': {'a': 1}})
+    driver_spec = DriverSpec(web_driver=web_driver_d, browser={'path': '/opt/chrome/chrome'}, other='ignored')
+    assert driver_spec.name == 'chrome'
+    assert driver_spec.executable_path is None
+    assert driver_spec.command_executor == 'http://localhost:4444/wd/hub'
+    assert driver_spec.arguments == ('--headless',)
+    assert driver_spec._web_driver_klass is webdriver.Remote
+
+    options = driver_spec.options()
+    assert isinstance(options, Options)
+    assert options.binary_location == '/opt/chrome/chrome'
+    assert options.arguments == ['--headless']
+    assert options.experimental_options == {'prefs': {'a': 1}}
+    # new Options object every time, proxy of one Web Driver doesn't leak into another
+    options = driver_spec.options(SimpleNamespace(proxy='localhost:9100'))
+    assert options.arguments == ['--headless', '--proxy-server=localhost:9100']
+    assert driver_spec.options().arguments == ['--headless']
+
+    # changes of the dicts after compilation don't affect DriverSpec
+    web_driver_d['arguments'].append('--incognito')
+    web_driver_d['experimental_options']['detach'] = True
+    assert driver_spec.options().arguments == ['--headless']
+    assert driver_spec.options().experimental_options == {'prefs': {'a': 1}}
+
+    driver_spec = DriverSpec(web_driver={'name': 'chrome', 'path': '/opt/chromedriver'})
+    assert driver_spec._web_driver_klass is WebDriver
+    assert driver_spec.options().binary_location == ''
+
+
+def test_blocking_profile(request):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    driver_spec = DriverSpec(web_driver=_web_driver_d(experimental_options={'prefs': {'a': 1}}),
+                             blocking_profile='no-images')
+    assert '--blink-settings=imagesEnabled=false' in driver_spec.arguments
+    assert driver_spec.experimental_options['prefs'] == {'profile.managed_default_content_settings.images': 2,
+                                                         'a': 1}
+
+
+@pytest.mark.parametrize('kwargs', [
+    {},
+    {'web_driver': {'command_executor': 'http://localhost:4444/wd/hub'}},
+    {'web_driver': {'name': 'chrome'}},
+    {'web_driver': _web_driver_d(name='no-such-browser')},
+    # Firefox's Options don't support experimental_options
+    {'web_driver': _web_driver_d(name='firefox', experimental_options={'prefs': {}})},
+    {'web_driver': {'name': 'chrome', 'path': '/opt/chromedriver', 'connection_pool': {}}},
+    {'web_driver': {'name': 'chrome', 'path': '/opt/chromedriver'}, 'connection_pool': object()},
+    {'web_driver': _web_driver_d(connection_pool={'no_such_param': 1})},
+    {'web_driver': _web_driver_d(), 'blocking_profile': 'no-such-profile'},
+    {'web_driver': _web_driver_d(name='firefox'), 'blocking_profile': 'no-images'},
+])
+def test_invalid(request, kwargs):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    with pytest.raises(ValueError):
+        DriverSpec(**kwargs)
+
+
+def test_create_remote(request, stub_web_drivers):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    driver_spec = DriverSpec(web_driver=_web_driver_d(arguments=['--headless']))
+
+    web_driver = driver_spec.create()
+    assert web_driver.command_executor == 'http://localhost:4444/wd/hub'
+    assert web_driver.kwargs['desired_capabilities']['goog:chromeOptions']['args'] == ['--headless']
+
+    web_driver = driver_spec.create(browsermobproxy=SimpleNamespace(proxy='localhost:9100'))
+    assert web_driver.kwargs['desired_capabilities']['goog:chromeOptions']['args'] == \
+        ['--headless', '--proxy-server=localhost:9100']
+    assert len(stub_web_drivers) == 2
+
+
+def test_create_local(request, monkeypatch):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    driver_spec = DriverSpec(web_driver={'name': 'chrome', 'path': '/opt/chromedriver', 'log_file': 'driver.log'})
+    monkeypatch.setattr(driver_spec, '_web_driver_klass', _LocalWebDriver)
+
+    web_driver = driver_spec.create()
+    assert web_driver.kwargs['executable_path'] == '/opt/chromedriver'
+    assert web_driver.kwargs['service_log_path'] == 'driver.log'
+    assert web_driver.kwargs['options'].arguments == []
+
+    web_driver = driver_spec.create(browsermobproxy=SimpleNamespace(proxy='localhost:9100'))
+    assert web_driver.kwargs['options'].arguments == ['--proxy-server=localhost:9100']
@@ -0,0 +1,58 @@
+import io
+import json
+import logging
+
+import pytest
+
+from alexber.seleniumsupport import BMPProxy, set_new_har, save_har, rotate_har, iter_har_entries, HarIndex
+
+logger = logging.getLogger(__name__)
+
+
+def _entries():
+    return [
+        {'request': {'url': 'http://a.com/?q={"x": [1, 2]}', 'method': 'GET'},
+         'response': {'status': 200, 'content': {'text': 'quote " backslash \\\\ brace } ] ,'}}},
+        {'request': {'url': 'http://a.com/ש', 'method': 'GET'}, 'response': {'status': 404, 'content': {}}},
+        {'request': {'url': 'http://b.com/', 'method': 'POST'}, 'response': {'status': 200, 'content': {}}},
+    ]
+
+
+def _har():
+    return {'log': {'version': '1.2', 'pages': [{'id': 'p', 'title': '{[', 'entries': ['not an entry']}],
+                    'entries': _entries(), 'comment': 'entries'}}
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 1024 * 1024])
+def test_iter_har_entries(request, tmp_path, chunk_size):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    path = tmp_path / 'page.har'
+    path.write_text(json.dumps(_har(), ensure_ascii=False, indent=2), encoding='utf-8')
+
+    assert list(iter_har_entries(str(path), chunk_size=chunk_size)) == _entries()
+    assert list(iter_har_entries(io.StringIO(json.dumps(_har())), chunk_size=chunk_size)) == _entries()
+
+
+def test_bmp_proxy_har(request, stub_bmp, tmp_path):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    with BMPProxy(browsermob=stub_bmp.browsermob) as bmp_proxy:
+        assert bmp_proxy.port in stub_bmp.proxies
+        # there was no previous HAR, BMP Daemon answers 204
+        assert rotate_har(bmp_proxy, 'page_0', str(tmp_path / 'empty.har')) is None
+        set_new_har(bmp_proxy, 'page_1')
+        stub_bmp.proxies[bmp_proxy.port]['log']['entries'] = _entries()
+
+        file_name = save_har(bmp_proxy, str(tmp_path / 'saved.har'))
+        assert list(iter_har_entries(file_name)) == _entries()
+        assert [record.url for record in HarIndex.from_bmp_proxy(bmp_proxy)] == \
+               [entry['request']['url'] for entry in _entries()]
+
+        # the previous HAR is streamed to the file
+        file_name = rotate_har(bmp_proxy, 'page_2', str(tmp_path / 'rotated.har'))
+        assert list(iter_har_entries(file_name)) == _entries()
+        # the previous HAR is dropped without reading it
+        assert rotate_har(bmp_proxy, 'page_3') is None
+
+    assert not stub_bmp.proxies
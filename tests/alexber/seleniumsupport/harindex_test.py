@@ -0,0 +1,91 @@
+import base64
+import json
+import logging
+
+import pytest
+
+from alexber.seleniumsupport import HarIndex
+
+logger = logging.getLogger(__name__)
+
+
+def _entry(url, status=200, time=10, mime_type='text/html', text=None, encoding=None, size=100, post_data=None):
+    content = {'mimeType': mime_type, 'size': size}
+    if text is not None:
+        content['text'] = text
+    if encoding is not None:
+        content['encoding'] = encoding
+    request = {'method': 'GET' if post_data is None else 'POST', 'url': url,
+               'headers': [{'name': 'Accept', 'value': '*/*'}]}
+    if post_data is not None:
+        request['postData'] = {'text': post_data}
+    return {'pageref': 'page_1', 'startedDateTime': '2020-01-01T00:00:00.000Z', 'time': time,
+            'request': request,
+            'response': {'status': status, 'headers': [{'name': 'Content-Type', 'value': mime_type}],
+                         'headersSize': 20, 'bodySize': size, 'content': content},
+            'timings': {'blocked': -1, 'dns': 1, 'connect': 2, 'send': 0, 'wait': time - 3, 'receive': 0}}
+
+
+@pytest.fixture
+def har():
+    return {'log': {'pages': [{'id': 'page_1', 'title': 'Page 1', 'startedDateTime': '2020-01-01T00:00:00.000Z'}],
+                    'entries': [
+                        _entry('http://a.com/', time=30, text='<html></html>'),
+                        _entry('http://a.com/app.js', time=50, mime_type='application/javascript; charset=utf-8',
+                               size=1000),
+                        _entry('http://b.com/missing', status=404, time=5, size=0),
+                        _entry('http://b.com/logo.png', time=20, mime_type='image/png',
+                               text=base64.b64encode(b'\x89PNG').decode('ascii'), encoding='base64', size=4),
+                    ]}}
+
+
+def test_lookups(request, har):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    har_index = HarIndex.from_har(har)
+
+    assert len(har_index) == 4
+    assert [record.url for record in har_index.by_host('a.com')] == ['http://a.com/', 'http://a.com/app.js']
+    assert [record.url for record in har_index.by_status(404)] == ['http://b.com/missing']
+    assert [record.url for record in har_index.by_mime_type('application/javascript')] == ['http://a.com/app.js']
+    assert har_index.by_url('http://nowhere/') == []
+    assert [record.url for record in har_index.slowest(2)] == ['http://a.com/app.js', 'http://a.com/']
+    assert list(har_index.bytes_by_host().items()) == [('a.com', 1140), ('b.com', 44)]
+    assert har_index.total_bytes() == 1184
+    assert har_index.pages[0]['title'] == 'Page 1'
+
+    record = har_index[-1]
+    assert record.body() == b'\x89PNG'
+    assert record.timings['dns'] == 1
+    assert record.request_headers == [('Accept', '*/*')]
+
+
+def test_from_file(request, har, tmp_path):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    path = tmp_path / 'page.har'
+    path.write_text(json.dumps(har), encoding='utf-8')
+
+    har_index = HarIndex.from_file(str(path), chunk_size=64)
+
+    assert [record.url for record in har_index] == [entry['request']['url'] for entry in har['log']['entries']]
+    assert har_index.pages[0]['id'] == 'page_1'
+
+
+@pytest.mark.parametrize('text', [
+    None,
+    '',
+    'abc',
+    # short text that starts with U+0000 is stored as is
+    '\u0000abc',
+    '\u0000' * 1000,
+    'x' * 1000,
+    'שלום ' * 100,
+])
+def test_text_round_trip(request, text):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    har_index = HarIndex([_entry('http://a.com/', text=text, post_data=text)])
+
+    assert har_index[0].text == text
+    assert har_index[0].post_data == text
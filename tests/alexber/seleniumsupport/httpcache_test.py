@@ -0,0 +1,113 @@
+import logging
+import os
+
+import pytest
+
+from alexber.seleniumsupport import HttpCache
+
+logger = logging.getLogger(__name__)
+
+
+def test_shards(request, tmp_path):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    http_cache = HttpCache(str(tmp_path), max_size=8 * 1024 ** 2, shards=2)
+    with http_cache.lease() as first, http_cache.lease() as second:
+        assert first.path != second.path
+        assert os.path.isdir(first.path)
+        assert first.chrome_arguments() == [f'--disk-cache-dir={first.path}', f'--disk-cache-size={4 * 1024 ** 2}']
+        # all shards are leased
+        with pytest.raises(ValueError):
+            with http_cache.lease(timeout=0.1):
+                pass
+
+    # the warmest shard is reused
+    with http_cache.lease() as third:
+        assert third.path in (first.path, second.path)
+
+
+def test_eviction(request, tmp_path):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    http_cache = HttpCache(str(tmp_path), max_size=1000)
+    with http_cache.lease() as first, http_cache.lease() as second:
+        for lease in (first, second):
+            with open(os.path.join(lease.path, 'data'), 'wb') as f:
+                f.write(b'x' * 800)
+
+    shards = [name for name in os.listdir(tmp_path) if os.path.isdir(os.path.join(tmp_path, name))]
+    assert len(shards) == 1
+    # lock file of the evicted shard is removed
+    assert sorted(name for name in os.listdir(tmp_path) if name.endswith('.lock')) == [f'{shards[0]}.lock']
+
+    # the number of the evicted shard is reused
+    with http_cache.lease() as first, http_cache.lease() as second:
+        assert {os.path.basename(first.path), os.path.basename(second.path)} == {'shard-0', 'shard-1'}
+
+
+def test_evicted_lock(request, tmp_path, monkeypatch):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    http_cache = HttpCache(str(tmp_path))
+    path = os.path.join(tmp_path, 'shard-0')
+    # another process has opened the lock file, then the shard was evicted and new shard-0 was created
+    stale = os.open(f'{path}.lock', os.O_RDWR | os.O_CREAT)
+    os.unlink(f'{path}.lock')
+    open(f'{path}.lock', 'w').close()
+
+    monkeypatch.setattr(os, 'open', lambda *args: stale)
+    # lock of the removed file doesn't exclude anybody
+    assert http_cache._try_lock(path) is None
+    monkeypatch.undo()
+
+    lock = http_cache._try_lock(path)
+    assert lock is not None
+    http_cache._unlock(lock)
+
+
+def test_snapshot(request, tmp_path):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    http_cache = HttpCache(str(tmp_path), mode='snapshot', copy_mode='copy')
+    with http_cache.lease() as lease:
+        with open(os.path.join(lease.path, 'data'), 'w') as f:
+            f.write('warm')
+    # the next session starts from the snapshot of the previous one
+    with http_cache.lease() as lease:
+        with open(os.path.join(lease.path, 'data')) as f:
+            assert f.read() == 'warm'
+    assert len([name for name in os.listdir(tmp_path) if name.startswith('snapshot-')]) == 2
+
+
+def test_snapshot_max_size(request, tmp_path):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    http_cache = HttpCache(str(tmp_path), max_size=1000, mode='snapshot', copy_mode='copy')
+    for content in (b'a' * 600, b'b' * 600):
+        with http_cache.lease() as lease:
+            with open(os.path.join(lease.path, 'data'), 'wb') as f:
+                f.write(content)
+
+    # 2 snapshots are larger than max_size, only the newest is kept
+    snapshots = [name for name in os.listdir(tmp_path) if name.startswith('snapshot-')]
+    assert len(snapshots) == 1
+    assert (tmp_path / snapshots[0] / 'data').read_bytes() == b'b' * 600
+
+
+def test_firefox_prefs(request, tmp_path):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    with HttpCache(str(tmp_path / 'cache'), max_size=2048, shards=1).lease() as lease:
+        lease.write_firefox_prefs(str(tmp_path))
+        user_js = (tmp_path / 'user.js').read_text()
+    assert f'user_pref("browser.cache.disk.parent_directory", "{lease.path}");' in user_js
+    assert 'user_pref("browser.cache.disk.capacity", 2);' in user_js
+
+
+def test_invalid(request, tmp_path):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    with pytest.raises(ValueError):
+        HttpCache(str(tmp_path), mode='unknown')
+    with pytest.raises(ValueError):
+        HttpCache(str(tmp_path), shards=0)
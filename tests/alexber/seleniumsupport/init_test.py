@@ -0,0 +1,29 @@
+import logging
+import subprocess
+import sys
+
+import pytest
+
+logger = logging.getLogger(__name__)
+
+
+def test_lazy_import(request):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    code = 'import sys, alexber.seleniumsupport as s\n' \
+           'assert "selenium.webdriver" not in sys.modules, "selenium.webdriver"\n' \
+           'assert "psutil" not in sys.modules, "psutil"\n' \
+           's.DriverSpec\n' \
+           'assert "alexber.seleniumsupport._driverspec" in sys.modules\n' \
+           'assert "alexber.seleniumsupport._pool" not in sys.modules\n'
+    subprocess.run([sys.executable, '-c', code], check=True)
+
+
+def test_dir(request):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    import alexber.seleniumsupport as seleniumsupport
+    assert 'SeleniumWebDriver' in dir(seleniumsupport)
+    assert 'SeleniumWebDriver' in seleniumsupport.__all__
+    with pytest.raises(AttributeError):
+        seleniumsupport.NoSuchName
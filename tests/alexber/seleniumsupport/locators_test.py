@@ -0,0 +1,112 @@
+import logging
+
+import pytest
+from selenium.common.exceptions import NoSuchElementException, StaleElementReferenceException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.wait import WebDriverWait
+
+from alexber.seleniumsupport import LocatorCache, element_condition, SeleniumWebDriver, wait_for_display
+
+logger = logging.getLogger(__name__)
+
+_LOCATOR = (By.ID, 'status')
+
+
+class _Element(object):
+    def __init__(self, text):
+        self._text = text
+        self.stale = False
+
+    @property
+    def text(self):
+        if self.stale:
+            raise StaleElementReferenceException()
+        return self._text
+
+
+class _Driver(object):
+    def __init__(self):
+        self.current_url = 'http://a.com/'
+        self.finds = 0
+        self.element = _Element('Done')
+
+    def find_element(self, by, value):
+        self.finds += 1
+        if value == 'missing':
+            raise NoSuchElementException()
+        return self.element
+
+
+def test_find_element(request):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    driver = _Driver()
+    locator_cache = LocatorCache()
+    for _ in range(3):
+        assert locator_cache.find_element(driver, _LOCATOR) is driver.element
+    assert driver.finds == 1
+    assert locator_cache.stats() == {'hits': 2, 'misses': 1, 'stale': 0, 'navigations': 0}
+
+    with pytest.raises(NoSuchElementException):
+        locator_cache.find_element(driver, (By.ID, 'missing'))
+
+    locator_cache.invalidate(driver, _LOCATOR)
+    locator_cache.find_element(driver, _LOCATOR)
+    assert driver.finds == 3
+
+    locator_cache.reset_stats()
+    assert locator_cache.stats() == {'hits': 0, 'misses': 0, 'stale': 0, 'navigations': 0}
+
+
+def test_stale(request):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    driver = _Driver()
+    locator_cache = LocatorCache()
+    assert locator_cache.run(driver, _LOCATOR, lambda element: element.text) == 'Done'
+
+    driver.element.stale = True
+    driver.element = _Element('Done again')
+    assert locator_cache.run(driver, _LOCATOR, lambda element: element.text) == 'Done again'
+    assert driver.finds == 2
+    assert locator_cache.stats()['stale'] == 1
+
+
+def test_navigation_url(request):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    driver = _Driver()
+    locator_cache = LocatorCache(navigation='url')
+    locator_cache.find_element(driver, _LOCATOR)
+    driver.current_url = 'http://a.com/next'
+    locator_cache.find_element(driver, _LOCATOR)
+    assert driver.finds == 2
+    assert locator_cache.stats()['navigations'] == 1
+
+    with pytest.raises(ValueError):
+        LocatorCache(navigation='title')
+
+
+def test_element_condition(request):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    driver = _Driver()
+    assert element_condition(_LOCATOR)(driver) is driver.element
+    assert element_condition(_LOCATOR, lambda element: element.text == 'Done')(driver)
+
+    driver.element.stale = True
+    # the newly resolved element is stale too
+    assert element_condition(_LOCATOR, lambda element: element.text)(driver) is False
+
+
+def test_wait_for_display(request, dd):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    locator_cache = LocatorCache()
+    with SeleniumWebDriver(**dd) as web_driver:
+        wait = WebDriverWait(web_driver, timeout=5, poll_frequency=0.01)
+        # every element of the fake page is displayed as block
+        assert wait.until(wait_for_display((By.ID, 'status'), 'block', locator_cache=locator_cache))
+        assert wait.until(wait_for_display((By.ID, 'status'), 'block', locator_cache=locator_cache))
+    assert locator_cache.stats()['misses'] == 1
+    assert locator_cache.stats()['hits'] == 1
@@ -0,0 +1,69 @@
+import logging
+
+import pytest
+
+from alexber.seleniumsupport import MetricsRecorder, add_metrics_listener, remove_metrics_listener, \
+    SeleniumWebDriver, BMPProxy, set_new_har
+from alexber.seleniumsupport._metrics import _span, _incr, SPAN, COUNTER
+
+logger = logging.getLogger(__name__)
+
+
+def test_recorder(request):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    with MetricsRecorder() as recorder:
+        with _span('op', name='tag'):
+            pass
+        with pytest.raises(ValueError):
+            with _span('op'):
+                raise ValueError('fail')
+        _incr('count')
+        _incr('count', 2, reason='x')
+
+    snapshot = recorder.snapshot()
+    assert snapshot['spans']['op']['count'] == 2
+    assert snapshot['spans']['op']['errors'] == 1
+    assert snapshot['counters'] == {'count': 3}
+
+    # outside of the context nothing is recorded
+    _incr('count')
+    assert recorder.snapshot()['counters'] == {'count': 3}
+
+    recorder.reset()
+    assert recorder.snapshot()['counters'] == {}
+
+
+def test_listener(request):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    metrics = []
+
+    def listener(name, kind, value, tags):
+        metrics.append((name, kind, tags))
+
+    add_metrics_listener(listener)
+    try:
+        with _span('op', browser='chrome'):
+            pass
+        _incr('count', reason='x')
+    finally:
+        remove_metrics_listener(listener)
+    _incr('count')
+
+    assert metrics == [('op', SPAN, {'browser': 'chrome', 'error': False}), ('count', COUNTER, {'reason': 'x'})]
+
+
+def test_lifecycle_spans(request, stub_dd, stub_bmp):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    with MetricsRecorder() as recorder:
+        with BMPProxy(browsermob=stub_bmp.browsermob) as bmp_proxy:
+            set_new_har(bmp_proxy, 'har_name')
+            with SeleniumWebDriver(browsermobproxy=bmp_proxy, **stub_dd):
+                pass
+
+    spans = recorder.snapshot()['spans']
+    for name in ('bmp_proxy.create', 'bmp_proxy.close', 'web_driver.create', 'web_driver.close'):
+        assert spans[name]['count'] == 1
+        assert spans[name]['errors'] == 0
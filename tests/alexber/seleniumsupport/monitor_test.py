@@ -0,0 +1,96 @@
+import logging
+import subprocess
+import sys
+import time
+
+import pytest
+
+from alexber.seleniumsupport import ProcessTreeMonitor
+
+logger = logging.getLogger(__name__)
+
+
+class _Owner(object):
+    pass
+
+
+@pytest.fixture
+def child():
+    popen = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)'])
+    try:
+        yield popen
+    finally:
+        popen.kill()
+        popen.wait()
+
+
+def test_sample(request, child):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    owner = _Owner()
+    with ProcessTreeMonitor(interval=60) as monitor:
+        monitor.watch(owner, pid=child.pid)
+        samples = monitor.sample()
+
+        assert len(samples) == 1
+        assert samples[0]['pid'] == child.pid
+        assert samples[0]['processes'] == 1
+        assert samples[0]['rss'] > 0
+        assert monitor.stats(owner)['rss'] == samples[0]['rss']
+        assert monitor.over_limit(owner) is None
+
+        monitor.unwatch(owner)
+        assert monitor.stats(owner) is None
+        assert monitor.stats() == []
+
+
+def test_max_rss(request, child):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    owner = _Owner()
+    calls = []
+    with ProcessTreeMonitor(interval=60) as monitor:
+        monitor.watch(owner, pid=child.pid, max_rss=1, on_limit=lambda o, sample: calls.append((o, sample)))
+        monitor.sample()
+        monitor.sample()
+
+        assert monitor.over_limit(owner) == 'max_rss'
+        assert len(calls) == 1
+        assert calls[0][0] is owner
+        assert calls[0][1]['over_limit'] == 'max_rss'
+
+
+def test_max_age(request):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    owner = _Owner()
+    with ProcessTreeMonitor(interval=60) as monitor:
+        # no process, only max_age applies
+        monitor.watch(owner, max_age=0.05)
+        assert monitor.over_limit(owner) is None
+        time.sleep(0.1)
+        assert monitor.over_limit(owner) == 'max_age'
+
+
+def test_background_thread(request, child):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    owner = _Owner()
+    with ProcessTreeMonitor(interval=0.01) as monitor:
+        monitor.watch(owner, pid=child.pid, max_rss=1)
+        deadline = time.monotonic() + 5
+        while monitor.stats(owner)['over_limit'] is None and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert monitor.stats(owner)['over_limit'] == 'max_rss'
+
+
+def test_closed(request):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    with pytest.raises(ValueError):
+        ProcessTreeMonitor(interval=0)
+
+    monitor = ProcessTreeMonitor()
+    monitor.close()
+    with pytest.raises(ValueError):
+        monitor.start()
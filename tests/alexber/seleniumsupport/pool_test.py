@@ -0,0 +1,123 @@
+import logging
+
+import pytest
+
+from alexber.seleniumsupport import WebDriverPool, BMPProxyPool, MetricsRecorder
+
+logger = logging.getLogger(__name__)
+
+
+def test_web_driver_pool(request, stub_dd, stub_web_drivers):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    with MetricsRecorder() as recorder, WebDriverPool(size=2, max_uses=2, **stub_dd) as pool:
+        assert len(stub_web_drivers) == 2
+
+        with pool.lease() as first:
+            first.switch_to.window('window-0')
+            first.window_handles.append('window-1')
+            first.get('http://example.com/')
+        # the Web Driver was reset on release
+        assert first.window_handles == ['window-0']
+        assert first.current_url == 'about:blank'
+
+        with pool.lease() as second:
+            pass
+        # the first Web Driver was put back at the end of the idle queue
+        assert second is not first
+        with pool.lease() as third:
+            pass
+        assert third is first
+        # first was used twice and it is retired on release
+        assert first.quitted
+        assert not second.quitted
+
+    assert all(web_driver.quitted for web_driver in stub_web_drivers)
+
+    counters = recorder.snapshot()['counters']
+    assert counters['pool.created'] == 2
+    assert counters['pool.retired'] == 2
+
+
+def test_web_driver_pool_discard_and_timeout(request, stub_dd, stub_web_drivers):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    with WebDriverPool(size=1, **stub_dd) as pool:
+        web_driver = pool.acquire()
+        with pytest.raises(ValueError):
+            pool.acquire(timeout=0.1)
+        pool.release(web_driver, discard=True)
+        assert web_driver.quitted
+
+        with pool.lease(timeout=1) as new_web_driver:
+            assert new_web_driver is not web_driver
+        assert len(stub_web_drivers) == 2
+
+        with pytest.raises(ValueError):
+            pool.release(web_driver)
+
+    with pytest.raises(ValueError):
+        pool.acquire()
+
+
+def test_web_driver_pool_max_age(request, stub_dd, stub_web_drivers):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    with WebDriverPool(size=1, max_age=0, **stub_dd) as pool:
+        with pool.lease() as first:
+            pass
+        with pool.lease() as second:
+            pass
+    assert second is not first
+    assert first.quitted
+
+
+def test_web_driver_pool_invalid(request, stub_dd):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    with pytest.raises(ValueError):
+        WebDriverPool(size=0, **stub_dd)
+    with pytest.raises(ValueError):
+        WebDriverPool(size=1)
+
+
+def test_bmp_proxy_pool(request, stub_bmp):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    ports = [9100, 9101, 9102]
+    with BMPProxyPool(size=2, ports=ports, max_uses=1, browsermob=stub_bmp.browsermob) as pool:
+        assert sorted(stub_bmp.proxies) == [9100, 9101]
+        assert pool.free_ports == [9102]
+
+        with pool.lease() as bmp_proxy:
+            assert bmp_proxy.port == 9100
+        # retired after one use, the port is free again
+        assert 9100 not in stub_bmp.proxies
+        assert sorted(pool.free_ports) == [9100, 9102]
+
+    assert not stub_bmp.proxies
+    assert sorted(pool.free_ports) == ports
+
+
+def test_bmp_proxy_pool_reset(request, stub_bmp):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    with BMPProxyPool(size=1, browsermob=stub_bmp.browsermob) as pool:
+        with pool.lease() as bmp_proxy:
+            stub_bmp.proxies[bmp_proxy.port] = stub_bmp.har('page', entries=[{}])
+        del stub_bmp.requests[:]
+        with pool.lease() as same:
+            assert same is bmp_proxy
+        # the HAR of the previous job is dropped
+        assert stub_bmp.proxies[bmp_proxy.port]['log']['entries'] == []
+
+    paths = {path for _, path in stub_bmp.requests}
+    for path in ('blacklist', 'whitelist', 'rewrite', 'dns/cache', 'har'):
+        assert f'/proxy/{bmp_proxy.port}/{path}' in paths
+
+
+def test_bmp_proxy_pool_ports(request, stub_bmp):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    with pytest.raises(ValueError):
+        BMPProxyPool(size=2, ports=[9100], browsermob=stub_bmp.browsermob)
@@ -0,0 +1,55 @@
+import logging
+
+import pytest
+
+from alexber.seleniumsupport import RemoteConnectionPool, SeleniumWebDriver
+
+logger = logging.getLogger(__name__)
+
+
+def test_shared(request, web_driver_server):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    pool = RemoteConnectionPool.shared(web_driver_server.url, maxsize=2)
+    try:
+        assert RemoteConnectionPool.shared(web_driver_server.url + '/', maxsize=2) is pool
+        assert RemoteConnectionPool.shared(web_driver_server.url, maxsize=3) is not pool
+    finally:
+        pool.close()
+    assert RemoteConnectionPool.shared(web_driver_server.url, maxsize=2) is not pool
+
+
+def test_connection_pool(request, web_driver_server, dd):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    with RemoteConnectionPool(web_driver_server.url) as pool:
+        with SeleniumWebDriver(connection_pool=pool, **dd) as web_driver:
+            web_driver.get('http://example.com/')
+            assert web_driver.title == 'Fake page'
+        stats = pool.stats()
+        assert stats['newSession']['count'] == 1
+        assert stats['get']['count'] == 1
+        assert stats['get']['errors'] == 0
+
+        pool.reset_stats()
+        assert pool.stats() == {}
+
+
+def test_connection_pool_dict(request, web_driver_server, dd):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    dd['web_driver']['connection_pool'] = {'maxsize': 4}
+    pool = RemoteConnectionPool.shared(web_driver_server.url, maxsize=4)
+    try:
+        with SeleniumWebDriver(**dd) as web_driver:
+            web_driver.get('http://example.com/')
+        assert pool.stats()['get']['count'] == 1
+    finally:
+        pool.close()
+
+
+def test_invalid(request, web_driver_server):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    with pytest.raises(ValueError):
+        RemoteConnectionPool(web_driver_server.url, maxsize=0)
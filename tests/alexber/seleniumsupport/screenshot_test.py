@@ -0,0 +1,93 @@
+import base64
+import logging
+import os
+import struct
+import zlib
+
+import pytest
+
+from alexber.seleniumsupport import recompress_png, ScreenshotWriter, save_screenshot
+
+logger = logging.getLogger(__name__)
+
+
+def _chunk(chunk_type, data):
+    return struct.pack('>I4s', len(data), chunk_type) + data + struct.pack('>I', zlib.crc32(chunk_type + data))
+
+
+def _png(width=16, height=16, color=b'\xff\x00\x00'):
+    raw = b''.join(b'\x00' + color * width for _ in range(height))
+    data = zlib.compress(raw, 0)
+    half = len(data) // 2
+    return b'\x89PNG\r\n\x1a\n' + \
+        _chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)) + \
+        _chunk(b'IDAT', data[:half]) + _chunk(b'IDAT', data[half:]) + \
+        _chunk(b'IEND', b'')
+
+
+def _idat(png):
+    idat = []
+    pos = 8
+    while pos < len(png):
+        length, chunk_type = struct.unpack('>I4s', png[pos:pos + 8])
+        if chunk_type == b'IDAT':
+            idat.append(png[pos + 8:pos + 8 + length])
+        pos += 12 + length
+    return idat
+
+
+def test_recompress_png(request):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    png = _png()
+    recompressed = recompress_png(png)
+
+    assert len(recompressed) < len(png)
+    assert len(_idat(recompressed)) == 1
+    assert zlib.decompress(_idat(recompressed)[0]) == zlib.decompress(b''.join(_idat(png)))
+
+    with pytest.raises(ValueError):
+        recompress_png(b'GIF89a')
+
+
+def test_writer(request, tmp_path):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    red = _png()
+    green = _png(color=b'\x00\xff\x00')
+    with ScreenshotWriter() as writer:
+        writer.submit(tmp_path / '1.png', base64.b64encode(red).decode('ascii'))
+        writer.submit(tmp_path / '2.png', red)
+        writer.submit(tmp_path / '3.png', green)
+        writer.flush()
+        assert writer.written == 2
+        assert writer.deduplicated == 1
+        assert writer.failed == 0
+
+    assert (tmp_path / '1.png').read_bytes() == red
+    assert os.path.samefile(tmp_path / '1.png', tmp_path / '2.png')
+    assert (tmp_path / '3.png').read_bytes() == green
+
+    with pytest.raises(ValueError):
+        writer.submit(tmp_path / '4.png', red)
+
+
+def test_writer_compress_level(request, tmp_path):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    png = _png()
+    with ScreenshotWriter(compress_level=9) as writer:
+        writer.submit(tmp_path / '1.png', png)
+        writer.submit(tmp_path / 'missing' / '2.png', _png(color=b'\x00\x00\xff'))
+    assert (tmp_path / '1.png').read_bytes() == recompress_png(png, 9)
+    assert writer.written == 1
+    assert writer.failed == 1
+
+
+def test_save_screenshot(request, tmp_path):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    png = _png()
+    with ScreenshotWriter() as writer:
+        save_screenshot(None, str(tmp_path / '1.png'), screen=base64.b64encode(png).decode('ascii'), writer=writer)
+    assert (tmp_path / '1.png').read_bytes() == png
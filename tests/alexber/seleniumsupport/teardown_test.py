@@ -0,0 +1,65 @@
+import logging
+import subprocess
+import sys
+
+import psutil
+
+from alexber.seleniumsupport import terminate_processes, TeardownReport
+
+logger = logging.getLogger(__name__)
+
+
+def _sleeper(ignore_sigterm=False):
+    code = 'import signal, time\n'
+    if ignore_sigterm:
+        code += 'signal.signal(signal.SIGTERM, signal.SIG_IGN)\n'
+    code += 'print("ready", flush=True)\ntime.sleep(60)\n'
+    process = subprocess.Popen([sys.executable, '-c', code], stdout=subprocess.PIPE)
+    process.stdout.readline()
+    return process
+
+
+def test_terminate_processes(request):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    popen = _sleeper()
+    try:
+        process = psutil.Process(popen.pid)
+        report = terminate_processes([process], timeout=5)
+        assert report.terminated == [process]
+        assert report.killed == []
+        assert report.survived == []
+        assert not process.is_running() or process.status() == psutil.STATUS_ZOMBIE
+    finally:
+        popen.kill()
+        popen.wait()
+
+
+def test_terminate_processes_kill(request):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    popen = _sleeper(ignore_sigterm=True)
+    try:
+        process = psutil.Process(popen.pid)
+        report = terminate_processes([process], timeout=0.2)
+        assert report.terminated == []
+        assert report.killed == [process]
+        assert report.survived == []
+    finally:
+        popen.kill()
+        popen.wait()
+
+
+def test_teardown_report_merge(request):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    first = TeardownReport()
+    first.terminated.append(1)
+    second = TeardownReport()
+    second.killed.append(2)
+    second.errors.append(ValueError())
+
+    assert first.merge(second) is first
+    assert first.terminated == [1]
+    assert first.killed == [2]
+    assert len(first.errors) == 1
@@ -0,0 +1,231 @@
+import json
+import logging
+import shutil
+import subprocess
+
+import pytest
+from selenium.common.exceptions import JavascriptException, TimeoutException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.wait import WebDriverWait
+
+from alexber.seleniumsupport import wait_for_style_change, wait_for_display_change, wait_for_text_change, \
+    wait_for_element_appearance, page_ready, wait_page_ready
+from alexber.seleniumsupport._waits import _MUTATION_SCRIPT
+
+logger = logging.getLogger(__name__)
+
+node = pytest.mark.skipif(shutil.which('node') is None, reason="node is not installed")
+
+# minimal page that is enough for _READY_SCRIPT, performance.now() returns clock, that is advanced by the test;
+# XHRs and fetches are in flight, till the test finishes them
+_PAGE = """
+var clock = 0;
+var xhrs = [];
+var fetches = [];
+var performance = {
+    now: function () { return clock; },
+    entries: {
+        resource: [],
+        navigation: [{toJSON: function () { return {loadEventEnd: 42}; }}],
+    },
+    getEntriesByType: function (type) { return this.entries[type] || []; },
+    timing: {toJSON: function () { return {navigationStart: 1}; }},
+};
+function XMLHttpRequest() {
+    this.listeners = {};
+}
+XMLHttpRequest.prototype.addEventListener = function (name, listener) {
+    this.listeners[name] = listener;
+};
+XMLHttpRequest.prototype.send = function () {
+    xhrs.push(this);
+};
+var window = {
+    performance: performance,
+    fetch: function () {
+        return new Promise(function (resolve) { fetches.push(resolve); });
+    },
+    getComputedStyle: function (el) { return el.style; },
+};
+var document = {
+    readyState: 'loading',
+    title: 'Stub page',
+    body: {style: {display: 'block', visibility: 'visible'}},
+    location: {href: 'http://example.com/'},
+};
+
+require('readline').createInterface({input: process.stdin}).on('line', function (line) {
+    var message = JSON.parse(line);
+    var answer;
+    try {
+        var result = new Function(message.script).apply(null, message.args);
+        answer = {result: result === undefined ? null : result};
+    } catch (e) {
+        answer = {error: String(e)};
+    }
+    process.stdout.write(JSON.stringify(answer) + '\\n');
+});
+"""
+
+
+class _NodeDriver(object):
+    """
+    Web Driver, which page is _PAGE in node process.
+    """
+    def __init__(self):
+        self.process = subprocess.Popen(['node', '-e', _PAGE], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                        text=True)
+        self.calls = 0
+
+    def page(self, code):
+        """
+        Runs code in the page, for example, to change it's state. It is not counted as call.
+        """
+        self.calls -= 1
+        return self.execute_script(code)
+
+    def execute_script(self, script, *args):
+        self.calls += 1
+        self.process.stdin.write(json.dumps({'script': script, 'args': args}) + '\n')
+        self.process.stdin.flush()
+        answer = json.loads(self.process.stdout.readline())
+        if 'error' in answer:
+            raise JavascriptException(answer['error'])
+        return answer['result']
+
+    def close(self):
+        self.process.stdin.close()
+        self.process.wait(5)
+        self.process.stdout.close()
+
+
+@pytest.fixture
+def node_driver():
+    driver = _NodeDriver()
+    try:
+        yield driver
+    finally:
+        driver.close()
+
+
+class _RecordingDriver(object):
+    """
+    Records arguments of execute_async_script().
+    """
+    def __init__(self, result=True):
+        self.calls = []
+        self.result = result
+
+    def execute_async_script(self, script, *args):
+        self.calls.append((script, args))
+        return self.result
+
+
+@pytest.mark.parametrize('condition, expected_spec', [
+    (wait_for_style_change((By.XPATH, '//div[@id="x"]'), 'visibility', 'hidden'),
+     {'kind': 'style', 'by': By.XPATH, 'value': '//div[@id="x"]', 'name': 'visibility', 'expected': 'hidden'}),
+    (wait_for_display_change((By.XPATH, '//div[@id="x"]')),
+     {'kind': 'style', 'by': By.XPATH, 'value': '//div[@id="x"]', 'name': 'display', 'expected': 'none'}),
+    (wait_for_text_change((By.ID, 'status'), 'Done'),
+     {'kind': 'text', 'by': By.ID, 'value': 'status', 'expected': 'Done'}),
+    (wait_for_element_appearance((By.CSS_SELECTOR, '.row')),
+     {'kind': 'appearance', 'by': By.CSS_SELECTOR, 'value': '.row'}),
+])
+def test_mutation_wait_spec(request, condition, expected_spec):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    driver = _RecordingDriver()
+    assert condition(driver) is True
+
+    script, args = driver.calls[0]
+    assert script == _MUTATION_SCRIPT
+    spec, timeout_ms = args
+    # the locator is not overwritten by the expected style/text
+    assert spec == expected_spec
+    assert timeout_ms == 5000
+
+
+def test_mutation_script_uses_expected(request):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    assert 'find(spec.by, spec.value)' in _MUTATION_SCRIPT
+    assert "getPropertyValue(spec.name) === spec.expected" in _MUTATION_SCRIPT
+    assert 'indexOf(spec.expected)' in _MUTATION_SCRIPT
+
+
+@node
+def test_page_ready(request, node_driver):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    assert page_ready()(node_driver) is False
+    node_driver.page("document.readyState = 'interactive';")
+    assert page_ready()(node_driver) is False
+
+    node_driver.page("document.readyState = 'complete';")
+    assert page_ready()(node_driver) == {'url': 'http://example.com/', 'title': 'Stub page',
+                                         'navigation': {'loadEventEnd': 42}, 'timing': {'navigationStart': 1},
+                                         'resourceCount': 0, 'resources': None}
+    node_driver.page("performance.entries.resource.push({toJSON: function () { return {name: 'a.js'}; }});")
+    assert page_ready(resources=True)(node_driver)['resources'] == [{'name': 'a.js'}]
+
+    assert page_ready(title='Other')(node_driver) is False
+    assert page_ready(title='Stub')(node_driver)['title'] == 'Stub page'
+
+    node_driver.page("document.body.style.visibility = 'hidden';")
+    assert page_ready()(node_driver) is False
+
+
+@node
+def test_page_ready_network_idle(request, node_driver):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    condition = page_ready(network_idle=True, idle_time=0.5)
+    node_driver.page("document.readyState = 'complete';")
+    # the first poll starts tracking, network is quiet only from now on
+    assert condition(node_driver) is False
+
+    node_driver.page("new XMLHttpRequest().send(); window.fetch('/api'); clock = 1000;")
+    assert condition(node_driver) is False
+    node_driver.page("xhrs[0].listeners.loadend();")
+    # fetch is still in flight
+    assert condition(node_driver) is False
+    node_driver.page("fetches[0]('response'); clock = 1200;")
+    node_driver.page("clock = 1500;")
+    assert condition(node_driver) is False
+
+    # resource (not fetch/XHR) has finished recently
+    node_driver.page("performance.entries.resource.push({responseEnd: 1800}); clock = 2000;")
+    assert condition(node_driver) is False
+    node_driver.page("clock = 2400;")
+    assert condition(node_driver)['resourceCount'] == 1
+
+
+@node
+def test_wait_page_ready(request, node_driver):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    node_driver.page("var polls = 0;"
+                     "Object.defineProperty(document, 'readyState', {get: function () {"
+                     "    return ++polls < 3 ? 'interactive' : 'complete'; }});")
+    metrics = wait_page_ready(WebDriverWait(node_driver, timeout=5, poll_frequency=0.01))
+    assert metrics['navigation'] == {'loadEventEnd': 42}
+    assert node_driver.calls == 3
+
+
+@node
+def test_wait_page_ready_timeout(request, node_driver):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    with pytest.raises(TimeoutException):
+        wait_page_ready(WebDriverWait(node_driver, timeout=0.3, poll_frequency=0.05))
+    assert node_driver.calls > 1
+
+
+def test_page_ready_unloaded(request):
+    logger.info(f'{request._pyfuncitem.name}()')
+
+    class _UnloadingDriver(object):
+        def execute_script(self, script, *args):
+            raise JavascriptException("document was unloaded")
+
+    assert page_ready()(_UnloadingDriver()) is False